@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+'''
+This module opens JSON and JSON Lines files with transparent compression. It is imported by the scripts that read and write
+the database and is not meant to be run on its own.
+
+The compression is taken from the extension of the file: a file ending in .gz is read and written with gzip, a file ending in
+.zst or .zstd with Zstandard, any other file is not compressed. The extension before it gives the format, so database.json.gz is
+a gzip compressed JSON database and database.jsonl.zst a Zstandard compressed JSON Lines database. Files are (de)compressed
+while they are streamed, they are never decompressed to disk or in memory as a whole.
+
+Zstandard needs the zstandard package, gzip is part of Python. On storage that is slower than the decompression, a compressed
+database is read faster than an uncompressed one. A compressed file can not be read from an offset, so it has no offset index
+and a JSON Lines file is not split by byte range, its decompressed blocks of lines are parsed in parallel instead
+(see DatabaseStore). ::
+
+    with open_file("database.json.zst", 'wt', level=10) as file:
+        json.dump(database, file)
+'''
+
+# Import the required libraries
+import gzip
+import io
+
+# Extensions of compressed files
+GZIP_EXTENSIONS = (".gz",)
+ZSTD_EXTENSIONS = (".zst", ".zstd")
+
+# The compression level when no level is given
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+def import_zstandard():
+    # zstandard is only needed for Zstandard compressed files
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Zstandard compressed files need zstandard, install it with pip install zstandard")
+    return zstandard
+
+def compression_of(path: str) -> str | None:
+    # Make docstring with rst syntax
+    '''
+    Get the compression of a file from its extension.\n
+    \n
+    Parameters:\n
+    - path: The path to the file\n
+    \n
+    Returns:\n
+    - compression: gzip, zstd or None for an uncompressed file
+    '''
+
+    if path.lower().endswith(GZIP_EXTENSIONS):
+        return "gzip"
+    if path.lower().endswith(ZSTD_EXTENSIONS):
+        return "zstd"
+    return None
+
+def strip_compression(path: str) -> str:
+    # Make docstring with rst syntax
+    '''
+    Remove the compression extension from a path, to find the format of the file.\n
+    \n
+    Parameters:\n
+    - path: The path to the file\n
+    \n
+    Returns:\n
+    - path: The path without .gz, .zst or .zstd
+    '''
+
+    if compression_of(path):
+        return path[:path.rfind(".")]
+    return path
+
+def open_file(path: str, mode: str = 'rb', level: int | None = None, compression: str | None = "auto"):
+    # Make docstring with rst syntax
+    '''
+    Open a file, compressed files are (de)compressed while they are read or written.\n
+    \n
+    Parameters:\n
+    - path: The path to the file\n
+    - mode: The mode of the file: rb, r or rt to read, wb, w or wt to write\n
+    - level: The compression level when the file is written, by default 6 for gzip and 3 for Zstandard\n
+    - compression: gzip, zstd or None, by default taken from the extension of the path\n
+    \n
+    Returns:\n
+    - file: A file object, text modes use UTF-8
+    '''
+
+    if compression == "auto":
+        compression = compression_of(path)
+    if compression is None:
+        return open(path, mode) if 'b' in mode else open(path, mode, encoding='utf-8')
+
+    binary = 'b' in mode
+    writing = 'w' in mode
+    if level is None:
+        level = DEFAULT_LEVELS[compression]
+
+    if compression == "gzip":
+        if writing:
+            file = gzip.open(path, 'wb', compresslevel=level)
+        else:
+            file = gzip.open(path, 'rb')
+    elif compression == "zstd":
+        zstandard = import_zstandard()
+        if writing:
+            file = zstandard.open(path, 'wb', cctx=zstandard.ZstdCompressor(level=level))
+        else:
+            # The reader of zstandard can not read lines, a buffer adds readline and peek
+            file = io.BufferedReader(zstandard.open(path, 'rb'))
+    else:
+        raise ValueError("Invalid compression. Please use gzip, zstd or None")
+
+    return file if binary else io.TextIOWrapper(file, encoding='utf-8')
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+'''
+This script looks up the PMIDs of a list of DOIs in OpenAlex. The DOIs are read from stdin, one on each line, and the PMIDs are
+written to stdout. Works without a PMID are written as "Not found". The DOIs are requested in batches with the OpenalexClient of
+PMID2Openalex. ::
+
+    Required:
+
+    -e : Your email address, it places the requests in the OpenAlex polite pool
+
+    Optional:
+    --workers: Number of requests that are sent at once (default 4)
+    --cache: Path to a folder for cached OpenAlex responses
+    --cache-ttl: Time in hours that cached responses are used (default 24)
+
+    Usage:
+
+    cat dois.txt | python3 DOI2PMID.py -e your_email@email.com > pmids.txt
+
+'''
+
+# Import the required libraries
+import argparse
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.PMID2Openalex import OpenalexClient, dois_to_pmids
+from lib.ResponseCache import ResponseCache
+
+if __name__ == "__main__":
+
+    # Create a parser object and add arguments
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-e", dest="email", required=True, help="Provide your email address for OpenAlex")
+    parser.add_argument("--workers", dest="workers", required=False, type=int, default=4, help="Number of requests that are sent at once (default 4)")
+    parser.add_argument("--cache", dest="cache", required=False, default=None, help="Provide the path to a folder for cached OpenAlex responses")
+    parser.add_argument("--cache-ttl", dest="cache_ttl", required=False, type=float, default=24, help="Time in hours that cached responses are used (default 24)")
+
+    # Read arguments from the command line
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.cache, ttl=args.cache_ttl * 3600) if args.cache else None
+    client = OpenalexClient(args.email, cache=cache)
+
+    dois = list(dict.fromkeys(line.strip() for line in sys.stdin if line.strip()))
+    for pmid in dois_to_pmids(dois, client, workers=args.workers):
+        print(pmid)
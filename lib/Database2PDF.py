@@ -2,11 +2,12 @@
 
 '''
 This script is used to filter a JSON file based on open access status and save the filtered data to a tab-delimited txt file.
+The PDFs can then be downloaded with URL2PDF.
 The script has two required arguments. ::
 
     Required:
     
-    -j : The path to the PMID JSON file
+    -j : The path to the database, in any format read by DatabaseStore.read_records
     -o : The path to the output tab-delimited txt file
     
     Usage:
@@ -15,14 +16,38 @@ The script has two required arguments. ::
     
 '''
 
-import ijson
 import argparse
+import os
+import sys
 from tqdm import tqdm
 
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
 
-def show_source():
-    # Just an empty function to trigger Sphinx in showing the source documentation
-    pass
+from lib.DatabaseStore import read_records
+
+
+def oa_pdf_urls(json_file: str) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Stream over a database and collect the PDF URLs of the open access records.\n
+    \n
+    Parameters:\n
+    - json_file: The path to the database, in any format read by DatabaseStore.read_records\n
+    \n
+    Returns:\n
+    - output_dict: A dictionary with the PMIDs as keys and the PDF URLs as values
+    '''
+
+    output_dict = {}
+
+    # Stream over the database, only the open access fields are read
+    for item in tqdm(read_records(json_file, columns=['pmid', 'is_oa', 'pdf_url'])):
+        if item["pdf_url"] == None:
+            continue
+        if item['is_oa'] and item['pdf_url'] != "NA":
+            output_dict[item['pmid']] = item['pdf_url']
+    return output_dict
 
 
 if __name__ == "__main__":
@@ -35,20 +60,7 @@ if __name__ == "__main__":
     # Read arguments from the command line
     args = parser.parse_args()
     
-    output_dict = {}
-    
-    # Stream over the JSON file
-    with open(args.json_file, 'rb') as file:
-        # Create a parser object over the JSON file
-        parser = ijson.items(file, 'item')
-        
-        # Iterate over the JSON objects
-        for item in tqdm(parser):
-            if 'is_oa' in item and 'pdf_url' in item:
-                if item["pdf_url"] == None:
-                    continue
-                if item['is_oa'] and item['pdf_url'] != "NA":
-                    output_dict[item['pmid']] = item['pdf_url']
+    output_dict = oa_pdf_urls(args.json_file)
                     
     # Write the filtered data to a tab-delimited txt file
     with open(args.output_file, 'w') as file:
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+'''
+This script converts the database between the JSON, JSON Lines and columnar Parquet formats (see DatabaseStore).
+The format is taken from the extension of the output file: a .parquet or .pq file is written as Parquet, a .jsonl file as
+JSON Lines and any other file as JSON. The scripts that read the database accept all formats, a Parquet database lets them
+read only the fields they need and a JSON Lines database can be parsed by several processes at once.
+
+JSON and JSON Lines files ending in .gz or .zst are compressed with gzip or Zstandard (see Compression).
+
+The script has two required arguments and two optional arguments. ::
+
+    Required:
+
+    -i : The path to the input database file
+    -o : The path to the output database file
+
+    Optional:
+    --row-group-size: Number of records in a row group of the Parquet file (default 100000)
+    --level: The compression level of a compressed JSON or JSON Lines output file
+
+    Usage:
+
+    python3 Database2Parquet.py -i ../example/demo_database.json -o ../YOUR_FOLDER/demo_database.parquet
+    python3 Database2Parquet.py -i ../example/demo_database.json -o ../YOUR_FOLDER/demo_database.jsonl
+    python3 Database2Parquet.py -i ../example/demo_database.json -o ../YOUR_FOLDER/demo_database.jsonl.zst --level 10
+
+'''
+
+# Import the required libraries
+import argparse
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.DatabaseStore import is_parquet, json_to_parquet, database_to_json
+
+if __name__ == "__main__":
+
+    # Create a parser object and add arguments
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-i", dest="input_file", required=True, help="Provide the path to the input database file")
+    parser.add_argument("-o", dest="output_file", required=True, help="Provide the path to the output database file")
+    parser.add_argument("--row-group-size", dest="row_group_size", required=False, type=int, default=100000, help="Number of records in a row group of the Parquet file (default 100000)")
+    parser.add_argument("--level", dest="level", required=False, type=int, default=None, help="The compression level of a compressed output file")
+
+    # Read arguments from the command line
+    args = parser.parse_args()
+
+    if is_parquet(args.output_file):
+        count = json_to_parquet(args.input_file, args.output_file, row_group_size=args.row_group_size)
+    else:
+        count = database_to_json(args.input_file, args.output_file, level=args.level)
+    print(f"Converted {count} records to {args.output_file}")
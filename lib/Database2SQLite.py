@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+'''
+This script keeps the database in a SQLite store (see RecordStore). JSON files are upserted into the store: records of new PMIDs
+are added and the records of existing PMIDs get the fields of the update, the other fields keep their value. Only the rows of the
+PMIDs in the JSON files are written, so a daily update does not rewrite the database.
+
+The JSON files can be a database (a list of records), or a file with the PMIDs as keys, like the output of NewPMID, PMID2Openalex
+and PMID2Tags. The store can be exported back to a JSON database for the scripts and tools that need one.
+
+The script has one required argument and two optional arguments. ::
+
+    Required:
+
+    -d : The path to the SQLite database file, it is created when it does not exist
+
+    Optional:
+    -u : The paths to one or more JSON files that are upserted into the database, in the given order
+    --export: The path to a JSON database file the database is exported to, after the updates
+
+    Usage:
+
+    python3 Database2SQLite.py -d database.sqlite -u ../example/demo_database.json
+    python3 Database2SQLite.py -d database.sqlite -u new_pmids.json openalex.json --export database.json
+
+'''
+
+# Import the required libraries
+import argparse
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.DatabaseStore import database_to_json, read_items
+from lib.RecordStore import RecordStore
+
+if __name__ == "__main__":
+
+    # Create a parser object and add arguments
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-d", dest="database_file", required=True, help="Provide the path to the SQLite database file")
+    parser.add_argument("-u", dest="update_files", required=False, nargs="+", default=[], help="Provide the paths to the JSON files that are upserted into the database")
+    parser.add_argument("--export", dest="export_file", required=False, default=None, help="Provide the path to a JSON database file the database is exported to")
+
+    # Read arguments from the command line
+    args = parser.parse_args()
+
+    with RecordStore(args.database_file) as store:
+        for update_file in args.update_files:
+            count = store.upsert(read_items(update_file))
+            print(f"Upserted {count} records from {update_file}")
+        print(f"The database has {len(store)} records")
+
+    if args.export_file:
+        count = database_to_json(args.database_file, args.export_file)
+        print(f"Exported {count} records to {args.export_file}")
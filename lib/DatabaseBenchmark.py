@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+'''
+This script compares the formats and compressions of the database (see DatabaseStore and Compression). The database is
+written in every format, then every file is scanned like the scripts scan the database: the PMIDs, titles and abstracts of all
+records are read. For every format the size on disk, the time to write it and the time and throughput of the scan are printed.
+The throughput is the size of the uncompressed JSON database divided by the scan time, the bytes read is the size on disk.
+
+The files are read right after they were written, so they are likely in the page cache of the operating system. On network
+storage the files are read from the network, where a smaller file is read faster. Run the script on the storage of the
+pipeline, or drop the page cache between the runs, to see the effect of the compression on the I/O.
+
+The script has one required argument and four optional arguments. ::
+
+    Required:
+
+    -d : The path to the database
+
+    Optional:
+    -o : The path to a folder for the files, by default a temporary folder that is removed afterwards
+    --formats: The formats to compare (default json json.gz json.zst jsonl jsonl.gz jsonl.zst)
+    --level: The compression level, by default the default level of gzip (6) and Zstandard (3)
+    --workers: Number of processes that parse a JSON Lines database (default 1)
+
+    Usage:
+
+    python3 DatabaseBenchmark.py -d ../example/demo_database.json
+    python3 DatabaseBenchmark.py -d database.json --formats json.gz jsonl.zst --level 10 --workers 8
+
+'''
+
+# Import the required libraries
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.DatabaseStore import database_to_json, read_records
+
+# The formats that are compared by default
+FORMATS = ["json", "json.gz", "json.zst", "jsonl", "jsonl.gz", "jsonl.zst"]
+
+def benchmark_formats(database_file: str, output_folder: str, formats: list = FORMATS, level: int | None = None,
+                      workers: int = 1) -> list:
+    # Make docstring with rst syntax
+    '''
+    Write the database in every format and time a scan of the titles and abstracts of every file.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the database\n
+    - output_folder: The path to the folder for the files\n
+    - formats: A list with the formats, an extension like jsonl.zst\n
+    - level: The compression level of the compressed formats\n
+    - workers: The number of processes that parse a JSON Lines database\n
+    \n
+    Returns:\n
+    - results: A list with a dictionary for every format with the format, file, records, size, compression ratio, write and
+      scan time and throughput in MB/s
+    '''
+
+    os.makedirs(output_folder, exist_ok=True)
+    results = []
+    for extension in formats:
+        path = os.path.join(output_folder, "database." + extension)
+
+        start = time.perf_counter()
+        database_to_json(database_file, path, level=level)
+        write_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        records = sum(1 for item in read_records(path, columns=['title', 'abstract'], workers=workers))
+        scan_time = time.perf_counter() - start
+
+        results.append({
+            "format": extension,
+            "file": path,
+            "records": records,
+            "size": os.path.getsize(path),
+            "write_time": write_time,
+            "scan_time": scan_time
+            })
+
+    # The ratio and throughput are measured against the uncompressed JSON database
+    reference = next((result["size"] for result in results if result["format"] == "json"), None)
+    for result in results:
+        size = reference or result["size"]
+        result["ratio"] = size / result["size"] if result["size"] else 0.0
+        result["throughput"] = size / result["scan_time"] / 1e6 if result["scan_time"] else 0.0
+    return results
+
+if __name__ == "__main__":
+
+    # Create a parser object and add arguments
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-d", dest="database_file", required=True, help="Provide the path to the database")
+    parser.add_argument("-o", dest="output_folder", required=False, default=None, help="Provide the path to a folder for the files")
+    parser.add_argument("--formats", dest="formats", required=False, nargs="+", default=FORMATS, help="The formats to compare")
+    parser.add_argument("--level", dest="level", required=False, type=int, default=None, help="The compression level")
+    parser.add_argument("--workers", dest="workers", required=False, type=int, default=1, help="Number of processes that parse a JSON Lines database")
+
+    # Read arguments from the command line
+    args = parser.parse_args()
+
+    output_folder = args.output_folder or tempfile.mkdtemp()
+    try:
+        results = benchmark_formats(args.database_file, output_folder, args.formats, args.level, args.workers)
+    finally:
+        if args.output_folder is None:
+            shutil.rmtree(output_folder)
+
+    print(f"{'format':<12}{'records':>10}{'size MB':>10}{'ratio':>8}{'write s':>10}{'scan s':>10}{'MB/s':>10}")
+    for result in results:
+        print(f"{result['format']:<12}{result['records']:>10}{result['size'] / 1e6:>10.1f}{result['ratio']:>8.2f}"
+              f"{result['write_time']:>10.2f}{result['scan_time']:>10.2f}{result['throughput']:>10.1f}")
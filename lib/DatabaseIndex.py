@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+'''
+This module keeps a sidecar file next to a JSON database with the PMIDs in the database, so scripts can check which PMIDs
+are already in the database without streaming the whole database.
+The sidecar has the same name as the database with the extension .pmids added. It is a tab-delimited txt file where the
+first line holds the size and modification time of the database it was built from, and every other line holds a PMID and
+the date its record was retrieved. ::
+
+    #495670	1710000000.0
+    30849355	2024/03/17
+    30815354	2024/03/17
+    30815353	
+
+The date is taken from the retrieved field of the record. Records without it get an empty date: when they were retrieved is
+unknown, so they count as the oldest records. The modification date of the database is not used, as any rewrite of the database
+(a merge, sharding or a conversion) would make these records look new.
+The sidecar is rebuilt automatically when the database changes. JSON Lines, Parquet and sharded databases are read through DatabaseStore,
+SQLite databases find their PMIDs through their primary key and do not get a sidecar. A sharded database is checked against
+its manifest, which is rewritten every time the database is sharded.
+'''
+
+# Import the required libraries
+import ijson
+import os
+
+from lib.Compression import open_file
+from lib.DatabaseStore import MANIFEST_FILE, is_jsonl, is_parquet, is_sharded, is_sqlite, read_records
+
+def database_signature(database_file: str) -> str:
+    # Make docstring with rst syntax
+    '''
+    Get the signature of a database file, used to check if a sidecar file is still valid.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the database file\n
+    \n
+    Returns:\n
+    - signature: The size and modification time of the file
+    '''
+
+    if is_sharded(database_file):
+        database_file = os.path.join(database_file, MANIFEST_FILE)
+    stat = os.stat(database_file)
+    return f"{stat.st_size}\t{stat.st_mtime}"
+
+def build_pmids(database_file: str) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Stream over the database and collect the PMIDs and retrieval dates, without building the records.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the database file\n
+    \n
+    Returns:\n
+    - pmids: A dictionary with the PMIDs as keys and the retrieval dates (YYYY/MM/DD, empty when unknown) as values
+    '''
+
+    pmids = {}
+    if is_parquet(database_file) or is_sqlite(database_file) or is_sharded(database_file) or is_jsonl(database_file):
+        # Only the pmid and retrieved columns are read
+        for item in read_records(database_file, columns=['retrieved']):
+            pmids[item['pmid']] = item['retrieved'] or ""
+        return pmids
+
+    pmid, retrieved = None, None
+    with open_file(database_file, 'rb') as file:
+        # Only look at the pmid and retrieved fields of every item
+        for prefix, event, value in ijson.parse(file):
+            if prefix == 'item.pmid':
+                pmid = value
+            elif prefix == 'item.retrieved':
+                retrieved = value
+            elif prefix == 'item' and event == 'end_map':
+                if pmid is not None:
+                    pmids[pmid] = retrieved or ""
+                pmid, retrieved = None, None
+    return pmids
+
+def load_pmids(database_file: str) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Load the PMIDs of a database from its sidecar file, the sidecar is (re)built when it is missing or out of date.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the database file\n
+    \n
+    Returns:\n
+    - pmids: A dictionary with the PMIDs as keys and the retrieval dates (YYYY/MM/DD, empty when unknown) as values
+    '''
+
+    if is_sqlite(database_file):
+        return build_pmids(database_file)
+
+    sidecar = database_file + ".pmids"
+    signature = database_signature(database_file)
+
+    if os.path.exists(sidecar):
+        with open(sidecar, 'r') as file:
+            if file.readline().rstrip("\n") == "#" + signature:
+                return dict(line.rstrip("\n").split("\t") for line in file)
+
+    pmids = build_pmids(database_file)
+
+    with open(sidecar + ".tmp", 'w') as file:
+        file.write("#" + signature + "\n")
+        for pmid, retrieved in pmids.items():
+            file.write(f"{pmid}\t{retrieved}\n")
+    os.replace(sidecar + ".tmp", sidecar)
+
+    return pmids
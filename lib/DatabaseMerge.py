@@ -1,30 +1,76 @@
 #!/usr/bin/env python
 
 '''
-This script is used to update the PMID JSON file with additional information from a tab-delimited txt file.
-The script has three required arguments. ::
+This script is used to update the PMID JSON file with additional information from one or more JSON files with PMIDs as keys.
+All update files are merged in a single pass over the database, so OpenAlex information, new records and tags can be added at
+once. The database is streamed and written item by item, so memory use does not grow with the size of the database.
+The files can be JSON or JSON Lines and can be compressed with gzip (.gz) or Zstandard (.zst), see Compression.
+The script has three required arguments and one optional argument. ::
 
     Required:
     
     -j : The path to the current JSON file
-    -u : The path to the file with additional information
+    -u : The paths to one or more files with additional information
     -o : The name of the output JSON file
+
+    Optional:
+    --level: The compression level of a compressed output file
     
     Usage:
     
     python3 DatabaseMerge.py -j ../example/demo_database.json -u ../example/tagged_abstracts.json -o ../YOUR_FOLDER/demo_database_merge.json
+    python3 DatabaseMerge.py -j database.json -u openalex.json tagged_abstracts.json -o database_merge.json
     
 '''
 
 # Import the required libraries
-import ijson
 import json
 import argparse
+import os
+import sqlite3
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.DatabaseStore import read_items, read_records
+from lib.Medline2JSON import JSONStreamWriter
+
+def index_updates(connection, update_files: list) -> None:
+    # Make docstring with rst syntax
+    """
+    Stream the update files into SQLite tables, keyed by PMID.\n
+    The updates table holds the update of every file, the pending table holds the PMIDs that were not merged yet, in the order
+    they were first seen.\n
+    \n
+    Parameters:\n
+    - connection: The SQLite connection\n
+    - update_files: A list with the paths to the update JSON files\n
+    """
+
+    connection.execute("CREATE TABLE updates (pmid TEXT NOT NULL, source INTEGER NOT NULL, value TEXT NOT NULL, PRIMARY KEY (pmid, source))")
+    connection.execute("CREATE TABLE pending (pmid TEXT PRIMARY KEY NOT NULL)")
 
-def database_merge(json_file: str, update_file: str, output_file: str) -> None:
+    for source, update_file in enumerate(update_files):
+        for value in read_items(update_file):
+            pmid = value.pop('pmid')
+            # Like json.load, the last value of a PMID that occurs twice in a file is used
+            connection.execute("INSERT OR REPLACE INTO updates VALUES (?, ?, ?)", (pmid, source, json.dumps(value)))
+            connection.execute("INSERT OR IGNORE INTO pending VALUES (?)", (pmid,))
+    connection.commit()
+
+def pending_updates(connection, pmid: str) -> list:
+    # The updates of a PMID in the order of the update files
+    return [json.loads(value) for (value,) in connection.execute("SELECT value FROM updates WHERE pmid = ? ORDER BY source", (pmid,))]
+
+def database_merge(json_file: str, update_files: str | list, output_file: str, level: int | None = None) -> int:
     # Make docstring with rst syntax
     """
-    Update the main database JSON file with the information from another update JSON file. Save it back to a new updated database JSON file.\n
+    Update the main database JSON file with the information from one or more update JSON files. Save it back to a new updated database JSON file.\n
+    The database is streamed, every item is written to the output file as soon as it is read and updated. The update files are
+    indexed by PMID in a temporary SQLite file, so neither the database nor the updates have to fit in memory.\n
+    The updates are applied in the order of the update files, a later file overwrites the fields of an earlier file. Updates
+    of PMIDs that are not in the database are added at the end of the database.\n
     The main database JSON file is expected to have the structure:\n
     \n
     .. code-block:: json
@@ -59,72 +105,61 @@ def database_merge(json_file: str, update_file: str, output_file: str) -> None:
     \n
     Parameters:\n
     - json_file: The path to the current JSON file\n
-    - update_file: The path to the file with additional information\n
-    - output_file: The name of the output JSON file
+    - update_files: The path to the file with additional information, or a list of paths\n
+    - output_file: The name of the output JSON file\n
+    - level: The compression level of a compressed output file\n
     \n
     Returns:\n
-    - None
+    - count: The number of items in the output file
     """
     
-    # Check if output file exists, if so, remove it
-    try:
-        with open(output_file, 'r') as file:
-            pass
-        with open(output_file, 'w') as file:
-            pass
-    except FileNotFoundError:
-        with open(output_file, 'w') as file:
-            pass    
-    
-    # Load the update json file
-    with open(update_file, 'r') as file:
-        update_data = json.load(file)
-            
-    # Create an empty list to store the updated JSON objects
-    output_list = []
-
-    # Stream over the JSON file
-    with open(json_file, 'rb') as file:
-        # Create a parser object over the JSON file
-        parser = ijson.items(file, 'item')
-        
-        # Iterate over the JSON objects
-        for item in parser:
-            # Check if the PMID is in the update data
-            if item['pmid'] in update_data.keys():
+    if isinstance(update_files, str):
+        update_files = [update_files]
+
+    # A temporary SQLite database on disk, it is removed when the connection is closed
+    connection = sqlite3.connect("")
+    index_updates(connection, update_files)
+
+    count = 0
+    with JSONStreamWriter(output_file, level=level) as writer:
+        # Stream over the database
+        for item in read_records(json_file):
+            # Check if the PMID is in the update data, only the first item of a PMID is updated
+            if connection.execute("SELECT 1 FROM pending WHERE pmid = ?", (item['pmid'],)).fetchone() is not None:
                 # Update the JSON object with the new data
-                item.update(update_data[item['pmid']])      
-                # Add updated key to update data
-                update_data.pop(item['pmid'])          
-            
-            # Append the JSON object to the output list, whether it was updated or not
-            output_list.append(item)
-            
-        # Append the remaining update data to the output list
-        for key, value in update_data.items():
-            # Add the PMID to the dictionary as first key
-            value['pmid'] = key
-            
-            # Append the updated JSON object to the output list
-            output_list.append(value)
-         
-        # Append the updated JSON object to the output file
-        with open(output_file, 'a') as outfile:
-            json.dump(output_list, outfile, indent=4)
-                
-                
-    
+                for value in pending_updates(connection, item['pmid']):
+                    item.update(value)
+                connection.execute("DELETE FROM pending WHERE pmid = ?", (item['pmid'],))
+
+            # Write the JSON object to the output file, whether it was updated or not
+            writer.add(item)
+            count += 1
+
+        # Append the remaining update data to the output file
+        for (pmid,) in connection.execute("SELECT pmid FROM pending ORDER BY rowid").fetchall():
+            value = {}
+            for update in pending_updates(connection, pmid):
+                value.update(update)
+            # Add the PMID to the dictionary
+            value['pmid'] = pmid
+            writer.add(value)
+            count += 1
+
+    connection.close()
+    return count
+
 
 if __name__ == "__main__":
     
     # Create a parser object and add arguments
     parser=argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("-j", dest="json_file", required=True, help="Provide the path to the PMID JSON file")
-    parser.add_argument("-u", dest="update_file", required=True, help="Provide the path to the update dict file")
+    parser.add_argument("-u", dest="update_files", required=True, nargs="+", help="Provide the paths to one or more update dict files")
     parser.add_argument("-o", dest="output_file", required=True, help="Provide the name of the output file")
+    parser.add_argument("--level", dest="level", required=False, type=int, default=None, help="The compression level of a compressed output file")
 
     # Read arguments from the command line
     args=parser.parse_args()
 
     # Call the function
-    database_merge(json_file=args.json_file, update_file=args.update_file, output_file=args.output_file)
+    database_merge(json_file=args.json_file, update_files=args.update_files, output_file=args.output_file, level=args.level)
@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+
+'''
+This module keeps an offset index next to a JSON database, so a few records can be read without streaming the whole database.
+The index has the same name as the database with the extension .offsets added. It is a binary file with a header that holds the
+size and modification time of the database it was built from, followed by one entry per PMID with the byte offset and length of
+its item in the database. The entries are sorted by PMID, so a PMID is found with a binary search in the memory mapped file. ::
+
+    header:  b"PMIDOFS1", database size, database modification time
+    entry:   PMID (8 bytes), offset (8 bytes), length (4 bytes)
+
+Databases written by json.dump with indent=4 or by JSONStreamWriter are indexed with a regular expression over the raw file,
+in a JSON Lines database every line is an item and other JSON layouts are scanned token by token. A database with the PMIDs as
+keys (dict layout) is indexed like a list of items, its records get the pmid back when they are read. The index is rebuilt
+automatically when the database changes. When a PMID occurs more than once in the database every item is indexed and read,
+like a scan of the database would. A compressed database can not be read from an offset and is not indexed.
+
+DatabaseStore.read_records uses the index for a set of PMIDs when the database has an up to date index, so the scripts that
+read the records of a PMID file get them without a full scan. The index is built by running this module on the database. ::
+
+    Required:
+
+    -j : The path to the JSON database file
+
+    Usage:
+
+    python3 DatabaseOffsets.py -j ../example/demo_database.json
+'''
+
+# Import the required libraries
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.Compression import compression_of
+
+# The header and entries of the index file
+MAGIC = b"PMIDOFS1"
+HEADER = struct.Struct("<8sQd")
+ENTRY = struct.Struct("<QQI")
+
+# An item of an indent=4 database starts and ends on its own line, the pmid is a key on the line below
+ITEM_START = re.compile(rb'\n    \{\n')
+ITEM_END = re.compile(rb'\n    \}')
+PMID_KEY = re.compile(rb'\n        "pmid": ("[^"\\]*(?:\\.[^"\\]*)*")')
+
+# An item of an indent=4 dict layout starts with its PMID as key
+DICT_ITEM_START = re.compile(rb'\n    ("[^"\\]*(?:\\.[^"\\]*)*"): \{\n')
+
+# JSONStreamWriter writes the pmid as first key of a JSON Lines item
+LINE_PMID = re.compile(rb'\{"pmid": ?("[^"\\]*(?:\\.[^"\\]*)*")')
+
+# The tokens that change the depth of other JSON layouts, strings are matched as a whole so brackets in text are skipped
+TOKENS = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]')
+
+def is_lines(data) -> bool:
+    # Make docstring with rst syntax
+    '''
+    Check if a database is a JSON Lines file: its first line is a complete item with a pmid. A dict layout starts with { too,
+    but its first line is not a complete item or has PMIDs as keys.\n
+    \n
+    Parameters:\n
+    - data: The database as bytes or a memory map\n
+    \n
+    Returns:\n
+    - lines: True for a JSON Lines database
+    '''
+
+    if data[:1] != b"{":
+        return False
+    if LINE_PMID.match(data):
+        return True
+    end = data.find(b"\n")
+    try:
+        item = json.loads(data[:end if end != -1 else len(data)])
+    except ValueError:
+        return False
+    return isinstance(item, dict) and 'pmid' in item
+
+def scan_items(data) -> list:
+    # Make docstring with rst syntax
+    '''
+    Find the byte offset, length and PMID of every item of a JSON database. The item of a dict layout starts at its key, so it
+    is read as "PMID": {...}.\n
+    \n
+    Parameters:\n
+    - data: The database (JSON or JSON Lines) as bytes or a memory map\n
+    \n
+    Returns:\n
+    - items: A list of (PMID, offset, length) tuples in the order of the database
+    '''
+
+    items = []
+    if is_lines(data):
+        # JSON Lines: every line that is not empty is an item
+        start, size = 0, len(data)
+        while start < size:
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = size
+            if data[start:end].strip():
+                match = LINE_PMID.match(data, start, end)
+                pmid = json.loads(match.group(1)) if match else json.loads(data[start:end])['pmid']
+                items.append((pmid, start, end - start))
+            start = end + 1
+        return items
+
+    if data[:7] == b"[\n    {":
+        # Fast path for indent=4 databases: strings can not hold a raw newline, so these lines only occur around items
+        starts = [match.end() - 2 for match in ITEM_START.finditer(data)]
+        ends = [match.end() for match in ITEM_END.finditer(data)]
+        if len(starts) == len(ends):
+            for start, end in zip(starts, ends):
+                match = PMID_KEY.search(data, start, end)
+                pmid = json.loads(match.group(1)) if match else json.loads(data[start:end])['pmid']
+                items.append((pmid, start, end - start))
+            return items
+
+    if data[:7] == b"{\n    \"":
+        # Fast path for indent=4 dict layouts, the same lines with the PMID as key
+        starts = list(DICT_ITEM_START.finditer(data))
+        ends = [match.end() for match in ITEM_END.finditer(data)]
+        if len(starts) == len(ends):
+            for start, end in zip(starts, ends):
+                items.append((json.loads(start.group(1)), start.start(1), end - start.start(1)))
+            return items
+
+    # Any other layout: follow the depth of the brackets, a string at depth 1 of a dict layout is the key of the next item
+    depth, start, key = 0, None, None
+    dict_layout = data[:1] == b"{"
+    for match in TOKENS.finditer(data):
+        token = match.group()
+        if token in (b"{", b"["):
+            depth += 1
+            if depth == 2 and token == b"{" and not dict_layout:
+                start = match.start()
+        elif token in (b"}", b"]"):
+            if depth == 2 and token == b"}":
+                if dict_layout:
+                    items.append((json.loads(key.group()), key.start(), match.end() - key.start()))
+                else:
+                    items.append((json.loads(data[start:match.end()])['pmid'], start, match.end() - start))
+            depth -= 1
+        elif depth == 1 and dict_layout:
+            key = match
+    return items
+
+def build_offsets(database_file: str) -> None:
+    # Make docstring with rst syntax
+    '''
+    Build the offset index of a JSON database.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the JSON database file\n
+    '''
+
+    if compression_of(database_file):
+        raise ValueError(f"Can not index the compressed database {database_file}")
+
+    stat = os.stat(database_file)
+    items = []
+    if stat.st_size > 0:
+        with open(database_file, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            items = scan_items(data)
+
+    # Keep every item of a PMID, sorted by PMID and then by offset
+    entries = []
+    for pmid, offset, length in items:
+        if not str(pmid).isdigit():
+            raise ValueError(f"Can not index the PMID {pmid!r} of {database_file}, PMIDs must be numbers")
+        entries.append((int(pmid), offset, length))
+    entries.sort()
+
+    index_file = database_file + ".offsets"
+    with open(index_file + ".tmp", 'wb') as file:
+        file.write(HEADER.pack(MAGIC, stat.st_size, stat.st_mtime))
+        for entry in entries:
+            file.write(ENTRY.pack(*entry))
+    os.replace(index_file + ".tmp", index_file)
+
+def offsets_valid(database_file: str) -> bool:
+    # Make docstring with rst syntax
+    '''
+    Check if a database has an offset index that was built from its current content.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the JSON database file\n
+    \n
+    Returns:\n
+    - valid: True if the index exists and the size and modification time of the database match its header
+    '''
+
+    index_file = database_file + ".offsets"
+    if compression_of(database_file) or not os.path.exists(index_file):
+        return False
+    stat = os.stat(database_file)
+    with open(index_file, 'rb') as file:
+        header = file.read(HEADER.size)
+    return len(header) == HEADER.size and HEADER.unpack(header) == (MAGIC, stat.st_size, stat.st_mtime)
+
+class OffsetIndex:
+    # Make docstring with rst syntax
+    '''
+    The offset index of a JSON database, it is (re)built when it is missing or out of date.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the JSON database file\n
+    '''
+
+    def __init__(self, database_file: str) -> None:
+        self.database_file = database_file
+        self.index_file = database_file + ".offsets"
+
+        if not offsets_valid(database_file):
+            build_offsets(database_file)
+
+        with open(self.index_file, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = (len(self.data) - HEADER.size) // ENTRY.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.data.close()
+
+    def __len__(self) -> int:
+        # The number of items, a PMID that occurs more than once is counted for every item
+        return self.count
+
+    def __contains__(self, pmid: str) -> bool:
+        return self.find(pmid) is not None
+
+    def find(self, pmid: str) -> tuple | None:
+        # Make docstring with rst syntax
+        '''
+        Find the first item of a PMID with a binary search.\n
+        \n
+        Parameters:\n
+        - pmid: The PMID\n
+        \n
+        Returns:\n
+        - location: A tuple with the byte offset and length of the item, or None if the PMID is not in the database
+        '''
+
+        locations = self.find_all(pmid)
+        return locations[0] if locations else None
+
+    def find_all(self, pmid: str) -> list:
+        # Make docstring with rst syntax
+        '''
+        Find every item of a PMID with a binary search.\n
+        \n
+        Parameters:\n
+        - pmid: The PMID\n
+        \n
+        Returns:\n
+        - locations: A list with a tuple with the byte offset and length of every item, in the order of the database
+        '''
+
+        if not str(pmid).isdigit():
+            return []
+        key = int(pmid)
+
+        # Find the first entry of the PMID, its other entries follow it
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if ENTRY.unpack_from(self.data, HEADER.size + middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        locations = []
+        while low < self.count:
+            entry_pmid, offset, length = ENTRY.unpack_from(self.data, HEADER.size + low * ENTRY.size)
+            if entry_pmid != key:
+                break
+            locations.append((offset, length))
+            low += 1
+        return locations
+
+def get_records(database_file: str, pmids) -> list:
+    # Make docstring with rst syntax
+    '''
+    Read the records of a set of PMIDs from a JSON database, by seeking to their items instead of streaming the database.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the JSON database file\n
+    - pmids: A collection of PMIDs\n
+    \n
+    Returns:\n
+    - records: A list with every record of the PMIDs that are in the database, in the order of the database
+    '''
+
+    pmids = set(pmids)
+    with OffsetIndex(database_file) as index:
+        # Sorted by offset, so the database is read from front to back
+        locations = sorted({location for pmid in pmids for location in index.find_all(pmid)})
+
+    records = []
+    with open(database_file, 'rb') as file:
+        for offset, length in locations:
+            file.seek(offset)
+            data = file.read(length)
+            if data[:1] == b'"':
+                # An item of a dict layout, the PMID is its key
+                ((pmid, value),) = json.loads(b"{" + data + b"}").items()
+                record = {'pmid': pmid, **value}
+            else:
+                record = json.loads(data)
+            # PMIDs are indexed as numbers, so 0123 would find 123
+            if record['pmid'] in pmids:
+                records.append(record)
+    return records
+
+if __name__ == "__main__":
+
+    # Create a parser object and add arguments
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-j", dest="json_file", required=True, help="Provide the path to the JSON database file")
+
+    # Read arguments from the command line
+    args = parser.parse_args()
+
+    build_offsets(args.json_file)
+    with OffsetIndex(args.json_file) as index:
+        print(f"Indexed {len(index)} PMIDs in {index.index_file}")
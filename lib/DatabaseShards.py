@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+
+'''
+This script splits the database in shards and joins the shards back to one database, so the per-record scripts (PMID2Embed,
+PMID2Tags, Title2Flags, PMID2BOW and PMID2Tfidf or PMID2Doc2Vec with a trained model) can run on several cores or machines.
+
+A sharded database is a folder with N JSON or JSON Lines databases and a manifest.json. The records are partitioned by the
+hash of their PMID (records are spread evenly, see DatabaseStore.shard_of) or by PMID range (every shard holds a range of
+PMIDs). The manifest holds the partitioning, the range boundaries and for every shard its file, number of records and SHA-256 checksum. ::
+
+    shards/manifest.json
+    shards/shard-00000-of-00008.json
+    ...
+    shards/shard-00007-of-00008.json
+
+The scripts read a sharded database like a single database. With the option --shard i/N a script only reads its part of the
+database, the results of the N parts are joined in order of i with --concat. JSON results (a list or PMIDs as keys) and NPZ
+results (the arrays are concatenated) can be joined. ::
+
+    Required (one of):
+
+    -i : The path to the database to shard, or the folder of a sharded database to join to one database file
+    --verify: The folder of a sharded database, the shards are checked against the checksums of the manifest
+    --concat: The paths to the result files of the shards, in order of the shards
+
+    Optional:
+    -o : The path to the output folder of the shards, or to the output file of the database or the joined results
+    -n : Number of shards (default 8)
+    --partition: hash or range (default hash)
+    --format: The format of the shards: json, jsonl, or either with .gz or .zst for compressed shards (default json)
+    --level: The compression level of compressed shards or a compressed output file
+
+    Usage:
+
+    python3 DatabaseShards.py -i ../example/demo_database.json -o ../YOUR_FOLDER/shards -n 4
+    python3 PMID2Tags.py -j ../YOUR_FOLDER/shards -k keywords.json -o tags-0.json --shard 0/4
+    python3 DatabaseShards.py --concat tags-0.json tags-1.json tags-2.json tags-3.json -o tags.json
+    python3 DatabaseShards.py -i ../YOUR_FOLDER/shards -o ../YOUR_FOLDER/demo_database.json
+
+'''
+
+# Import the required libraries
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.DatabaseStore import MANIFEST_FILE, is_sharded, json_layout, load_manifest, read_items, read_records, shard_of
+from lib.Medline2JSON import JSONStreamWriter
+
+def file_checksum(path: str) -> str:
+    # Make docstring with rst syntax
+    '''
+    Calculate the SHA-256 checksum of a file.\n
+    \n
+    Parameters:\n
+    - path: The path to the file\n
+    \n
+    Returns:\n
+    - checksum: The checksum as a hexadecimal string
+    '''
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def range_boundaries(database_file: str, shards: int) -> list:
+    # Make docstring with rst syntax
+    '''
+    Find the PMID boundaries that split a database in shards with about the same number of records.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the database\n
+    - shards: The number of shards\n
+    \n
+    Returns:\n
+    - boundaries: A list with the first PMID (as a number) of shard 1 to N - 1
+    '''
+
+    pmids = []
+    for item in read_records(database_file, columns=['pmid']):
+        if not str(item['pmid']).isdigit():
+            raise ValueError(f"Can not partition the PMID {item['pmid']!r} by range, PMIDs must be numbers")
+        pmids.append(int(item['pmid']))
+    pmids.sort()
+
+    if not pmids:
+        return [0] * (shards - 1)
+    return [pmids[len(pmids) * number // shards] for number in range(1, shards)]
+
+def shard_database(database_file: str, output_folder: str, shards: int, partition: str = "hash", extension: str = ".json",
+                   level: int | None = None) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Split a database in shards. The database is streamed once (twice for a range partitioning), the records keep their order
+    within a shard.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the database\n
+    - output_folder: The path to the folder of the sharded database, it is created when it does not exist\n
+    - shards: The number of shards\n
+    - partition: hash to partition by the hash of the PMIDs, range to partition by PMID range\n
+    - extension: The extension of the shard files, .json for JSON or .jsonl for JSON Lines, with .gz or .zst to compress them\n
+    - level: The compression level of compressed shards\n
+    \n
+    Returns:\n
+    - manifest: The manifest of the sharded database
+    '''
+
+    if partition not in ["hash", "range"]:
+        raise ValueError("Invalid partition. Please use hash or range")
+    if shards < 1:
+        raise ValueError("The number of shards must be at least 1")
+
+    boundaries = range_boundaries(database_file, shards) if partition == "range" else None
+
+    os.makedirs(output_folder, exist_ok=True)
+    files = [f"shard-{number:05d}-of-{shards:05d}{extension}" for number in range(shards)]
+    counts = [0] * shards
+    with contextlib.ExitStack() as stack:
+        writers = [stack.enter_context(JSONStreamWriter(os.path.join(output_folder, name), level=level)) for name in files]
+        for item in read_records(database_file):
+            number = shard_of(item['pmid'], shards, boundaries)
+            # Records with the same PMID are all kept, they end up in the same shard
+            writers[number].add(item)
+            counts[number] += 1
+
+    manifest = {
+        "partition": partition,
+        "records": sum(counts),
+        "shards": [
+            {"file": name, "records": count, "sha256": file_checksum(os.path.join(output_folder, name))}
+            for name, count in zip(files, counts)
+            ]
+        }
+    if boundaries is not None:
+        manifest["boundaries"] = boundaries
+
+    # The manifest is written last, a folder without one is not read as a sharded database
+    manifest_file = os.path.join(output_folder, MANIFEST_FILE)
+    with open(manifest_file + ".tmp", 'w') as file:
+        json.dump(manifest, file, indent=4)
+    os.replace(manifest_file + ".tmp", manifest_file)
+    return manifest
+
+def verify_shards(database_folder: str) -> list:
+    # Make docstring with rst syntax
+    '''
+    Check the shards of a sharded database against the checksums of the manifest.\n
+    \n
+    Parameters:\n
+    - database_folder: The path to the folder of the sharded database\n
+    \n
+    Returns:\n
+    - invalid: A list with the files of the shards that are missing or changed
+    '''
+
+    invalid = []
+    for shard in load_manifest(database_folder)["shards"]:
+        path = os.path.join(database_folder, shard["file"])
+        if not os.path.exists(path) or file_checksum(path) != shard["sha256"]:
+            invalid.append(shard["file"])
+    return invalid
+
+def unshard_database(database_folder: str, output_file: str, level: int | None = None) -> int:
+    # Make docstring with rst syntax
+    '''
+    Join the shards of a sharded database to one JSON database, in the order of the shards.\n
+    \n
+    Parameters:\n
+    - database_folder: The path to the folder of the sharded database\n
+    - output_file: The path to the output JSON or JSON Lines database file\n
+    - level: The compression level of a compressed output file\n
+    \n
+    Returns:\n
+    - count: The number of records that were written
+    '''
+
+    count = 0
+    with JSONStreamWriter(output_file, level=level) as writer:
+        for item in read_records(database_folder):
+            writer.add(item)
+            count += 1
+    return count
+
+def concat_results(result_files: list, output_file: str) -> int:
+    # Make docstring with rst syntax
+    '''
+    Join the results of the shards of a script, in the given order. JSON files are streamed and keep their layout (a list or
+    PMIDs as keys), the arrays of NPZ files are concatenated along their first axis.\n
+    \n
+    Parameters:\n
+    - result_files: A list with the paths to the result files of the shards\n
+    - output_file: The path to the output file\n
+    \n
+    Returns:\n
+    - count: The number of items or rows that were written
+    '''
+
+    if all(path.endswith(".npz") for path in result_files):
+        arrays = {}
+        for path in result_files:
+            with np.load(path, allow_pickle=True) as data:
+                for key in data.files:
+                    arrays.setdefault(key, []).append(data[key])
+        arrays = {key: np.concatenate(values) for key, values in arrays.items()}
+        np.savez_compressed(output_file, **arrays)
+        return len(arrays["keys"]) if "keys" in arrays else 0
+
+    count = 0
+    with JSONStreamWriter(output_file, layout=json_layout(result_files[0])) as writer:
+        for path in result_files:
+            for item in read_items(path):
+                writer.add(item)
+                count += 1
+    return count
+
+if __name__ == "__main__":
+
+    # Create a parser object and add arguments
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-i", dest="input_file", required=False, default=None, help="Provide the path to the database, or the folder of a sharded database")
+    parser.add_argument("-o", dest="output_file", required=False, default=None, help="Provide the path to the output folder or file")
+    parser.add_argument("-n", dest="shards", required=False, type=int, default=8, help="Number of shards")
+    parser.add_argument("--partition", dest="partition", required=False, default="hash", choices=["hash", "range"], help="Partition the records by PMID hash or PMID range")
+    parser.add_argument("--format", dest="format", required=False, default="json", choices=["json", "jsonl", "json.gz", "jsonl.gz", "json.zst", "jsonl.zst"], help="The format of the shards")
+    parser.add_argument("--level", dest="level", required=False, type=int, default=None, help="The compression level of compressed files")
+    parser.add_argument("--verify", dest="verify_folder", required=False, default=None, help="Provide the folder of a sharded database to check")
+    parser.add_argument("--concat", dest="result_files", required=False, nargs="+", default=None, help="Provide the paths to the result files of the shards, in order")
+
+    # Read arguments from the command line
+    args = parser.parse_args()
+
+    if args.verify_folder:
+        invalid = verify_shards(args.verify_folder)
+        for name in invalid:
+            print(f"Shard {name} is missing or does not match the manifest")
+        if invalid:
+            sys.exit(1)
+        print(f"All shards of {args.verify_folder} match the manifest")
+
+    elif args.result_files:
+        if not args.output_file:
+            parser.error("--concat needs an output file (-o)")
+        count = concat_results(args.result_files, args.output_file)
+        print(f"Joined {count} results of {len(args.result_files)} shards to {args.output_file}")
+
+    elif args.input_file:
+        if not args.output_file:
+            parser.error("-i needs an output folder or file (-o)")
+        if is_sharded(args.input_file):
+            count = unshard_database(args.input_file, args.output_file, args.level)
+            print(f"Joined {count} records to {args.output_file}")
+        else:
+            manifest = shard_database(args.input_file, args.output_file, args.shards, args.partition, "." + args.format, args.level)
+            print(f"Split {manifest['records']} records in {len(manifest['shards'])} shards in {args.output_file}")
+
+    else:
+        parser.error("Provide a database (-i), a sharded database to check (--verify) or result files (--concat)")
@@ -0,0 +1,571 @@
+#!/usr/bin/env python
+
+'''
+This module contains the shared code for reading the database. It is imported by the scripts that process the database and is
+not meant to be run on its own, the conversion between the formats is done by Database2Parquet and Database2SQLite.
+
+The database can be stored in four formats, the format is taken from the extension of the file:
+
+- JSON (any other extension): a list of records, as written by Medline2JSON and DatabaseMerge
+- JSON Lines (.jsonl or .ndjson): one compact record per line, written by the same scripts when the output file has this extension
+- Parquet (.parquet or .pq): a columnar file with a column for every field of the records
+- SQLite (.sqlite, .sqlite3 or .db): a RecordStore with one row per PMID, for databases that are updated often
+
+A database can also be split in shards by DatabaseShards. A sharded database is a folder with the shards and a manifest.json,
+it is read like a single database: the shards are streamed one after the other, in the order of the manifest.
+
+The per-record scripts take a shard of the database with the option --shard i/N, so N processes on one or more machines
+each handle a part of the records. Shard i/N of a sharded database are the shard files with a number that leaves i when divided
+by N, shard i/N of a single database file are the records with a PMID hash that leaves i when divided by N. For a database that
+was sharded by hash in a multiple of N shards both select the same records.
+
+A JSON database is parsed as a whole, even when a script only needs a few fields. A Parquet database is read column by
+column, so a script that needs the PMIDs, titles and abstracts does not read the other fields at all. When a set of PMIDs is given
+the other records are skipped by pyarrow, before they are converted to Python objects. A SQLite database finds the records
+of a set of PMIDs through its primary key, a JSON database with an offset index (see DatabaseOffsets) reads only their items.
+
+JSON and JSON Lines databases can be compressed with gzip (.gz) or Zstandard (.zst), see Compression. A JSON database can
+only be parsed from front to back. A JSON Lines database is split into byte ranges that end on a newline,
+with workers > 1 the ranges are parsed by a pool of processes, which select the requested fields and PMIDs before the records
+are sent back. The records are still returned in the order of the database.
+
+Fields with text, numbers or booleans are stored as Parquet columns of that type. Fields with lists or dictionaries (the DOI list
+of merged records, the tagging scores) and fields with mixed types are stored as JSON text and decoded while they are read.
+The names of these fields are kept in the metadata of the Parquet file. ::
+
+    for item in read_records("database.parquet", columns=["pmid", "title", "abstract"], pmids=pmids):
+        print(item["pmid"], item["title"])
+'''
+
+# Import the required libraries
+import bisect
+import ijson
+import io
+import json
+import os
+import re
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from lib.Compression import compression_of, open_file, strip_compression
+from lib.DatabaseOffsets import get_records, offsets_valid
+from lib.Medline2JSON import JSONL_EXTENSIONS, JSONStreamWriter
+from lib.RecordStore import RecordStore
+
+# Extensions of Parquet databases
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+
+# Extensions of SQLite databases
+SQLITE_EXTENSIONS = (".sqlite", ".sqlite3", ".db")
+
+# The key of the Parquet metadata with the names of the fields that are stored as JSON text
+JSON_COLUMNS_KEY = b"json_columns"
+
+# The name of the manifest of a sharded database
+MANIFEST_FILE = "manifest.json"
+
+# The size of the parts of a JSON Lines database that are parsed by one process
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# The pmid at the start of a JSON Lines record, so records of other PMIDs are skipped without parsing them
+LINE_PMID = re.compile(rb'\{"pmid": ?"([^"\\]*)"')
+
+def import_pyarrow():
+    # pyarrow is only needed for Parquet databases
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet databases need pyarrow, install it with pip install pyarrow")
+    return pyarrow
+
+def is_parquet(database_file: str) -> bool:
+    return database_file.lower().endswith(PARQUET_EXTENSIONS)
+
+def is_sqlite(database_file: str) -> bool:
+    return database_file.lower().endswith(SQLITE_EXTENSIONS)
+
+def is_jsonl(database_file: str) -> bool:
+    return strip_compression(database_file).lower().endswith(JSONL_EXTENSIONS)
+
+def is_sharded(database_file: str) -> bool:
+    return os.path.isfile(os.path.join(database_file, MANIFEST_FILE))
+
+def parse_shard(value: str) -> tuple:
+    # Make docstring with rst syntax
+    '''
+    Parse a shard option like 3/8, it is used as the type of the --shard arguments.\n
+    \n
+    Parameters:\n
+    - value: The shard as i/N, with i from 0 to N - 1\n
+    \n
+    Returns:\n
+    - shard: A tuple with the index and the number of shards
+    '''
+
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {value!r}, please use i/N, for example 0/8")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {value!r}, the index must be between 0 and N - 1")
+    return index, count
+
+def shard_of(pmid: str, shards: int, boundaries: list | None = None) -> int:
+    # Make docstring with rst syntax
+    '''
+    Find the shard of a PMID. Without boundaries the shard is the CRC32 hash of the PMID modulo the number of shards, which
+    is the same on every machine and Python version. With boundaries the PMIDs are partitioned by range.\n
+    \n
+    Parameters:\n
+    - pmid: The PMID\n
+    - shards: The number of shards\n
+    - boundaries: The first PMID (as a number) of shard 1 to N - 1, for range partitioning\n
+    \n
+    Returns:\n
+    - shard: The number of the shard, from 0 to N - 1
+    '''
+
+    if boundaries is None:
+        return zlib.crc32(str(pmid).encode()) % shards
+    if not str(pmid).isdigit():
+        raise ValueError(f"Can not partition the PMID {pmid!r} by range, PMIDs must be numbers")
+    return bisect.bisect_right(boundaries, int(pmid))
+
+def load_manifest(database_folder: str) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Read the manifest of a sharded database.\n
+    \n
+    Parameters:\n
+    - database_folder: The path to the folder of the sharded database\n
+    \n
+    Returns:\n
+    - manifest: A dictionary with the partitioning, the boundaries of a range partitioning and the shards with their file,
+      number of records and checksum
+    '''
+
+    with open(os.path.join(database_folder, MANIFEST_FILE), 'r') as file:
+        return json.load(file)
+
+def shard_files(database_folder: str, shard: tuple | None = None, pmids: set | None = None) -> list:
+    # Make docstring with rst syntax
+    '''
+    Select the shard files of a sharded database.\n
+    \n
+    Parameters:\n
+    - database_folder: The path to the folder of the sharded database\n
+    - shard: A tuple (i, N), only the shard files with a number that leaves i when divided by N, by default all shards\n
+    - pmids: A set of PMIDs, only the shard files that can hold them, by default all shards\n
+    \n
+    Returns:\n
+    - files: A list with the paths to the shard files, in the order of the manifest
+    '''
+
+    manifest = load_manifest(database_folder)
+    shards = manifest["shards"]
+    numbers = range(len(shards))
+    if shard is not None:
+        numbers = [number for number in numbers if number % shard[1] == shard[0]]
+    if pmids is not None:
+        boundaries = manifest.get("boundaries") if manifest["partition"] == "range" else None
+        wanted = {shard_of(pmid, len(shards), boundaries) for pmid in pmids if boundaries is None or str(pmid).isdigit()}
+        numbers = [number for number in numbers if number in wanted]
+    return [os.path.join(database_folder, shards[number]["file"]) for number in numbers]
+
+def read_records(database_file: str, columns: list | None = None, pmids=None, batch_size: int = 65536, shard: tuple | None = None,
+                 workers: int = 1):
+    # Make docstring with rst syntax
+    '''
+    Stream over the records of a JSON (a list of items or PMIDs as keys), Parquet, SQLite or sharded database.\n
+    Requested fields that a record does not have are None, the pmid is always part of the records.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the database file, or the folder of a sharded database\n
+    - columns: A list with the fields that are needed, by default all fields\n
+    - pmids: A collection of PMIDs, only these records are returned, by default all records\n
+    - batch_size: The number of records that are read from a Parquet or SQLite file at once\n
+    - shard: A tuple (i, N) to read shard i of N of the database (see parse_shard), by default the whole database\n
+    - workers: The number of processes that parse a JSON Lines database, None for the number of cores\n
+    \n
+    Returns:\n
+    - records: An iterator over the records as dictionaries, in the order of the database
+    '''
+
+    if columns is not None:
+        columns = ["pmid"] + [column for column in columns if column != "pmid"]
+    if pmids is not None:
+        pmids = set(pmids)
+
+    if is_sharded(database_file):
+        for path in shard_files(database_file, shard, pmids):
+            yield from read_records(path, columns, pmids, batch_size, workers=workers)
+        return
+
+    if shard is not None:
+        # A single database file is split by the hash of the PMIDs
+        index, count = shard
+        for item in read_records(database_file, columns, pmids, batch_size, workers=workers):
+            if shard_of(item['pmid'], count) == index:
+                yield item
+        return
+
+    if is_parquet(database_file):
+        yield from read_parquet(database_file, columns, pmids, batch_size)
+        return
+
+    if is_sqlite(database_file):
+        # Do not create an empty store for a path that does not exist
+        if not os.path.exists(database_file):
+            raise FileNotFoundError(f"No such database: '{database_file}'")
+        with RecordStore(database_file) as store:
+            yield from store.records(columns, pmids, batch_size)
+        return
+
+    if pmids is not None and offsets_valid(database_file):
+        # Seek to the items of the PMIDs instead of parsing the whole database
+        items = get_records(database_file, pmids)
+        for item in items:
+            if columns is not None:
+                item = {column: item.get(column) for column in columns}
+            yield item
+        return
+
+    if is_jsonl(database_file):
+        yield from read_jsonl(database_file, columns, pmids, workers)
+        return
+
+    for item in read_items(database_file):
+        if pmids is not None and item['pmid'] not in pmids:
+            continue
+        if columns is not None:
+            item = {column: item.get(column) for column in columns}
+        yield item
+
+def line_chunks(jsonl_file: str, chunk_size: int = CHUNK_SIZE) -> list:
+    # Make docstring with rst syntax
+    '''
+    Split a JSON Lines file into byte ranges of about chunk_size bytes that end on a newline.\n
+    \n
+    Parameters:\n
+    - jsonl_file: The path to the JSON Lines file\n
+    - chunk_size: The minimal size of a chunk in bytes\n
+    \n
+    Returns:\n
+    - chunks: A list of (start, end) tuples
+    '''
+
+    size = os.path.getsize(jsonl_file)
+
+    chunks = []
+    start = 0
+    with open(jsonl_file, 'rb') as handle:
+        while size - start > chunk_size:
+            handle.seek(start + chunk_size)
+            # The rest of the current line belongs to this chunk
+            handle.readline()
+            boundary = min(handle.tell(), size)
+            chunks.append((start, boundary))
+            start = boundary
+
+    if start < size:
+        chunks.append((start, size))
+    return chunks
+
+def read_jsonl_chunk(jsonl_file: str, start: int, end: int, columns: list | None, pmids: set | None) -> list:
+    # Make docstring with rst syntax
+    '''
+    Parse a byte range of a JSON Lines file, only the requested fields and PMIDs are kept.\n
+    \n
+    Parameters:\n
+    - jsonl_file: The path to the JSON Lines file\n
+    - start: The byte offset of the first line\n
+    - end: The byte offset after the last line\n
+    - columns: A list with the fields that are needed, None for all fields\n
+    - pmids: A set of PMIDs, None for all records\n
+    \n
+    Returns:\n
+    - items: A list of records as dictionaries
+    '''
+
+    with open(jsonl_file, 'rb') as handle:
+        handle.seek(start)
+        data = handle.read(end - start)
+    return parse_jsonl(data, columns, pmids)
+
+def parse_jsonl(data: bytes, columns: list | None, pmids: set | None) -> list:
+    # Make docstring with rst syntax
+    '''
+    Parse a block of JSON Lines, only the requested fields and PMIDs are kept.\n
+    \n
+    Parameters:\n
+    - data: Complete lines of a JSON Lines file\n
+    - columns: A list with the fields that are needed, None for all fields\n
+    - pmids: A set of PMIDs, None for all records\n
+    \n
+    Returns:\n
+    - items: A list of records as dictionaries
+    '''
+
+    if pmids is not None:
+        # Drop the lines of other PMIDs before they are parsed
+        encoded = {pmid.encode() for pmid in pmids}
+        lines = []
+        for line in data.split(b"\n"):
+            match = LINE_PMID.match(line)
+            if match is None or match.group(1) in encoded:
+                lines.append(line)
+        data = b"\n".join(lines)
+
+    items = []
+    if not data.strip():
+        return items
+    for item in ijson.items(io.BytesIO(data), '', multiple_values=True, use_float=True):
+        if pmids is not None and item['pmid'] not in pmids:
+            continue
+        if columns is not None:
+            item = {column: item.get(column) for column in columns}
+        items.append(item)
+    return items
+
+def line_blocks(jsonl_file: str, chunk_size: int = CHUNK_SIZE):
+    # Make docstring with rst syntax
+    '''
+    Decompress a compressed JSON Lines file in blocks of complete lines.\n
+    \n
+    Parameters:\n
+    - jsonl_file: The path to the compressed JSON Lines file\n
+    - chunk_size: The minimal size of a block in bytes\n
+    \n
+    Returns:\n
+    - blocks: An iterator over the blocks as bytes
+    '''
+
+    with open_file(jsonl_file, 'rb') as handle:
+        while True:
+            lines = handle.readlines(chunk_size)
+            if not lines:
+                return
+            yield b"".join(lines)
+
+def read_jsonl(jsonl_file: str, columns: list | None, pmids: set | None, workers: int | None = 1, chunk_size: int = CHUNK_SIZE):
+    # Make docstring with rst syntax
+    '''
+    Stream over the records of a JSON Lines database. The file is split into chunks that are parsed by a pool of processes,
+    a limited amount of chunks is parsed at once, so memory use does not depend on the size of the file. With one worker or a
+    single chunk the chunks are parsed in this process. A compressed file is decompressed in this process and its blocks of
+    lines are sent to the pool.\n
+    \n
+    Parameters:\n
+    - jsonl_file: The path to the JSON Lines file\n
+    - columns: A list with the fields that are needed, None for all fields\n
+    - pmids: A set of PMIDs, None for all records\n
+    - workers: The amount of processes, None for the number of cores\n
+    - chunk_size: The size of the chunks in bytes\n
+    \n
+    Returns:\n
+    - records: An iterator over the records as dictionaries, in the order of the file
+    '''
+
+    if compression_of(jsonl_file):
+        tasks = ((parse_jsonl, block) for block in line_blocks(jsonl_file, chunk_size))
+    else:
+        chunks = line_chunks(jsonl_file, chunk_size)
+        if len(chunks) <= 1:
+            workers = 1
+        tasks = ((read_jsonl_chunk, jsonl_file, start, end) for start, end in chunks)
+
+    if workers == 1:
+        for function, *arguments in tasks:
+            yield from function(*arguments, columns, pmids)
+        return
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for function, *arguments in tasks:
+            pending.append(executor.submit(function, *arguments, columns, pmids))
+            # Keep every process busy, but do not read ahead too far
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def read_parquet(database_file: str, columns: list | None, pmids: set | None, batch_size: int):
+    # Make docstring with rst syntax
+    '''
+    Stream over the records of a Parquet database, only the requested columns and PMIDs are read.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the Parquet file\n
+    - columns: A list with the fields that are needed, None for all fields\n
+    - pmids: A set of PMIDs, None for all records\n
+    - batch_size: The number of records that are converted at once\n
+    \n
+    Returns:\n
+    - records: An iterator over the records as dictionaries
+    '''
+
+    pa = import_pyarrow()
+    dataset = pa.dataset.dataset(database_file, format="parquet")
+    names = dataset.schema.names
+    metadata = dataset.schema.metadata or {}
+    json_columns = set(json.loads(metadata.get(JSON_COLUMNS_KEY, b"[]")))
+
+    if columns is None:
+        columns = names
+    present = [column for column in columns if column in names]
+    missing = [column for column in columns if column not in names]
+    decode = [column for column in present if column in json_columns]
+
+    # The filter is applied by pyarrow, row groups without any of the PMIDs are skipped using their statistics
+    expression = None
+    if pmids is not None:
+        expression = pa.dataset.field("pmid").isin(list(pmids))
+
+    for batch in dataset.to_batches(columns=present, filter=expression, batch_size=batch_size):
+        for item in batch.to_pylist():
+            for column in decode:
+                if item[column] is not None:
+                    item[column] = json.loads(item[column])
+            for column in missing:
+                item[column] = None
+            yield item
+
+def column_types(records) -> tuple:
+    # Make docstring with rst syntax
+    '''
+    Find the Parquet type of every field of a stream of records.\n
+    \n
+    Parameters:\n
+    - records: An iterable of records as dictionaries\n
+    \n
+    Returns:\n
+    - schema: A pyarrow schema with a column for every field, in the order the fields were first seen\n
+    - json_columns: A set with the fields that are stored as JSON text
+    '''
+
+    pa = import_pyarrow()
+    seen = {}
+    for item in records:
+        for key, value in item.items():
+            types = seen.setdefault(key, set())
+            if value is not None:
+                types.add(type(value))
+
+    fields = []
+    json_columns = set()
+    for key, types in seen.items():
+        if types <= {str}:
+            field_type = pa.string()
+        elif types == {bool}:
+            field_type = pa.bool_()
+        elif types == {int}:
+            field_type = pa.int64()
+        elif types <= {int, float}:
+            field_type = pa.float64()
+        else:
+            field_type = pa.string()
+            json_columns.add(key)
+        fields.append(pa.field(key, field_type))
+
+    schema = pa.schema(fields, metadata={JSON_COLUMNS_KEY: json.dumps(sorted(json_columns))})
+    return schema, json_columns
+
+def json_to_parquet(json_file: str, parquet_file: str, row_group_size: int = 100000) -> int:
+    # Make docstring with rst syntax
+    '''
+    Convert a JSON database to a Parquet database. The JSON file is read twice, once to find the types of the fields and once to
+    write the records, so the database never has to fit in memory.\n
+    \n
+    Parameters:\n
+    - json_file: The path to the JSON database file\n
+    - parquet_file: The path to the output Parquet file\n
+    - row_group_size: The number of records in a row group of the Parquet file\n
+    \n
+    Returns:\n
+    - count: The number of records that were written
+    '''
+
+    pa = import_pyarrow()
+    schema, json_columns = column_types(read_records(json_file))
+
+    count = 0
+    with pa.parquet.ParquetWriter(parquet_file, schema, compression="zstd") as writer:
+        batch = []
+        for item in read_records(json_file):
+            batch.append(item)
+            if len(batch) == row_group_size:
+                count += write_row_group(writer, schema, json_columns, batch)
+                batch = []
+        if batch or not count:
+            count += write_row_group(writer, schema, json_columns, batch)
+    return count
+
+def write_row_group(writer, schema, json_columns: set, batch: list) -> int:
+    pa = import_pyarrow()
+    data = {}
+    for name in schema.names:
+        values = [item.get(name) for item in batch]
+        if name in json_columns:
+            values = [json.dumps(value) if value is not None else None for value in values]
+        data[name] = values
+    writer.write_table(pa.Table.from_pydict(data, schema=schema))
+    return len(batch)
+
+def json_layout(json_file: str) -> str:
+    # A JSON Lines file holds a list of items
+    if is_jsonl(json_file):
+        return "list"
+    # Check the layout of the file from the first character
+    with open_file(json_file, 'rt') as file:
+        return "list" if file.read(64).lstrip().startswith("[") else "dict"
+
+def read_items(json_file: str):
+    # Make docstring with rst syntax
+    '''
+    Stream over the items of a JSON database (list layout), a JSON file with PMIDs as keys (dict layout), like the output of
+    NewPMID, PMID2Openalex and PMID2Tags, or a JSON Lines file.\n
+    \n
+    Parameters:\n
+    - json_file: The path to the JSON file\n
+    \n
+    Returns:\n
+    - items: An iterator over the items as dictionaries with a pmid key
+    '''
+
+    if is_jsonl(json_file):
+        yield from read_jsonl(json_file, None, None)
+        return
+
+    with open_file(json_file, 'rb') as file:
+        if json_layout(json_file) == "list":
+            yield from ijson.items(file, 'item', use_float=True)
+        else:
+            for key, value in ijson.kvitems(file, '', use_float=True):
+                yield {'pmid': key, **value}
+
+def database_to_json(database_file: str, json_file: str, level: int | None = None) -> int:
+    # Make docstring with rst syntax
+    '''
+    Convert a database to a JSON database, or to a JSON Lines database when json_file has the extension .jsonl.\n
+    Fields that a record did not have in the JSON database are written as null for Parquet, a SQLite store keeps the keys of every record.\n
+    \n
+    Parameters:\n
+    - database_file: The path to the database file\n
+    - json_file: The path to the output JSON or JSON Lines file, compressed when it ends in .gz or .zst\n
+    - level: The compression level of a compressed output file\n
+    \n
+    Returns:\n
+    - count: The number of records that were written
+    '''
+
+    count = 0
+    with JSONStreamWriter(json_file, level=level) as writer:
+        for item in read_records(database_file):
+            # Records with the same PMID are all kept, like in the original database
+            writer.add(item)
+            count += 1
+    return count
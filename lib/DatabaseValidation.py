@@ -4,166 +4,247 @@
 This script assesses a JSON database file and returns a JSON file with the multiple metrics.\n
 The metrics include the number of missing values, the number of unique values, the number of duplicates, and the number of unique values for important columns.\n
 
-The script has two required arguments. ::
+The database is streamed once, every column keeps running counts while the records are read, so the time grows linearly with
+the size of the database. The unique values are counted with a set of 64-bit hashes of the values. With --approximate the
+columns without PMID checks count their unique values with a HyperLogLog instead, which uses a fixed 16 KB per column and is
+within about 1% of the exact count. The PMID, DOI and title columns always count exactly, they list the PMIDs of their duplicates.
+
+The script has two required arguments and two optional arguments. ::
 
     Required:
     
-    -j : The path to the Database JSON file
+    -j : The path to the database, in any format read by DatabaseStore.read_records
     -o : The path to the Output JSON file
+
+    Optional:
+    -p : The path to a file with one PMID per line, to compare with the PMIDs of the database
+    --approximate: Count the unique values of the other columns with a HyperLogLog
     
     Usage:
     
     python3 DatabaseValidation.py -j ../example/demo_database.json -o ../YOUR_FOLDER/demo_output.json
+    python3 DatabaseValidation.py -j database.json -p pmids.txt -o validation.json --approximate
 '''
 
-import ijson
 import json
+import hashlib
+import math
+from collections import Counter
 from tqdm import tqdm
-import pandas as pd
+import os
+import sys
 
 import argparse
 
-def process_database(database_file: str) -> pd.DataFrame:
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.DatabaseStore import read_records
+
+# The columns of the database that are assessed
+COLUMNS = ['pmid', 'doi', 'pmcid', 'title', 'author', 'abstract', 'year', 'first_author', 'mesh', 'is_oa']
+
+# The columns that list the PMIDs of their duplicates and are compared with the PMID file
+PMID_COLUMNS = ['pmid', 'doi', 'title']
+
+# The columns with counts of their values, a value is first split on the separator
+VALUE_COUNT_SEPARATORS = {'species': '; ', 'method': ' / ', 'model': ' / '}
+
+def value_hash(value) -> int:
     # Make docstring with rst syntax
-    """
-    This function assesses the database file and returns a DataFrame with metadata information.\n
+    '''
+    Hash a value of the database to 64 bits, lists and dictionaries (like the DOIs of a merged record) are hashed by their JSON.\n
     \n
     Parameters:\n
-    - database_file: The path to the database file\n
+    - value: A value of a column\n
     \n
     Returns:\n
-    - df: A DataFrame with the following columns: pmid, doi, title, author, abstract, year, first_author, mesh, is_oa
-    """
-    df_metadata = pd.DataFrame(columns=['pmid', 'doi', 'pmcid', 'title', 'author', 'abstract', 'year', 'first_author', 'mesh', 'is_oa'])
+    - hash: The hash as an integer
+    '''
 
-    # Stream over the JSON file
-    with open(database_file, 'rb') as file:
-        # Create a parser object over the JSON file
-        parser = ijson.items(file, 'item')
-        
-        # Iterate over the JSON objects
-        for item in tqdm(parser):
-            # Create a dictionary to store the metadata
-            metadata = {'pmid': None, 'doi': None, 'pmcid': None, 'title': None, 'author': None, 'abstract': None, 'year': None, 'first_author': None, 'mesh': None, 'is_oa': None}	
-            for key in metadata.keys():
-                try:
-                    metadata[key] = item[key]
-                except KeyError:
-                    pass
-            df_metadata = df_metadata._append(metadata, ignore_index=True)
-            
-    return df_metadata
-        
-def assess_database(df: pd.DataFrame, pmid_file: str | None) -> dict:
+    data = json.dumps(value, sort_keys=True, default=str).encode()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+class HyperLogLog:
+    # Make docstring with rst syntax
+    '''
+    Estimate the number of unique values of a stream in a fixed amount of memory, with 2^precision registers of one byte.\n
+    The relative error is about 1.04 / sqrt(2^precision), 0.8% for the default precision of 14.\n
+    \n
+    Parameters:\n
+    - precision: The number of bits of the hash that select a register
+    '''
+
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, hash: int):
+        # The first bits select the register, it keeps the longest run of leading zeros of the other bits
+        bits = 64 - self.precision
+        index = hash >> bits
+        rank = bits - (hash & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def __len__(self) -> int:
+        size = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / size) * size * size / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        # Few values leave many registers empty, they are counted more precisely by the empty registers
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * math.log(size / zeros)
+        return int(round(estimate))
+
+class ColumnStats:
+    # Make docstring with rst syntax
+    '''
+    Running statistics of one column, updated once for every record while the database is streamed.\n
+    \n
+    Parameters:\n
+    - column: The name of the column\n
+    - approximate: Count the unique values with a HyperLogLog, ignored for the PMID, DOI and title columns
+    '''
+
+    def __init__(self, column: str, approximate: bool = False):
+        self.column = column
+        self.missing = 0
+        self.present = 0
+        self.duplicates = 0
+        self.duplicated_pmids = []
+        self.lengths = 0
+        self.value_counts = Counter()
+        # The PMIDs of the duplicates are only found with the exact set
+        self.exact = column in PMID_COLUMNS or not approximate
+        self.seen = set() if self.exact else HyperLogLog()
+
+    def add(self, pmid, value):
+        # Make docstring with rst syntax
+        '''
+        Add the value of a record to the statistics.\n
+        \n
+        Parameters:\n
+        - pmid: The PMID of the record\n
+        - value: The value of the column, None when it is missing
+        '''
+
+        if value is None:
+            self.missing += 1
+        else:
+            self.present += 1
+            hash = value_hash(value)
+            if not self.exact:
+                self.seen.add(hash)
+            elif hash in self.seen:
+                # The first occurrence is not a duplicate
+                self.duplicates += 1
+                if self.column in PMID_COLUMNS:
+                    self.duplicated_pmids.append(pmid)
+            else:
+                self.seen.add(hash)
+
+        # The lengths and value counts count a missing value as an empty string
+        text = "" if value is None else value
+        if self.column == 'abstract':
+            self.lengths += len(text.split())
+        elif self.column == 'mesh':
+            self.lengths += len(text.split(';'))
+        elif self.column in VALUE_COUNT_SEPARATORS:
+            self.value_counts.update(text.split(VALUE_COUNT_SEPARATORS[self.column]))
+        elif self.column == 'is_oa':
+            self.value_counts[False if text == "" else text] += 1
+
+    def report(self) -> dict:
+        # Make docstring with rst syntax
+        '''
+        Summarize the statistics of the column.\n
+        \n
+        Returns:\n
+        - metadata: A dictionary with the missing values, unique values, duplicates and the keys of the column
+        '''
+
+        unique = len(self.seen)
+        records = self.missing + self.present
+        metadata = {
+            'missing_values': self.missing,
+            'unique_values': unique,
+            'duplicates': self.duplicates if self.exact else max(self.present - unique, 0)
+            }
+
+        # Missing values are counted as empty strings, so the lists of missing PMIDs stay empty
+        if self.column in PMID_COLUMNS:
+            metadata['duplicated_pmids'] = self.duplicated_pmids
+            metadata['missing_pmids'] = []
+
+        if self.column == 'abstract':
+            # The average length of the abstracts in words (rounded to 0 decimals)
+            metadata['avg_abstract_length'] = round(self.lengths / records, 0) if records else math.nan
+            metadata['missing_pmids'] = []
+
+        if self.column == 'first_author':
+            metadata['missing_pmids'] = []
+
+        if self.column in VALUE_COUNT_SEPARATORS:
+            metadata['value_counts'] = dict(self.value_counts.most_common())
+
+        if self.column == 'mesh':
+            # The average number of mesh terms (rounded to 0 decimals)
+            metadata['avg_mesh_terms'] = round(self.lengths / records, 0) if records else math.nan
+
+        if self.column == 'is_oa':
+            metadata['is_oa'] = dict(self.value_counts.most_common())
+
+        return metadata
+
+def assess_database(database_file: str, pmid_file: str | None = None, approximate: bool = False) -> dict:
     # Make docstring with rst syntax
     """
-    This function assesses a pandas dataframe to summarize quality of the data.\n
+    This function streams the database once to summarize quality of the data.\n
     It calculates the number of missing values, the number of unique values, the number of duplicates, and the number of unique values for each column.\n
     \n
     Parameters:\n
-    - df: A pandas DataFrame\n
+    - database_file: The path to the database file\n
+    - pmid_file: The path to a file with one PMID per line, to compare with the PMIDs of the database\n
+    - approximate: Count the unique values of the columns without PMID checks with a HyperLogLog\n
     \n
     Returns:\n
     - dict_assess: A dictionary with the following general keys: column, missing_values, unique_values, duplicates. Each column also has unique keys for specific information.
     """
-    
+
+    stats = {column: ColumnStats(column, approximate) for column in COLUMNS}
+    database_pmids = {}
+
+    # Stream over the database, only the fields of the metadata are read
+    for item in tqdm(read_records(database_file, columns=COLUMNS)):
+        pmid = item.get('pmid')
+        database_pmids[pmid] = None
+        for column, column_stats in stats.items():
+            column_stats.add(pmid, item.get(column))
+
+    dict_assess = {column: column_stats.report() for column, column_stats in stats.items()}
+
     if pmid_file:
         # Load the PMID file
         with open(pmid_file, 'r') as file:
-            pmids_tocheck = file.read().splitlines()
-    
-    # Create a DataFrame to store the assessment
-    df_assessed = {column: {'missing_values': None, 'unique_values': None, 'duplicates': None} for column in df.columns}
-    
-    # Iterate over the columns
-    for column, metadata in tqdm(df_assessed.items()):
-        if column in df.columns:
-            # Calculate the number of missing values
-            metadata['missing_values'] = int(df[column].isnull().sum())
-            
-            # Calculate the number of unique values
-            metadata['unique_values'] = int(df[column].nunique())
-            
-            # Calculate the number of duplicates (exclude null values)
-            non_null_values = df[column].dropna()
-            
-            metadata['duplicates'] = int(non_null_values.duplicated().sum())
-                        
-            # Replace all None values with ""
-            df[column] = df[column].apply(lambda x: "" if x is None else x)
-            
-            # PMID, DOI, Title checks
-            if column in ['pmid', 'doi', 'title']:
-                # Get the pmids for the non-null values
-                non_null_pmids = df.loc[non_null_values.index]['pmid']
-                
-                # Provide the pmids of the duplicates (not the null values)
-                metadata['duplicated_pmids'] = non_null_pmids[non_null_values.duplicated()].tolist()
-                
-                # Provide the missing pmids
-                metadata['missing_pmids'] = df[df[column].isnull()]['pmid'].tolist()
-                
-                # Check if pmids are missing in the database based on the PMID file
-                if pmid_file:
-                    metadata['pmids_missing_database'] = list(set(pmids_tocheck) - set(df['pmid'].tolist()))
-                    
-                # Check if pmids in the database are missing in the PMID file
-                if pmid_file:
-                    metadata['pmids_extra_database'] = list(set(df['pmid'].tolist()) - set(pmids_tocheck))
-            
-            # Abstract checks
-            if column == 'abstract':
-                # Calculate the average length of the abstracts in words (rounded to 0 decimals)
-                metadata['avg_abstract_length'] = df[column].apply(lambda x: len(x.split())).mean()
-                
-                # Round to 0 decimals
-                metadata['avg_abstract_length'] = round(metadata['avg_abstract_length'], 0)
-                
-                # Provide the missing pmids
-                metadata['missing_pmids'] = df[df[column].isnull()]['pmid'].tolist()
-            
-            # First author checks
-            if column == 'first_author':
-                # Provide the missing pmids
-                metadata['missing_pmids'] = df[df[column].isnull()]['pmid'].tolist()
-            
-            # Species, tissue, model, method checks
-            if column in ['species']:
-                # Provide a count of the unique values, first split on ;
-                metadata['value_counts'] = df[column].apply(lambda x: x.split('; ')).explode().value_counts().to_dict()
-                
-            if column in ['method', 'model']:
-                # Provide a count of the unique values, first split on ;
-                metadata['value_counts'] = df[column].apply(lambda x: x.split(' / ')).explode().value_counts().to_dict()
-            
-            # Mesh checks
-            if column == 'mesh':   
-                # Provide the average number of mesh terms (first split on ;)
-                metadata['avg_mesh_terms'] = df[column].apply(lambda x: len(x.split(';'))).mean()
-                
-                # Round to 0 decimals
-                metadata['avg_mesh_terms'] = round(metadata['avg_mesh_terms'], 0)
-            
-            # Text availability checks
-            if column == 'is_oa': 
-                # Replace "" with false
-                df[column] = df[column].apply(lambda x: False if x == "" else x)
-                           
-                # Provide the count of text availability
-                metadata['is_oa'] = df[column].value_counts().to_dict()
-            
-            # Update the dictionary
-            df_assessed[column] = metadata
-            
-    return df_assessed
+            pmids_tocheck = dict.fromkeys(file.read().splitlines())
+
+        # The PMIDs of the file that are missing in the database, and the PMIDs of the database that are not in the file
+        pmids_missing_database = [pmid for pmid in pmids_tocheck if pmid not in database_pmids]
+        pmids_extra_database = [pmid for pmid in database_pmids if pmid not in pmids_tocheck]
+        for column in PMID_COLUMNS:
+            dict_assess[column]['pmids_missing_database'] = pmids_missing_database
+            dict_assess[column]['pmids_extra_database'] = pmids_extra_database
+
+    return dict_assess
 
 if __name__ == "__main__":
     
     # Create a parser object and add arguments
     parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
-    parser.add_argument("-j", dest="json_file", required=True, help="Provide the path to the Database JSON file")
+    parser.add_argument("-j", dest="json_file", required=True, help="Provide the path to the database, in any format read by DatabaseStore.read_records")
     parser.add_argument("-p", dest="pmid_file", required=False, help="Provide the path to the PMID file")
-    parser.add_argument("-o", dest="output_file", required=True, help="Provide the path to the Output CSV file")
+    parser.add_argument("-o", dest="output_file", required=True, help="Provide the path to the Output JSON file")
+    parser.add_argument("--approximate", dest="approximate", action="store_true", help="Count the unique values of the other columns with a HyperLogLog")
 
     # Read arguments from the command line
     args=parser.parse_args()
@@ -178,16 +259,11 @@ if __name__ == "__main__":
         with open(args.output_file, 'w') as file:
             pass  
         
-    print("Loading the database file...")
-        
-    # Assess the database file
-    df_processed = process_database(args.json_file)
-    
-    print("Assessing the DataFrame...")
+    print("Assessing the database file...")
     
-    # Assess the DataFrame
-    df_assessed = assess_database(df_processed, args.pmid_file)
+    # Assess the database file in one pass
+    df_assessed = assess_database(args.json_file, args.pmid_file, args.approximate)
     
-    # Save the DataFrame to a JSON file
+    # Save the assessment to a JSON file
     with open(args.output_file, 'w') as file:
-        json.dump(df_assessed, file, indent=4)
\ No newline at end of file
+        json.dump(df_assessed, file, indent=4)
@@ -0,0 +1,624 @@
+#!/usr/bin/env python
+
+'''
+This module contains the shared code for downloading records from the NCBI Entrez E-utilities.
+It is imported by the retrieval scripts (PMID2Database, NewPMID) and is not meant to be run on its own.
+
+Requests are sent by a pool of worker threads that share one token bucket. The bucket makes sure that the
+NCBI limit of 3 requests per second (10 requests per second with an API key) is respected, so the scripts
+can run at the service limit instead of sleeping between every request.
+The base URL of the E-utilities can be changed, so the fetcher can be tested against a local stand-in server.
+Records can be fetched in the MEDLINE text format or as PubMed XML. XML responses are parsed while they are read from the
+connection (see PubmedXML), so only the converted records of a batch are kept in memory.
+With a ResponseCache the responses are stored on disk and repeated requests are answered from the cache without waiting
+for the rate limit. Searches that store their results on the history server are not cached, because their WebEnv expires.
+The record batches are cached by the PMIDs they were fetched for, so a re-run with the same PMIDs does not contact NCBI at all.
+Failed requests are retried with exponential backoff. Batches that still fail are written to a journal of failed batches with
+their PMIDs, so they can be downloaded later without downloading everything again.
+'''
+
+# Import the required libraries
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+import urllib.request
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.PubmedXML import iter_pubmed_xml
+from lib.ResponseCache import ResponseCache
+
+EUTILS_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+
+class TokenBucket:
+    # Make docstring with rst syntax
+    '''
+    A thread-safe token bucket that limits the number of requests per second.\n
+    Every request takes one token, tokens are refilled at a fixed rate up to the capacity of the bucket.\n
+    \n
+    Parameters:\n
+    - rate: The number of tokens that are added per second\n
+    - capacity: The maximum number of tokens in the bucket (the maximum burst size)\n
+    '''
+
+    def __init__(self, rate: float, capacity: int = 1) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        # Make docstring with rst syntax
+        '''
+        Take a token from the bucket, block until a token is available.\n
+        '''
+
+        while True:
+            with self.lock:
+                # Refill the bucket for the time that passed since the last update
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                # Time until the next token is available
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class EntrezClient:
+    # Make docstring with rst syntax
+    '''
+    Client for the NCBI E-utilities that sends every request through a shared token bucket.\n
+    \n
+    Parameters:\n
+    - entrez_email: The email address for the NCBI API\n
+    - api_key: The NCBI API key, raises the rate limit from 3 to 10 requests per second\n
+    - base_url: The base URL of the E-utilities, change it to use a local test server\n
+    - bucket: A TokenBucket to share between clients, by default a new bucket is created\n
+    - timeout: The timeout of a single request in seconds\n
+    - cache: A ResponseCache for the responses, by default nothing is cached\n
+    - retries: The amount of times a failed batch is retried\n
+    - backoff: The maximum wait before the first retry in seconds, the maximum doubles after every retry\n
+    '''
+
+    def __init__(self, entrez_email: str, api_key: str | None = None, base_url: str = EUTILS_URL,
+                 bucket: TokenBucket | None = None, timeout: float = 120, cache: ResponseCache | None = None,
+                 retries: int = 3, backoff: float = 2) -> None:
+        self.entrez_email = entrez_email
+        self.retries = retries
+        self.backoff = backoff
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.cache = cache
+
+        # NCBI allows 10 requests per second with an API key and 3 without
+        if bucket is None:
+            bucket = TokenBucket(rate=10 if api_key else 3)
+        self.bucket = bucket
+
+    def request(self, endpoint: str, params: dict, post: bool = False, handler=None, cache_params: dict | None = None,
+                cache: bool = True):
+        # Make docstring with rst syntax
+        '''
+        Send a request to an E-utility and return the raw response.\n
+        Long requests are sent as a POST request, like Biopython does.\n
+        If the client has a cache, the response is taken from the cache when possible, without waiting for the rate limit.\n
+        \n
+        Parameters:\n
+        - endpoint: The name of the E-utility, for example efetch.fcgi\n
+        - params: A dictionary with the parameters of the request\n
+        - post: If True, always send the parameters in the body of a POST request\n
+        - handler: A function that reads the open response, by default the whole body is read\n
+        - cache_params: The parameters that identify the response in the cache, by default the parameters of the request\n
+        - cache: If False, the response is never cached\n
+        \n
+        Returns:\n
+        - data: The body of the response, or the result of the handler
+        '''
+
+        key = None
+        if self.cache is not None and cache:
+            key = self.cache.key(endpoint, params if cache_params is None else cache_params)
+            data = self.cache.get(key)
+            if data is not None:
+                return handler(io.BytesIO(data)) if handler is not None else data
+
+        params = dict(params)
+        params["tool"] = "jrcnam"
+        params["email"] = self.entrez_email
+        if self.api_key:
+            params["api_key"] = self.api_key
+
+        url = self.base_url + endpoint
+        query = urllib.parse.urlencode(params)
+
+        if post or len(query) > 1000:
+            request = urllib.request.Request(url, data=query.encode("utf-8"))
+        else:
+            request = urllib.request.Request(url + "?" + query)
+
+        # Wait for our turn before sending the request
+        self.bucket.acquire()
+        with urllib.request.urlopen(request, timeout=self.timeout) as handle:
+            if key is None:
+                return handler(handle) if handler is not None else handle.read()
+            data = handle.read()
+
+        # Only complete responses are cached
+        self.cache.put(key, data)
+        return handler(io.BytesIO(data)) if handler is not None else data
+
+    def search_history(self, pmids: list) -> tuple[str, str, int]:
+        # Make docstring with rst syntax
+        '''
+        Search a list of PMIDs and store the results on the NCBI history server.\n
+        \n
+        Parameters:\n
+        - pmids: A list of PMIDs\n
+        \n
+        Returns:\n
+        - webenv: The WebEnv of the search results\n
+        - query_key: The QueryKey of the search results\n
+        - count: The amount of records that were found
+        '''
+
+        data = self.request("esearch.fcgi", {
+            "db": "pubmed",
+            "term": ",".join(pmids),
+            "usehistory": "y"
+            }, cache=False)
+        root = ET.fromstring(data)
+
+        if root.find("ERROR") is not None:
+            raise RuntimeError(f"Entrez search failed: {root.findtext('ERROR')}")
+
+        return root.findtext("WebEnv"), root.findtext("QueryKey"), int(root.findtext("Count"))
+
+    def esearch(self, term: str, retmax: int = 0, retstart: int = 0) -> tuple[int, list]:
+        # Make docstring with rst syntax
+        '''
+        Search PubMed and return the amount of results and the PMIDs.\n
+        With retmax=0 only the amount of results is requested, without any PMIDs.\n
+        \n
+        Parameters:\n
+        - term: The search query\n
+        - retmax: The maximum amount of PMIDs to return (at most 10000)\n
+        - retstart: The index of the first PMID to return\n
+        \n
+        Returns:\n
+        - count: The amount of records that match the query\n
+        - pmids: A list of PMIDs
+        '''
+
+        params = {"db": "pubmed", "term": term, "retmax": retmax, "retstart": retstart}
+        if retmax == 0:
+            params["rettype"] = "count"
+
+        root = ET.fromstring(self.request("esearch.fcgi", params))
+
+        if root.find("ERROR") is not None:
+            raise RuntimeError(f"Entrez search failed: {root.findtext('ERROR')}")
+
+        return int(root.findtext("Count")), [element.text for element in root.iter("Id")]
+
+    def post_ids(self, pmids: list, webenv: str | None = None) -> tuple[str, str, int]:
+        # Make docstring with rst syntax
+        '''
+        Upload a list of PMIDs to the NCBI history server with EPost.\n
+        The PMIDs are sent in the body of a POST request, so the size of the list does not matter.\n
+        \n
+        Parameters:\n
+        - pmids: A list of PMIDs\n
+        - webenv: An existing WebEnv to add the PMIDs to, by default a new WebEnv is created\n
+        \n
+        Returns:\n
+        - webenv: The WebEnv that holds the PMIDs\n
+        - query_key: The QueryKey of the uploaded PMIDs\n
+        - count: The amount of uploaded PMIDs
+        '''
+
+        params = {"db": "pubmed", "id": ",".join(pmids)}
+        if webenv:
+            params["WebEnv"] = webenv
+
+        root = ET.fromstring(self.request("epost.fcgi", params, post=True, cache=False))
+
+        if root.find("ERROR") is not None:
+            raise RuntimeError(f"Entrez post failed: {root.findtext('ERROR')}")
+
+        return root.findtext("WebEnv"), root.findtext("QueryKey"), len(pmids)
+
+    def efetch(self, webenv: str, query_key: str, retstart: int, retmax: int, retmode: str = "text", block: str | None = None):
+        # Make docstring with rst syntax
+        '''
+        Fetch one batch of records from the NCBI history server.\n
+        In xml mode the response is parsed while it is read, every article is freed as soon as it is converted.\n
+        The WebEnv changes with every search, so responses are only cached when the block of PMIDs is given.\n
+        \n
+        Parameters:\n
+        - webenv: The WebEnv of the search results\n
+        - query_key: The QueryKey of the search results\n
+        - retstart: The index of the first record to fetch\n
+        - retmax: The amount of records to fetch\n
+        - retmode: text for the MEDLINE format, xml for PubMed XML\n
+        - block: The key of the block of PMIDs that was searched or posted (see block_key)\n
+        \n
+        Returns:\n
+        - data: The records in MEDLINE format, or in xml mode a list of database items like Medline2JSON.record_to_dict
+        '''
+
+        params = {
+            "db": "pubmed",
+            "retstart": retstart,
+            "retmax": retmax,
+            "WebEnv": webenv,
+            "query_key": query_key
+            }
+
+        cache_params = {"block": block, "retstart": retstart, "retmax": retmax, "retmode": retmode}
+
+        if retmode == "xml":
+            params["retmode"] = "xml"
+            return self.request("efetch.fcgi", params, cache_params=cache_params, cache=block is not None,
+                                handler=lambda handle: [value for action, value in iter_pubmed_xml(handle) if action == "upsert"])
+
+        params["rettype"] = "medline"
+        params["retmode"] = "text"
+        return self.request("efetch.fcgi", params, cache_params=cache_params, cache=block is not None).decode("utf-8")
+
+    def block_key(self, pmids: list, mode: str) -> str:
+        # Make docstring with rst syntax
+        '''
+        Make a key for a block of PMIDs, used to cache the count and the record batches of the block.\n
+        \n
+        Parameters:\n
+        - pmids: A list of PMIDs\n
+        - mode: The way the PMIDs are sent to the history server, esearch or epost\n
+        \n
+        Returns:\n
+        - key: The SHA-256 hash of the mode and the PMIDs
+        '''
+
+        return hashlib.sha256((mode + ":" + ",".join(pmids)).encode("utf-8")).hexdigest()
+
+    def cached_block(self, block: str, retmax: int, retmode: str) -> int | None:
+        # Make docstring with rst syntax
+        '''
+        Check if all record batches of a block of PMIDs are in the cache.\n
+        \n
+        Parameters:\n
+        - block: The key of the block of PMIDs\n
+        - retmax: The amount of records per batch\n
+        - retmode: The format of the records\n
+        \n
+        Returns:\n
+        - count: The amount of records of the block, or None if the block has to be searched
+        '''
+
+        data = self.cache.get(self.cache.key("count", {"block": block}))
+        if data is None:
+            return None
+
+        count = int(data)
+        for start in range(0, count, retmax):
+            key = self.cache.key("efetch.fcgi", {"block": block, "retstart": start, "retmax": retmax, "retmode": retmode})
+            if key not in self.cache:
+                return None
+        return count
+
+    def efetch_retry(self, webenv: str, query_key: str, retstart: int, retmax: int, retmode: str = "text",
+                     block: str | None = None):
+        # Make docstring with rst syntax
+        '''
+        Fetch one batch of records like efetch, failed requests are retried with exponential backoff and jitter.\n
+        \n
+        Parameters:\n
+        - webenv: The WebEnv of the search results\n
+        - query_key: The QueryKey of the search results\n
+        - retstart: The index of the first record to fetch\n
+        - retmax: The amount of records to fetch\n
+        - retmode: text for the MEDLINE format, xml for PubMed XML\n
+        - block: The key of the block of PMIDs that was searched or posted (see block_key)\n
+        \n
+        Returns:\n
+        - data: The records, like efetch
+        '''
+
+        for attempt in range(self.retries + 1):
+            try:
+                return self.efetch(webenv, query_key, retstart, retmax, retmode, block)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                # Wait a random time up to the backoff, which doubles after every attempt
+                wait = random.uniform(0, self.backoff * 2 ** attempt)
+                print(f"Retrying record {retstart+1} to {retstart+retmax} in {wait:.1f} seconds: {e}")
+                time.sleep(wait)
+
+    def write_batches(self, executor, out_handle, webenv: str, query_key: str, count: int, starts: list, retmax: int,
+                      workers: int, retmode: str = "text", block: str | None = None) -> list:
+        # Make docstring with rst syntax
+        '''
+        Download batches of records from a search on the history server and write them to the output handle in order.\n
+        \n
+        Parameters:\n
+        - executor: The ThreadPoolExecutor that runs the requests\n
+        - out_handle: The file handle to write the records to\n
+        - webenv: The WebEnv of the search results\n
+        - query_key: The QueryKey of the search results\n
+        - count: The amount of search results\n
+        - starts: The indices of the first record of every batch\n
+        - retmax: The amount of records per batch\n
+        - workers: The amount of requests that are run at once\n
+        - retmode: The format of the records, text (MEDLINE) or xml\n
+        - block: The key of the block of PMIDs, used for the cache\n
+        \n
+        Returns:\n
+        - failed: The indices of the batches that could not be downloaded
+        '''
+
+        starts = deque(starts)
+        failed = []
+
+        # Keep a limited amount of requests in flight and write the results in order
+        pending = deque()
+        while starts or pending:
+            while starts and len(pending) < 2 * workers:
+                start = starts.popleft()
+                pending.append((start, executor.submit(self.efetch_retry, webenv, query_key, start, retmax, retmode, block)))
+
+            start, future = pending.popleft()
+            end = min(count, start+retmax)
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"Error while downloading record {start+1} to {end}: {e}")
+                failed.append(start)
+                continue
+
+            print(f"Downloaded record {start+1} to {end} of {count}")
+
+            # Save the records to the output file
+            if retmode == "xml":
+                for item in data:
+                    out_handle.write(item)
+            else:
+                out_handle.write(data)
+
+        return failed
+
+    def history_pmids(self, webenv: str, query_key: str, retstart: int, retmax: int) -> list:
+        # Make docstring with rst syntax
+        '''
+        Get the PMIDs of a batch of search results on the history server, in the order they are fetched.\n
+        Failed requests are retried with exponential backoff, like the batches of records.\n
+        \n
+        Parameters:\n
+        - webenv: The WebEnv of the search results\n
+        - query_key: The QueryKey of the search results\n
+        - retstart: The index of the first PMID\n
+        - retmax: The amount of PMIDs\n
+        \n
+        Returns:\n
+        - pmids: A list of PMIDs
+        '''
+
+        params = {"db": "pubmed", "term": f"#{query_key}", "WebEnv": webenv, "retstart": retstart, "retmax": retmax}
+        for attempt in range(self.retries + 1):
+            try:
+                root = ET.fromstring(self.request("esearch.fcgi", params, cache=False))
+                if root.find("ERROR") is not None:
+                    raise RuntimeError(f"Entrez search failed: {root.findtext('ERROR')}")
+                return [element.text for element in root.iter("Id")]
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    def fetch_block(self, executor, out_handle, pmids: list, retmax: int, workers: int, mode: str = "esearch",
+                    retmode: str = "text", webenv: str | None = None, starts: list | None = None) -> tuple[str | None, list]:
+        # Make docstring with rst syntax
+        '''
+        Search or post one block of PMIDs and download its batches of records.\n
+        A failed batch is journaled with its own PMIDs, so it can be fetched again without a search of the whole block.
+        When even its PMIDs can not be found, the block is journaled once with the indices of its failed batches.\n
+        \n
+        Parameters:\n
+        - executor: The ThreadPoolExecutor that runs the requests\n
+        - out_handle: The file handle to write the records to\n
+        - pmids: A list of PMIDs\n
+        - retmax: The amount of records per batch\n
+        - workers: The amount of requests that are run at once\n
+        - mode: The way the PMIDs are sent to the history server, esearch or epost\n
+        - retmode: The format of the records, text (MEDLINE) or xml\n
+        - webenv: The WebEnv to post the PMIDs to in epost mode, by default a new WebEnv is created\n
+        - starts: The indices of the batches to download, by default all batches\n
+        \n
+        Returns:\n
+        - webenv: The WebEnv of the block\n
+        - entries: A list with the journal entries of the failed batches
+        '''
+
+        block, count = None, None
+        if self.cache is not None and starts is None:
+            # Blocks that were downloaded completely before are read from the cache without a search
+            block = self.block_key(pmids, mode)
+            count = self.cached_block(block, retmax, retmode)
+
+        if count is not None:
+            query_key = None
+        elif mode == "epost":
+            # All blocks are posted to the same WebEnv, each block gets its own QueryKey
+            webenv, query_key, count = self.post_ids(pmids, webenv=webenv)
+        else:
+            webenv, query_key, count = self.search_history(pmids)
+
+        if block is not None and query_key is not None:
+            self.cache.put(self.cache.key("count", {"block": block}), str(count).encode("utf-8"))
+
+        if starts is None:
+            starts = range(0, count, retmax)
+        failed = self.write_batches(executor, out_handle, webenv, query_key, count, starts, retmax, workers, retmode, block)
+
+        entries, unknown = [], []
+        for start in failed:
+            try:
+                entries.append({"mode": mode, "pmids": self.history_pmids(webenv, query_key, start, retmax),
+                                "retmax": retmax, "retmode": retmode})
+            except Exception as e:
+                print(f"Could not find the PMIDs of record {start+1} to {min(count, start+retmax)}: {e}")
+                unknown.append(start)
+        if unknown:
+            entries.append({"mode": mode, "pmids": pmids, "retstarts": unknown, "retmax": retmax, "retmode": retmode})
+        return webenv, entries
+
+    def fetch_records(self, pmids: list, out_handle, retmax: int = 500, workers: int = 3, pmid_batch_size: int = 10000,
+                      mode: str = "esearch", retmode: str = "text", journal: str | None = None) -> int:
+        # Make docstring with rst syntax
+        '''
+        Download the MEDLINE records of a list of PMIDs and write them to an open file handle.\n
+        The batches are downloaded concurrently, but written to the file in the order of the search results.\n
+        In esearch mode the PMIDs are joined into a search term, in epost mode the PMIDs are uploaded with EPost
+        and the records are fetched directly from the resulting WebEnv, which saves a search per block of PMIDs.\n
+        With retmode xml the records are fetched as PubMed XML and every record is written to the handle as a database item,
+        for example to a Medline2JSON.JSONStreamWriter.\n
+        Batches that still fail after the retries are written to the journal with their PMIDs, so they can be fetched later
+        with retry_failed. A journal of an earlier run is removed, since this run downloads all PMIDs again.\n
+        \n
+        Parameters:\n
+        - pmids: A list of PMIDs\n
+        - out_handle: The file handle to write the records to\n
+        - retmax: The amount of records that are downloaded per request\n
+        - workers: The amount of requests that are run at once\n
+        - pmid_batch_size: The amount of PMIDs that are searched or posted at once\n
+        - mode: The way the PMIDs are sent to the history server, esearch or epost\n
+        - retmode: The format of the records, text (MEDLINE) or xml\n
+        - journal: The path to the journal of failed batches\n
+        \n
+        Returns:\n
+        - failed: The amount of batches that could not be downloaded
+        '''
+
+        if mode not in ["esearch", "epost"]:
+            raise ValueError("Invalid fetch mode. Please use esearch or epost")
+        if retmode not in ["text", "xml"]:
+            raise ValueError("Invalid retmode. Please use text or xml")
+
+        # Make lists of PMIDs to prevent overloading the server
+        pmid_batches = [pmids[i:i+pmid_batch_size] for i in range(0, len(pmids), pmid_batch_size)]
+
+        if journal and os.path.exists(journal):
+            os.remove(journal)
+
+        webenv = None
+        failed_count = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for pmid_batch in pmid_batches:
+                webenv, entries = self.fetch_block(executor, out_handle, pmid_batch, retmax, workers, mode, retmode, webenv)
+                failed_count += count_batches(entries)
+                if entries and journal:
+                    write_journal(journal, entries)
+
+        if failed_count:
+            print(f"{failed_count} batches could not be downloaded" + (f", see {journal}" if journal else ""))
+        return failed_count
+
+    def retry_failed(self, journal: str, out_handle, workers: int = 3, pmid_batch_size: int = 10000) -> int:
+        # Make docstring with rst syntax
+        '''
+        Download only the batches in a journal of failed batches and write them to an open file handle.\n
+        The PMIDs of the failed batches are searched or posted again, joined in blocks, and all their records are fetched.
+        A block that was journaled with the indices of its failed batches is searched again as a whole, a search for the same
+        PMIDs gives the results in the same order. Batches that fail again stay in the journal, the journal is removed when
+        all batches are downloaded.\n
+        \n
+        Parameters:\n
+        - journal: The path to the journal of failed batches\n
+        - out_handle: The file handle to write the records to\n
+        - workers: The amount of requests that are run at once\n
+        - pmid_batch_size: The amount of PMIDs that are searched or posted at once\n
+        \n
+        Returns:\n
+        - failed: The amount of batches that could not be downloaded again
+        '''
+
+        # Join the PMIDs of the failed batches that are fetched the same way
+        groups, blocks = {}, []
+        for entry in read_journal(journal):
+            if "retstarts" in entry:
+                blocks.append(entry)
+            else:
+                group = groups.setdefault((entry["mode"], entry["retmax"], entry["retmode"]), {})
+                group.update(dict.fromkeys(entry["pmids"]))
+
+        print(f"Going to download {sum(len(pmids) for pmids in groups.values())} PMIDs of failed batches"
+              + (f" and {sum(len(entry['retstarts']) for entry in blocks)} batches of search results" if blocks else ""))
+
+        entries = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for (mode, retmax, retmode), pmids in groups.items():
+                pmids = list(pmids)
+                for i in range(0, len(pmids), pmid_batch_size):
+                    entries += self.fetch_block(executor, out_handle, pmids[i:i+pmid_batch_size], retmax, workers, mode, retmode)[1]
+            for entry in blocks:
+                entries += self.fetch_block(executor, out_handle, entry["pmids"], entry["retmax"], workers, entry["mode"],
+                                            entry["retmode"], starts=sorted(set(entry["retstarts"])))[1]
+
+        # Keep the batches that failed again
+        if os.path.exists(journal):
+            os.remove(journal)
+        if entries:
+            write_journal(journal, entries)
+            print(f"{count_batches(entries)} batches could not be downloaded, see {journal}")
+        return count_batches(entries)
+
+def count_batches(entries: list) -> int:
+    # A journal entry is one failed batch with its PMIDs, or a block with the indices of its failed batches
+    return sum(len(entry["retstarts"]) if "retstarts" in entry else 1 for entry in entries)
+
+def write_journal(journal: str, entries: list) -> None:
+    # Make docstring with rst syntax
+    '''
+    Append failed batches to a journal, a JSON Lines file with one failed batch and its PMIDs per line. When the PMIDs of a
+    batch could not be found, its block of PMIDs is written once with the indices of its failed batches. ::
+
+        {"mode": "esearch", "pmids": ["30849355", ...], "retmax": 500, "retmode": "text"}
+        {"mode": "esearch", "pmids": ["30849355", ...], "retstarts": [500, 1500], "retmax": 500, "retmode": "text"}
+
+    Parameters:\n
+    - journal: The path to the journal\n
+    - entries: A list of dictionaries with the failed batches\n
+    '''
+
+    with open(journal, 'a') as handle:
+        for entry in entries:
+            handle.write(json.dumps(entry) + "\n")
+
+def read_journal(journal: str) -> list:
+    # Make docstring with rst syntax
+    '''
+    Read the failed batches from a journal.\n
+    \n
+    Parameters:\n
+    - journal: The path to the journal\n
+    \n
+    Returns:\n
+    - entries: A list of dictionaries with the failed batches
+    '''
+
+    if not os.path.exists(journal):
+        return []
+
+    with open(journal, 'r') as handle:
+        return [json.loads(line) for line in handle if line.strip()]
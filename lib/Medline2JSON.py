@@ -0,0 +1,459 @@
+#!/usr/bin/env python
+
+'''
+This script converts a MEDLINE records file to a JSON file with constant memory use.
+The records are parsed one at a time and every record is written to the JSON file as soon as it is parsed,
+so the size of the records file does not matter.
+Two layouts are supported: the list layout of the main database (PMID2Database) and the dict layout of the update files (NewPMID).
+Large records files are split on record boundaries and the parts are parsed in parallel with the fast MEDLINE parser of
+MedlineParser, the records are still written in the order of the records file.
+An output file with the extension .jsonl is written as JSON Lines, one compact record per line (see DatabaseStore).
+An output file ending in .gz or .zst is compressed while it is written (see Compression).
+The script has two required and two optional arguments. ::
+
+    Required:
+
+    -r : The path to the NCBI records file
+    -j : The path to the output JSON file
+
+    Optional:
+    --layout: list (default) for a database file, dict for an update file
+    --workers: Number of processes that parse the records file (default: the number of cores)
+
+    Usage:
+
+    python3 Medline2JSON.py -r ../example/pmid_records.txt -j ../YOUR_FOLDER/demo_database.json --layout list
+
+'''
+
+# Import the required libraries
+import ijson
+import json
+import argparse
+import os
+import queue
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.Compression import compression_of, open_file, strip_compression
+from lib.MedlineParser import parse_medline, record_chunks
+
+# The size of the parts of a records file that are parsed by one process
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Extensions of JSON Lines files, they hold one item per line
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+
+# Numeric PMIDs below this number are kept as a bit in PMIDSet, 2^28 PMIDs take at most 32 MB
+MAX_BIT_PMID = 1 << 28
+
+def record_to_dict(record: dict) -> dict:
+    # Make docstring with rst syntax
+    """
+    Convert a parsed MEDLINE record to the fields of the main database.\n
+    \n
+    Parameters:\n
+    - record: A MEDLINE record as returned by MedlineParser.parse_medline or Bio.Medline.parse\n
+    \n
+    Returns:\n
+    - item: A dictionary with the pmid as first key and the fields of the database
+    """
+
+    # Get the authors if the information is available
+    if record.get('FAU') is not None:
+        authors =" and ".join([au for au in record.get('FAU')])
+        first_author = record.get('FAU')[0]
+    else:
+        authors = ""
+        first_author = ""
+
+    if record.get('MH') is not None:
+        mesh =";".join([mh for mh in record.get('MH')])
+    else:
+        mesh = ""
+
+    if record.get('RN') is not None:
+        substances =";".join([rn for rn in record.get('RN')])
+    else:
+        substances = ""
+
+    if record.get('PT') is not None:
+        article_type ="; ".join([pt for pt in record.get('PT')])
+    else:
+        article_type = ""
+
+    doi = ""
+
+    # Retrieve DOI if available
+    if record.get('AID') is not None and any(aid.startswith('10.') for aid in record.get('AID')):
+        # Get the DOI from the list of AID's, slice the first DOI and remove the '[doi]' tag
+        doi = [aid for aid in record.get('AID') if aid.startswith('10.') and aid.endswith('[doi]')]
+        if len(doi) > 0:
+            doi = doi[0]
+        else:
+            doi = ""
+
+    return {
+        "pmid"          : record.get('PMID'),
+        "doi"           : doi,
+        "author"        : authors,
+        "first_author"  : first_author,
+        "title"         : record.get('TI'),
+        "year"          : record.get('DP'),
+        "journal"       : record.get('JT'),
+        "volume"        : record.get('VI'),
+        "issue"         : record.get('IP'),
+        "article_type"  : article_type,
+        "pages"         : record.get('PG'),
+        "abstract"      : record.get('AB'),
+        "issn"          : record.get('IS'),
+        "mesh"          : mesh,
+        "substances"    : substances
+        }
+
+class PMIDSet:
+    # Make docstring with rst syntax
+    """
+    A set of PMIDs with a fixed memory use: a PMID that is a number is a bit in a bytearray, so the PMIDs of all of PubMed
+    (about 40 million) take 5 MB. Other PMIDs, like PMIDs with leading zeros, are kept in a normal set.\n
+    """
+
+    def __init__(self) -> None:
+        self.bits = bytearray()
+        self.others = set()
+
+    @staticmethod
+    def number(pmid) -> int | None:
+        pmid = str(pmid)
+        if pmid.isdigit() and not (pmid.startswith("0") and len(pmid) > 1) and int(pmid) < MAX_BIT_PMID:
+            return int(pmid)
+        return None
+
+    def add(self, pmid) -> None:
+        number = self.number(pmid)
+        if number is None:
+            self.others.add(pmid)
+            return
+        if number >> 3 >= len(self.bits):
+            # Grow by doubling, so the PMIDs of a sorted stream do not copy the bytearray for every PMID
+            self.bits.extend(bytes(max((number >> 3) + 1, 2 * len(self.bits)) - len(self.bits)))
+        self.bits[number >> 3] |= 1 << (number & 7)
+
+    def __contains__(self, pmid) -> bool:
+        number = self.number(pmid)
+        if number is None:
+            return pmid in self.others
+        return number >> 3 < len(self.bits) and bool(self.bits[number >> 3] & (1 << (number & 7)))
+
+class JSONStreamWriter:
+    # Make docstring with rst syntax
+    """
+    Write database items to a JSON file one at a time, formatted like json.dump with indent=4.\n
+    write skips items with a PMID that was already written, so the first item of a PMID is kept (a dictionary of the records
+    would keep the last one). The written PMIDs are kept in a PMIDSet. add writes every item and keeps nothing in memory.\n
+    A JSON Lines file (.jsonl or .ndjson) gets one compact item per line in either layout, with the pmid as first key.\n
+    A file ending in .gz or .zst is compressed while it is written.\n
+    In append mode the items of an existing file are streamed to a temporary file first, the temporary file replaces the
+    existing file when the writer is closed.\n
+    \n
+    Parameters:\n
+    - outfile: The path to the output JSON file\n
+    - layout: list for a list of items, dict for a dictionary with the PMIDs as keys, lines for JSON Lines\n
+    - fields: A dictionary with extra fields that are added to every item\n
+    - append: If True, keep the items of an existing output file\n
+    - level: The compression level of a compressed output file, by default the default level of the compression\n
+    """
+
+    def __init__(self, outfile: str, layout: str = "list", fields: dict | None = None, append: bool = False,
+                 level: int | None = None) -> None:
+        if layout not in ["list", "dict", "lines"]:
+            raise ValueError("Invalid layout. Please use list, dict or lines")
+        if strip_compression(outfile).lower().endswith(JSONL_EXTENSIONS):
+            layout = "lines"
+
+        self.layout = layout
+        self.fields = fields or {}
+        self.seen = None
+        self.count = 0
+        self.outfile = outfile
+        self.path = outfile + ".tmp" if append and os.path.exists(outfile) else outfile
+        # The temporary file is compressed like the output file
+        self.file = open_file(self.path, 'wt', level=level, compression=compression_of(outfile))
+        self.file.write({"list": "[", "dict": "{", "lines": ""}[layout])
+
+        if self.path != outfile:
+            # Copy the items of the existing file, without adding the extra fields
+            with open_file(outfile, 'rb') as existing:
+                if layout == "lines":
+                    items = (json.loads(line) for line in existing if line.strip())
+                elif layout == "list":
+                    items = ijson.items(existing, 'item', use_float=True)
+                else:
+                    items = ({'pmid': pmid, **value} for pmid, value in ijson.kvitems(existing, '', use_float=True))
+                # The existing PMIDs are not written again by write
+                self.seen = PMIDSet()
+                for item in items:
+                    self.add(item)
+                    self.seen.add(item['pmid'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, item: dict) -> None:
+        # Make docstring with rst syntax
+        """
+        Write a single item to the JSON file.\n
+        \n
+        Parameters:\n
+        - item: A dictionary with a pmid key\n
+        """
+
+        if self.seen is None:
+            self.seen = PMIDSet()
+        if item['pmid'] in self.seen:
+            return
+        self.seen.add(item['pmid'])
+
+        if self.fields:
+            item = {**item, **self.fields}
+        self.add(item)
+
+    def add(self, item: dict) -> None:
+        # Make docstring with rst syntax
+        """
+        Write a single item to the JSON file, also when its PMID was already written.\n
+        \n
+        Parameters:\n
+        - item: A dictionary with a pmid key\n
+        """
+
+        if self.layout == "lines":
+            item = {'pmid': item['pmid'], **item}
+            self.file.write(json.dumps(item, separators=(",", ":")) + "\n")
+            self.count += 1
+            return
+
+        if self.layout == "list":
+            element = "    " + json.dumps(item, indent=4).replace("\n", "\n    ")
+        else:
+            value = {key: item[key] for key in item if key != 'pmid'}
+            element = "    " + json.dumps(item['pmid']) + ": " + json.dumps(value, indent=4).replace("\n", "\n    ")
+
+        self.file.write(("\n" if not self.count else ",\n") + element)
+        self.count += 1
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        if self.layout != "lines":
+            if self.count:
+                self.file.write("\n")
+            self.file.write("]" if self.layout == "list" else "}")
+        self.file.close()
+
+        if self.path != self.outfile:
+            os.replace(self.path, self.outfile)
+
+def write_json_stream(items, outfile: str, layout: str = "list") -> int:
+    # Make docstring with rst syntax
+    """
+    Write database items to a JSON file one at a time, formatted like json.dump with indent=4 or as JSON Lines.\n
+    Items with a PMID that was already written are skipped, the first item of a PMID is kept.\n
+    \n
+    Parameters:\n
+    - items: An iterable of dictionaries with a pmid key\n
+    - outfile: The path to the output JSON file\n
+    - layout: list for a list of items, dict for a dictionary with the PMIDs as keys\n
+    \n
+    Returns:\n
+    - count: The amount of items that were written
+    """
+
+    with JSONStreamWriter(outfile, layout=layout) as writer:
+        for item in items:
+            writer.write(item)
+
+    return writer.count
+
+def convert_chunk(records_file: str, start: int, end: int, fields: dict | None = None) -> list:
+    # Make docstring with rst syntax
+    """
+    Parse a part of a records file and convert the records to the fields of the database.\n
+    \n
+    Parameters:\n
+    - records_file: The path to the file with records\n
+    - start: The byte offset of the first record\n
+    - end: The byte offset after the last record\n
+    - fields: A dictionary with extra fields that are added to every record\n
+    \n
+    Returns:\n
+    - items: A list of database items
+    """
+
+    with open(records_file, 'rb') as handle:
+        handle.seek(start)
+        text = handle.read(end - start).decode('utf-8')
+
+    return [{**record_to_dict(rec), **(fields or {})} for rec in parse_medline(text)]
+
+def medline_file_items(records_file: str, fields: dict | None = None, workers: int | None = None,
+                       chunk_size: int = CHUNK_SIZE, end: int | None = None):
+    # Make docstring with rst syntax
+    """
+    Parse a records file and yield the database items in the order of the file.\n
+    The file is split into chunks that are parsed by a pool of processes, a limited amount of chunks is parsed at once,
+    so memory use does not depend on the size of the file. With one worker or a single chunk the chunks are parsed in this process.\n
+    \n
+    Parameters:\n
+    - records_file: The path to the file with records\n
+    - fields: A dictionary with extra fields that are added to every record\n
+    - workers: The amount of processes, by default the number of cores\n
+    - chunk_size: The size of the chunks in bytes\n
+    - end: The byte offset to stop reading, by default the end of the file\n
+    \n
+    Returns:\n
+    - items: A generator of database items
+    """
+
+    chunks = record_chunks(records_file, chunk_size, end=end)
+
+    if workers == 1 or len(chunks) <= 1:
+        for start, stop in chunks:
+            yield from convert_chunk(records_file, start, stop, fields)
+        return
+
+    workers = workers or os.cpu_count()
+    chunks = deque(chunks)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        while chunks or pending:
+            # Keep every process busy, but do not read ahead too far
+            while chunks and len(pending) < 2 * workers:
+                start, stop = chunks.popleft()
+                pending.append(executor.submit(convert_chunk, records_file, start, stop, fields))
+            yield from pending.popleft().result()
+
+def medline_file_to_json(records_file: str, outfile: str, layout: str = "list", fields: dict | None = None,
+                         workers: int | None = None) -> int:
+    # Make docstring with rst syntax
+    """
+    Convert a MEDLINE records file to a JSON file without loading all records in memory.\n
+    \n
+    Parameters:\n
+    - records_file: The path to the file with records\n
+    - outfile: The path to the output JSON file\n
+    - layout: list for the main database layout, dict for the update file layout\n
+    - fields: A dictionary with extra fields that are added to every record\n
+    - workers: The amount of processes that parse the file, by default the number of cores\n
+    \n
+    Returns:\n
+    - count: The amount of records that were written
+    """
+
+    items = medline_file_items(records_file, fields=fields, workers=workers)
+    return write_json_stream(items, outfile, layout=layout)
+
+class MedlinePipeline:
+    # Make docstring with rst syntax
+    """
+    Output handle that writes MEDLINE batches to the records file and converts them to JSON in a background thread.\n
+    Used as the output handle of EntrezClient.fetch_records, the batches are parsed and written to the JSON file
+    while the next requests are still in flight. The queue between both threads is bounded, so memory use stays flat.\n
+    Records that were already in the records file before the download started are converted first.\n
+    \n
+    Parameters:\n
+    - out_handle: The handle of the records file (an open file or a MedlineIndex)\n
+    - outfile: The path to the output JSON file\n
+    - layout: list for the main database layout, dict for the update file layout\n
+    - records_file: The path to the records file, when records that are already downloaded should be converted too\n
+    - max_batches: The maximum amount of batches waiting for conversion\n
+    - fields: A dictionary with extra fields that are added to every record\n
+    """
+
+    def __init__(self, out_handle, outfile: str, layout: str = "list", records_file: str | None = None, max_batches: int = 16,
+                 fields: dict | None = None) -> None:
+        self.out_handle = out_handle
+        self.fields = fields or {}
+        self.outfile = outfile
+        self.layout = layout
+        self.records_file = records_file
+        self.batches = queue.Queue(maxsize=max_batches)
+        self.thread = None
+        self.error = None
+        self.finished = False
+        self.count = 0
+
+        # Remember where the records of this run start
+        if records_file is not None and os.path.exists(records_file):
+            self.existing_end = os.path.getsize(records_file)
+        else:
+            self.existing_end = 0
+
+    def items(self):
+        # Records that were downloaded in an earlier run
+        if self.existing_end:
+            yield from medline_file_items(self.records_file, fields=self.fields, workers=1, end=self.existing_end)
+
+        # Records that are downloaded in this run, None marks the end of the download
+        while True:
+            data = self.batches.get()
+            if data is None:
+                self.finished = True
+                return
+            for rec in parse_medline(data):
+                yield {**record_to_dict(rec), **self.fields}
+
+    def convert(self) -> None:
+        try:
+            self.count = write_json_stream(self.items(), self.outfile, layout=self.layout)
+        except Exception as e:
+            self.error = e
+            # Keep emptying the queue so the download is not blocked
+            while not self.finished and self.batches.get() is not None:
+                pass
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.convert, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.batches.put(None)
+        self.thread.join()
+        if self.error is not None and exc[0] is None:
+            raise self.error
+
+    def write(self, data: str) -> None:
+        # Make docstring with rst syntax
+        """
+        Write a batch of records to the records file and queue it for conversion.\n
+        \n
+        Parameters:\n
+        - data: The records in MEDLINE format\n
+        """
+
+        self.out_handle.write(data)
+        self.batches.put(data)
+
+if __name__ == "__main__":
+
+    # Create a parser object and add arguments
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-r", dest="records_file", required=True, help="Provide the path to the NCBI records file")
+    parser.add_argument("-j", dest="json_file", required=True, help="Provide the path to the Output JSON file")
+    parser.add_argument("--layout", dest="layout", required=False, default="list", choices=["list", "dict"], help="list for a database file, dict for an update file")
+    parser.add_argument("--workers", dest="workers", required=False, type=int, default=None, help="Number of processes that parse the records file (default: the number of cores)")
+
+    # Read arguments from the command line
+    args=parser.parse_args()
+
+    count = medline_file_to_json(records_file=args.records_file, outfile=args.json_file, layout=args.layout, workers=args.workers)
+    print(f"Wrote {count} records to {args.json_file}")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+
+'''
+This module keeps a sidecar index next to a MEDLINE records file, so interrupted downloads can be resumed
+without parsing the whole records file again.
+The index is a tab-delimited txt file with the same name as the records file and the extension .idx added.
+The first line holds the size and modification time (in nanoseconds) of the records file when the index was last updated,
+every other line holds a PMID and the byte offset of its record in the records file. ::
+
+    #00000000000000495670	00001710000000000000000
+    30849355	1
+    30844493	5998
+
+New lines are appended to the index as soon as a batch of records has been written to the records file.
+If the index is missing, does not match the records file or points past its end, it is built again from the records file.
+If the records file only grew since the index was updated (for example after a crash) only the tail of the records file is scanned.
+'''
+
+# Import the required libraries
+import os
+
+# The header has a fixed width, so it can be updated in place after every batch
+HEADER = "#{size:020d}\t{mtime:023d}\n"
+
+def file_signature(records_file: str) -> tuple:
+    # Make docstring with rst syntax
+    '''
+    Get the size and modification time of a records file, to check if an index still matches it.\n
+    \n
+    Parameters:\n
+    - records_file: The path to the records file\n
+    \n
+    Returns:\n
+    - signature: A (size, mtime) tuple with the modification time in nanoseconds, (0, 0) if the file does not exist
+    '''
+
+    if not os.path.exists(records_file):
+        return (0, 0)
+    stat = os.stat(records_file)
+    return (stat.st_size, stat.st_mtime_ns)
+
+class MedlineIndex:
+    # Make docstring with rst syntax
+    '''
+    Index of the records in a MEDLINE records file by PMID.\n
+    The object can be used as the output handle of EntrezClient.fetch_records, every written batch is added to the index.\n
+    \n
+    Parameters:\n
+    - records_file: The path to the MEDLINE records file\n
+    '''
+
+    def __init__(self, records_file: str) -> None:
+        self.records_file = records_file
+        self.index_file = records_file + ".idx"
+        self.offsets = {}
+        self.records_handle = None
+        self.index_handle = None
+
+        signature = self.load() if os.path.exists(self.index_file) else None
+        current = file_signature(records_file)
+
+        if signature == current and self.matches(current[0]):
+            return
+
+        if signature is not None and current[0] > signature[0] and self.matches(current[0]):
+            # Add the records that were written to the records file but are missing in the index
+            with open(self.index_file, 'r+') as handle:
+                handle.seek(0, 2)
+                for pmid, offset in self.scan(signature[0]):
+                    handle.write(f"{pmid}\t{offset}\n")
+                    self.offsets[pmid] = offset
+                handle.seek(0)
+                handle.write(HEADER.format(size=current[0], mtime=current[1]))
+            return
+
+        # The index does not belong to the records file, build it again
+        self.offsets = {}
+        self.offsets = dict(self.scan(0))
+        if signature is not None or os.path.exists(records_file):
+            self.save()
+
+    def load(self) -> tuple | None:
+        # Make docstring with rst syntax
+        '''
+        Read the index file into the offsets. A line that was only partly written when a run stopped is removed.\n
+        \n
+        Returns:\n
+        - signature: The (size, mtime) tuple of the header, None if the index file is not valid
+        '''
+
+        with open(self.index_file, 'rb') as handle:
+            try:
+                header = handle.readline().decode("utf-8")
+                size, mtime = header[1:].rstrip("\n").split("\t")
+                signature = (int(size), int(mtime))
+                if not header.startswith("#") or len(header) != len(HEADER.format(size=0, mtime=0)):
+                    return None
+
+                end = handle.tell()
+                for line in handle:
+                    if not line.endswith(b"\n"):
+                        break
+                    pmid, offset = line.decode("utf-8").rstrip("\n").split("\t")
+                    self.offsets[pmid] = int(offset)
+                    end = handle.tell()
+            except ValueError:
+                self.offsets = {}
+                return None
+
+        # Remove a truncated last line, so new lines are not appended to it
+        if end < os.path.getsize(self.index_file):
+            os.truncate(self.index_file, end)
+        return signature
+
+    def matches(self, size: int) -> bool:
+        # Make docstring with rst syntax
+        '''
+        Check if the record with the largest offset in the index is in the records file.\n
+        \n
+        Parameters:\n
+        - size: The size of the records file\n
+        \n
+        Returns:\n
+        - matches: True if the largest offset is below the size and the record at that offset has the indexed PMID
+        '''
+
+        if not self.offsets:
+            return True
+
+        pmid, offset = max(self.offsets.items(), key=lambda item: item[1])
+        if offset >= size:
+            return False
+        with open(self.records_file, 'rb') as handle:
+            handle.seek(offset)
+            return handle.readline().rstrip(b"\r\n") == b"PMID- " + pmid.encode("utf-8")
+
+    def save(self) -> None:
+        # Make docstring with rst syntax
+        '''
+        Write the whole index file, with the size and modification time of the records file in the header.\n
+        '''
+
+        size, mtime = file_signature(self.records_file)
+        with open(self.index_file, 'w') as handle:
+            handle.write(HEADER.format(size=size, mtime=mtime))
+            for pmid, offset in self.offsets.items():
+                handle.write(f"{pmid}\t{offset}\n")
+
+    def scan(self, start: int) -> list:
+        # Make docstring with rst syntax
+        '''
+        Scan the records file from a byte offset onwards for records that are not in the index.\n
+        \n
+        Parameters:\n
+        - start: The byte offset to start scanning from\n
+        \n
+        Returns:\n
+        - missing: A list of (PMID, offset) tuples
+        '''
+
+        missing = []
+        if not os.path.exists(self.records_file):
+            return missing
+
+        with open(self.records_file, 'rb') as handle:
+            handle.seek(start)
+            offset = start
+            for line in handle:
+                if line.startswith(b"PMID- "):
+                    pmid = line[6:].strip().decode("utf-8")
+                    if self.offsets.get(pmid) != offset:
+                        missing.append((pmid, offset))
+                offset += len(line)
+        return missing
+
+    def __contains__(self, pmid: str) -> bool:
+        return pmid in self.offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __enter__(self):
+        self.records_handle = open(self.records_file, 'ab')
+        if not os.path.exists(self.index_file):
+            self.save()
+        self.index_handle = open(self.index_file, 'r+')
+        self.index_handle.seek(0, 2)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.records_handle.close()
+        self.index_handle.close()
+
+    def write(self, data: str) -> None:
+        # Make docstring with rst syntax
+        '''
+        Append a batch of MEDLINE records to the records file and add the records to the index.\n
+        The index is only updated after the records are flushed, so it never points past the records file,
+        and the header is only updated after the new lines of the index.\n
+        \n
+        Parameters:\n
+        - data: The records in MEDLINE format\n
+        '''
+
+        base = self.records_handle.tell()
+        encoded = data.encode("utf-8")
+        self.records_handle.write(encoded)
+        self.records_handle.flush()
+
+        # Find the offsets of the PMID lines in the batch
+        offset = base
+        for line in encoded.splitlines(keepends=True):
+            if line.startswith(b"PMID- "):
+                pmid = line[6:].strip().decode("utf-8")
+                self.offsets[pmid] = offset
+                self.index_handle.write(f"{pmid}\t{offset}\n")
+            offset += len(line)
+
+        # Store the size and modification time of the records file that the index now matches
+        size, mtime = file_signature(self.records_file)
+        self.index_handle.seek(0)
+        self.index_handle.write(HEADER.format(size=size, mtime=mtime))
+        self.index_handle.seek(0, 2)
+        self.index_handle.flush()
+
+    def get_record(self, pmid: str) -> str:
+        # Make docstring with rst syntax
+        '''
+        Read a single record from the records file without parsing the rest of the file.\n
+        \n
+        Parameters:\n
+        - pmid: The PMID of the record\n
+        \n
+        Returns:\n
+        - record: The record in MEDLINE format, can be parsed with Bio.Medline.read
+        '''
+
+        lines = []
+        with open(self.records_file, 'rb') as handle:
+            handle.seek(self.offsets[pmid])
+            for line in handle:
+                # Stop at the start of the next record
+                if lines and line.startswith(b"PMID- "):
+                    break
+                lines.append(line)
+        return b"".join(lines).decode("utf-8").rstrip("\n") + "\n"
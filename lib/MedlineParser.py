@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+'''
+This module contains a fast parser for the MEDLINE format that only extracts the fields of the main database.
+It gives the same values as Bio.Medline.parse for these fields, but skips the lines of all other fields, so most of the
+work of the general parser is avoided.
+
+Large records files can be split on record boundaries with record_chunks, so parts of the file can be parsed in separate
+processes (see Medline2JSON), or read one part at a time with parse_medline_file.
+'''
+
+# Import the required libraries
+import os
+import re
+
+# The fields used by Medline2JSON.record_to_dict
+FIELDS = ("PMID", "FAU", "MH", "RN", "PT", "AID", "TI", "DP", "JT", "VI", "IP", "PG", "AB", "IS")
+
+# The fields that Bio.Medline.parse joins into a single string, the other fields are lists
+TEXT_FIELDS = ("PMID", "TI", "DP", "JT", "VI", "IP", "PG", "AB", "IS")
+
+# The size of the parts of a records file that are read at once
+CHUNK_SIZE = 8 * 1024 * 1024
+
+def field_pattern(fields: tuple):
+    # Make docstring with rst syntax
+    '''
+    Make the regular expression that finds the lines of the given fields, including their continuation lines.\n
+    \n
+    Parameters:\n
+    - fields: The fields to extract\n
+    \n
+    Returns:\n
+    - pattern: A compiled regular expression with the padded key and the rest of the field as groups
+    '''
+
+    keys = "|".join(re.escape(field.ljust(4)) for field in fields)
+    return re.compile(r"\n(%s)(.*(?:\n {6}.*)*)" % keys)
+
+PATTERNS = {FIELDS: field_pattern(FIELDS)}
+
+def field_values(key: str, value: str) -> list:
+    # Make docstring with rst syntax
+    '''
+    Split a field into values, exactly like Bio.Medline.parse does.\n
+    \n
+    Parameters:\n
+    - key: The key of the field\n
+    - value: The field without the key, from the fifth character of the first line, including the continuation lines\n
+    \n
+    Returns:\n
+    - values: The values of the field, the first value belongs to a new entry
+    '''
+
+    lines = value.split("\n")
+    values = [lines[0].rstrip()[2:]]
+    if len(lines) == 1:
+        return values
+
+    # Continuation lines start with six spaces
+    rest = [line.rstrip()[6:] for line in lines[1:]]
+    if (key in TEXT_FIELDS or key == "MH") and all(rest):
+        # Text fields are joined with spaces later and continued MeSH terms are joined with a space, so the lines
+        # can be joined right away when there are no blank continuation lines
+        return [" ".join([values[0]] + rest)]
+
+    for line in lines[1:]:
+        line = line.rstrip()
+        if line == "":
+            # Blank continuation lines are kept as a new line
+            line = "      \n"
+
+        if key == "MH":
+            # A MeSH term that continues on the next line, including the space
+            values[-1] += line[5:]
+        else:
+            values.append(line[6:])
+    return values
+
+def parse_medline(text: str, fields: tuple = FIELDS):
+    # Make docstring with rst syntax
+    '''
+    Parse MEDLINE records one at a time, like Bio.Medline.parse but only for the given fields.\n
+    The text is split into records on blank lines and the lines of the fields are found with a single regular expression,
+    so the lines of fields that are not needed (addresses, history dates, ...) are never handled one by one.\n
+    \n
+    Parameters:\n
+    - text: A string with MEDLINE records\n
+    - fields: The fields to extract\n
+    \n
+    Returns:\n
+    - records: A generator of dictionaries with the fields of every record
+    '''
+
+    if fields not in PATTERNS:
+        PATTERNS[fields] = field_pattern(fields)
+    pattern = PATTERNS[fields]
+
+    # Handle other line endings like a file opened in text mode
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+    for chunk in text.split("\n\n"):
+        chunk = chunk.strip("\n")
+        if not chunk:
+            continue
+
+        record = {}
+        for key, value in pattern.findall("\n" + chunk):
+            key = key.rstrip()
+            # Most fields are a single line
+            values = [value.rstrip()[2:]] if "\n" not in value else field_values(key, value)
+            if key in record:
+                record[key] += values
+            else:
+                record[key] = values
+
+        yield join_fields(record)
+
+def parse_medline_file(records_file: str, fields: tuple = FIELDS, chunk_size: int = CHUNK_SIZE):
+    # Make docstring with rst syntax
+    '''
+    Parse the MEDLINE records of a file one at a time. The file is read in parts that end on a record boundary,
+    so only one part of the file is in memory at once.\n
+    \n
+    Parameters:\n
+    - records_file: The path to the file with records\n
+    - fields: The fields to extract\n
+    - chunk_size: The size of the parts in bytes\n
+    \n
+    Returns:\n
+    - records: A generator of dictionaries with the fields of every record
+    '''
+
+    with open(records_file, 'rb') as handle:
+        for start, end in record_chunks(records_file, chunk_size):
+            handle.seek(start)
+            yield from parse_medline(handle.read(end - start).decode('utf-8'), fields)
+
+def join_fields(record: dict) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Join the lines of the text fields of a record into single strings.\n
+    \n
+    Parameters:\n
+    - record: A dictionary with lists of lines per field\n
+    \n
+    Returns:\n
+    - record: The same dictionary with strings for the text fields
+    '''
+
+    for key in record:
+        if key in TEXT_FIELDS:
+            record[key] = " ".join(record[key])
+    return record
+
+def record_chunks(records_file: str, chunk_size: int, end: int | None = None) -> list:
+    # Make docstring with rst syntax
+    '''
+    Split a records file into byte ranges of about chunk_size bytes that end on a record boundary (a blank line).\n
+    \n
+    Parameters:\n
+    - records_file: The path to the file with records\n
+    - chunk_size: The minimal size of a chunk in bytes\n
+    - end: The byte offset to stop, by default the end of the file\n
+    \n
+    Returns:\n
+    - chunks: A list of (start, end) tuples
+    '''
+
+    size = os.path.getsize(records_file) if end is None else end
+
+    chunks = []
+    start = 0
+    with open(records_file, 'rb') as handle:
+        while size - start > chunk_size:
+            handle.seek(start + chunk_size)
+            # Skip the rest of the current line, then look for the next blank line
+            handle.readline()
+            line = handle.readline()
+            while line and line not in (b"\n", b"\r\n"):
+                line = handle.readline()
+
+            boundary = min(handle.tell(), size)
+            chunks.append((start, boundary))
+            start = boundary
+
+    if start < size:
+        chunks.append((start, size))
+    return chunks
@@ -4,88 +4,151 @@
 This script is used to load a list of PMIDs from a TXT file and enrich them with additional information from the NCBI database.
 The information from the NCBI database is saved in a temporary file and then parsed a JSON file.
 This JSON file then acts as a database.
-The script has four required arguments. ::
+With the --database option only the PMIDs that are not in the main database yet are fetched, so update runs only cost
+as much as the actual new records. With --max-age records in the database that were retrieved more than the given amount
+of days ago are fetched again. Records fetched in this mode get a retrieved field with the date of the run.
+With --retmode xml the records are fetched as PubMed XML and converted to the JSON file while they are downloaded,
+the XML is parsed incrementally and no records file is written.
+Batches that fail after several retries are written to a journal next to the records file (or the JSON file with --retmode xml)
+with the extension .failed added. With --retry-failed only the batches in the journal are downloaded and added to the output.
+The script has four required and eleven optional arguments. ::
 
     Required:
     
     -p : The path to the PMID file
     -j : The path to the output JSON file
-    -r : The path to store the NCBI records file
+    -r : The path to store the NCBI records file (not used with --retmode xml)
     -e : The email address for the NCBI API
+
+    Optional:
+    --retmax: Number of records to download per request (default 500)
+    --workers: Number of concurrent requests (default 3)
+    --fetch-mode: esearch (default) joins the PMIDs into a search term, epost uploads them as an ID list
+    --pipeline: Convert the records to JSON while the next batches are downloaded
+    --database: Path to the main database JSON file, only PMIDs that are missing from it are fetched
+    --max-age: With --database, also fetch records that were retrieved more than this amount of days ago
+    --retmode: text (default) fetches MEDLINE records, xml fetches PubMed XML and converts it straight to JSON
+    --api-key: NCBI API key, raises the rate limit from 3 to 10 requests per second
+    --cache: Directory for a cache of the NCBI responses, re-runs take repeated requests from the cache
+    --cache-ttl: The amount of hours a cached response is used (default 24)
+    --retry-failed: Only download the batches in the journal of failed batches of an earlier run
     
     Usage:
     
     python3 NewPMID.py -p ../example/demo_new_pmids.txt .j ../YOUR_FOLDER/demo_new_pmids.json -r ../YOUR_FOLDER/new_records_file.txt -e nielsvanbeuningen@gmail.com
+
+    Only fetch PMIDs that are missing from the database, or were retrieved more than 90 days ago:
+
+    python3 NewPMID.py -p ../example/demo_new_pmids.txt -j ../YOUR_FOLDER/demo_new_pmids.json -r ../YOUR_FOLDER/new_records_file.txt -e youremail@email.com --database ../example/demo_database.json --max-age 90
     
 '''
 
 # Import the required libraries
-from Bio import Entrez
-from Bio import Medline
 import json
 import argparse
-import time
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.Compression import open_file
+from lib.ResponseCache import ResponseCache
+from lib.EntrezFetch import EntrezClient, EUTILS_URL
+from lib.Medline2JSON import record_to_dict, medline_file_to_json, MedlinePipeline, JSONStreamWriter
+from lib.DatabaseIndex import load_pmids
+from lib.MedlineParser import parse_medline_file
+from contextlib import nullcontext
+from datetime import datetime, timedelta
 
 
-def get_records(pmids: list, outfile: str, entrez_email: str) -> None:
+def get_records(pmids: list, outfile: str | None, entrez_email: str, retmax: int = 500, workers: int = 3,
+                api_key: str | None = None, base_url: str = EUTILS_URL, mode: str = "esearch",
+                json_file: str | None = None, fields: dict | None = None, retmode: str = "text",
+                cache: ResponseCache | None = None, retry_failed: bool = False) -> None:
     # Make docstring with rst syntax
     ''' 
-    Takes a set of PMIDs and retrieves the records. Save the results to a temporary file.\n\n
+    Takes a set of PMIDs and retrieves the records. Save the results to a temporary file.\n
+    The records are downloaded by several concurrent requests that share the NCBI rate limit.\n
+    With retmode xml the records are converted to the JSON file while they are downloaded and no records file is written.\n
+    Batches that fail are written to a journal next to the output file (.failed), in retry_failed mode only the batches
+    in the journal are downloaded and added to the output.\n\n
     
     Parameters:\n
     - pmids: A list of PMIDs\n
     - outfile: The path to the output file\n
     - entrez_email: The email address for the NCBI API\n
+    - retmax: The amount of records that are downloaded per request\n
+    - workers: The amount of requests that are run at once\n
+    - api_key: The NCBI API key, raises the rate limit from 3 to 10 requests per second\n
+    - base_url: The base URL of the NCBI E-utilities\n
+    - mode: How the PMIDs are sent to NCBI, esearch (search term) or epost (uploaded ID list)\n
+    - json_file: If given, the records are converted to this JSON file while they are downloaded (pipeline mode)\n
+    - fields: A dictionary with extra fields that are added to every record in pipeline or xml mode\n
+    - retmode: The format of the downloaded records, text (MEDLINE) or xml, xml requires a json_file\n
+    - cache: A ResponseCache for the NCBI responses\n
+    - retry_failed: If True, only download the batches in the journal of failed batches\n
     \n
     Returns:\n
     - None  
     '''
 
-    # Batch size is the amount of records that are downloaded at once, to prevent overloading the server
-    batch_size = 20
+    client = EntrezClient(entrez_email=entrez_email, api_key=api_key, base_url=base_url, cache=cache)
 
-    Entrez.email = entrez_email
-    
-    # Concatenate the PMIDs to a string
-    myterm = ",".join(pmids)
+    if retmode == "xml":
+        if not json_file:
+            raise ValueError("The xml retmode needs a JSON file to write the records to")
+        journal = json_file + ".failed"
+
+        # The XML is parsed while it is downloaded, every record is written to the JSON file right away
+        with JSONStreamWriter(json_file, layout="dict", fields=fields, append=retry_failed) as writer:
+            if retry_failed:
+                client.retry_failed(journal, out_handle=writer, workers=workers)
+            else:
+                client.fetch_records(pmids=pmids, out_handle=writer, retmax=retmax, workers=workers, mode=mode,
+                                     retmode="xml", journal=journal)
+        return
     
-    # Get the search results
-    search_results = Entrez.read(Entrez.esearch(
-        db="pubmed",
-        term=myterm,
-        usehistory="y"
-        ))
+    # Open the output file for saving the records, in retry mode the records are added to the records of the earlier run
+    journal = outfile + ".failed"
+    with open(outfile, "a" if retry_failed else "w", encoding="UTF-8") as records_handle:
+        # In pipeline mode the batches are also converted to JSON while the next batches are downloaded
+        if json_file:
+            pipeline = MedlinePipeline(records_handle, json_file, layout="dict", fields=fields, records_file=outfile)
+        else:
+            pipeline = nullcontext(records_handle)
+            
+        with pipeline as out_handle:
+            if retry_failed:
+                client.retry_failed(journal, out_handle=out_handle, workers=workers)
+            else:
+                client.fetch_records(pmids=pmids, out_handle=out_handle, retmax=retmax, workers=workers, mode=mode,
+                                     journal=journal)
     
-    # Count the amount of records for batch processing
-    count = int(search_results["Count"])
+def select_missing(pmids: list, database_file: str, max_age: int | None = None) -> list:
+    # Make docstring with rst syntax
+    ''' 
+    Select the PMIDs that are not in the database yet, or whose record in the database is older than max_age days.\n
+    The PMIDs in the database are read from the .pmids sidecar file of the database (see DatabaseIndex).\n\n
     
-    # Open the output file for saving the records
-    out_handle = open(outfile, "w", encoding="UTF-8")
+    Parameters:\n
+    - pmids: A list of PMIDs\n
+    - database_file: The path to the JSON database file\n
+    - max_age: The maximum age of a record in days, by default records in the database are never fetched again\n
+    \n
+    Returns:\n
+    - missing: A list of PMIDs that have to be fetched
+    '''
+
+    database_pmids = load_pmids(database_file)
     
-    # Loop over the records in batches
-    for start in range(0, count, batch_size):
-        end = min(count, start+batch_size)
-        print("Going to download record %i to %i" % (start+1, end))
-        
-        # Fetch the records
-        fetch_handle = Entrez.efetch(db="pubmed",
-            rettype="medline",
-            retmode="text",
-            retstart=start,
-            retmax=batch_size,
-            webenv=search_results["WebEnv"],
-            query_key=search_results["QueryKey"])
-
-        data = fetch_handle.read()
-        fetch_handle.close()
-        
-        # Save the records to the output file
-        out_handle.write(data)
-        
-        # Sleep for 2 seconds to prevent overloading the server
-        time.sleep(2)
-    out_handle.close()
+    if max_age is None:
+        return [pmid for pmid in pmids if pmid not in database_pmids]
     
+    # Dates are stored as YYYY/MM/DD, so they can be compared as strings, an unknown date is empty and always too old
+    cutoff = (datetime.now() - timedelta(days=max_age)).strftime("%Y/%m/%d")
+    return [pmid for pmid in pmids if database_pmids.get(pmid, "") < cutoff]
+
 def parse_records(file: str) -> dict:   
     # Make docstring with rst syntax
     ''' 
@@ -98,15 +161,13 @@ def parse_records(file: str) -> dict:
     - record_dict: A dictionary with the records
     '''
 
-    # Open the file with records
-    with open(file) as handle:
-        # Parse the records using the Medline parser
-        records = Medline.parse(handle)
+    # Parse the fields of the database with the fast MEDLINE parser, one part of the file at a time
+    records = parse_medline_file(file)
 
-        # Create a dictionary to store the records
-        record_dict = {}
-        for rec in records:
-            record_dict[rec.get('PMID')]=rec
+    # Create a dictionary to store the records
+    record_dict = {}
+    for rec in records:
+        record_dict[rec.get('PMID')]=rec
     return record_dict
 
 def medline_to_json(records: dict, outfile: str) -> None:
@@ -140,62 +201,12 @@ def medline_to_json(records: dict, outfile: str) -> None:
     
     # Loop over the records
     for pmid in records:
-        record = records[pmid]
-        
-         # Get the authors if the information is available
-        if record.get('FAU') is not None:
-            authors =" and ".join([au for au in record.get('FAU')])
-            first_author = record.get('FAU')[0]
-        else:
-            authors = ""
-            first_author = ""
-            
-        if record.get('MH') is not None:
-            mesh =";".join([mh for mh in record.get('MH')])
-        else:
-            mesh = ""
-
-        if record.get('RN') is not None:
-            substances =";".join([rn for rn in record.get('RN')])
-        else:
-            substances = ""
-            
-        if record.get('PT') is not None:
-            article_type ="; ".join([pt for pt in record.get('PT')])
-        else:
-            article_type = ""    
-            
-        doi = ""
-
-        # Retrieve DOI if available
-        if record.get('AID') is not None and any(aid.startswith('10.') for aid in record.get('AID')):
-            # Get the DOI from the list of AID's, slice the first DOI and remove the '[doi]' tag
-            doi = [aid for aid in record.get('AID') if aid.startswith('10.') and aid.endswith('[doi]')]
-            if len(doi) > 0:
-                doi = doi[0]
-            else:
-                doi = ""
-            
         # Create a dictionary with the information to be added to the JSON file
-        output_list[pmid] = {
-            "doi":doi,
-            "author":authors, 
-            "first_author":first_author,
-            "title":record.get('TI'), 
-            "year":record.get('DP'), 
-            "journal":record.get('JT'), 
-            "volume":record.get('VI'), 
-            "issue":record.get('IP'), 
-            "article_type":article_type,
-            "pages":record.get('PG'), 
-            "abstract":record.get('AB'),
-            "issn":record.get('IS'),
-            "mesh":mesh,
-            "substances":substances
-            }
+        output_list[pmid] = record_to_dict(records[pmid])
+        output_list[pmid].pop('pmid')
               
     # Write the updated data back to the JSON file  
-    with open(outfile, 'w') as file:
+    with open_file(outfile, 'wt') as file:
         json.dump(output_list, file, indent=4)
     
 if __name__ == "__main__":
@@ -204,21 +215,59 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("-p", dest="pmid_file", required=True, help="Provide the path to the PMID file")
     parser.add_argument("-j", dest="json_file", required=True, help="Provide the path to the Output JSON file")
-    parser.add_argument("-r", dest="records_file", required=True, help="Provide the path to store the NCBI records file")
+    parser.add_argument("-r", dest="records_file", required=False, default=None, help="Provide the path to store the NCBI records file")
     parser.add_argument("-e", dest="entrez_email", required=True, help="Provide the email address for the NCBI API")
+    parser.add_argument("--retmax", dest="retmax", required=False, type=int, default=500, help="Number of records to download per request (default 500)")
+    parser.add_argument("--workers", dest="workers", required=False, type=int, default=3, help="Number of concurrent requests (default 3)")
+    parser.add_argument("--fetch-mode", dest="fetch_mode", required=False, default="esearch", choices=["esearch", "epost"], help="Send the PMIDs to NCBI as a search term (esearch) or as an uploaded ID list (epost)")
+    parser.add_argument("--pipeline", dest="pipeline", required=False, default=False, action="store_true", help="Convert the records to JSON while they are downloaded")
+    parser.add_argument("--database", dest="database_file", required=False, default=None, help="Provide the path to the main database JSON file to only fetch PMIDs that are missing from it")
+    parser.add_argument("--max-age", dest="max_age", required=False, type=int, default=None, help="With --database, also fetch records that were retrieved more than this amount of days ago")
+    parser.add_argument("--retmode", dest="retmode", required=False, default="text", choices=["text", "xml"], help="Fetch the records as MEDLINE text (text) or as PubMed XML that is converted straight to JSON (xml)")
+    parser.add_argument("--api-key", dest="api_key", required=False, default=None, help="Provide the NCBI API key to raise the rate limit to 10 requests per second")
+    parser.add_argument("--cache", dest="cache_dir", required=False, default=None, help="Provide a directory to cache the NCBI responses in")
+    parser.add_argument("--cache-ttl", dest="cache_ttl", required=False, type=float, default=24, help="The amount of hours a cached response is used (default 24)")
+    parser.add_argument("--retry-failed", dest="retry_failed", required=False, default=False, action="store_true", help="Only download the batches in the journal of failed batches of an earlier run")
 
     # Read arguments from the command line
     args=parser.parse_args()
+    if args.retmode == "text" and not args.records_file:
+        parser.error("the following arguments are required: -r")
+    if args.max_age is not None and not args.database_file:
+        parser.error("argument --max-age: requires --database")
     
     # Get all the PMIDs from the txt pmid file
     with open(args.pmid_file) as file:
         pmids = file.read().splitlines()
        
+    fields = None
+    if args.database_file:
+        # Only fetch the PMIDs that are missing from the main database (or are too old)
+        missing = select_missing(pmids, database_file=args.database_file, max_age=args.max_age)
+        print(f"{len(pmids) - len(missing)} of {len(pmids)} PMIDs are already in the database")
+        pmids = missing
+        
+        # Remember when the records were retrieved, so their age can be checked in later runs
+        fields = {"retrieved": datetime.now().strftime("%Y/%m/%d")}
+       
+    # Repeated requests are answered from the cache, if requested
+    cache = ResponseCache(args.cache_dir, ttl=args.cache_ttl * 3600) if args.cache_dir else None
+
     # Get the records from the NCBI database
-    get_records(pmids=pmids, outfile=args.records_file, entrez_email=args.entrez_email)
-    
-    # Parse the records
-    records = parse_records(file=args.records_file)
-    
-    # Parse the record output to enrich the JSON file
-    medline_to_json(records=records, outfile=args.json_file)
\ No newline at end of file
+    if args.retmode == "xml":
+        # Convert the XML records to JSON while they are downloaded
+        get_records(pmids=pmids, outfile=None, entrez_email=args.entrez_email, 
+                    retmax=args.retmax, workers=args.workers, api_key=args.api_key, mode=args.fetch_mode, cache=cache,
+                    json_file=args.json_file, fields=fields, retmode="xml", retry_failed=args.retry_failed)
+    elif args.pipeline:
+        # Convert the records to JSON while the next batches are downloaded
+        get_records(pmids=pmids, outfile=args.records_file, entrez_email=args.entrez_email, 
+                    retmax=args.retmax, workers=args.workers, api_key=args.api_key, mode=args.fetch_mode, cache=cache,
+                    json_file=args.json_file, fields=fields, retry_failed=args.retry_failed)
+    else:
+        get_records(pmids=pmids, outfile=args.records_file, entrez_email=args.entrez_email, 
+                    retmax=args.retmax, workers=args.workers, api_key=args.api_key, mode=args.fetch_mode, cache=cache,
+                    retry_failed=args.retry_failed)
+        
+        # Parse the records one at a time and write them to the JSON file
+        medline_file_to_json(records_file=args.records_file, outfile=args.json_file, layout="dict", fields=fields)
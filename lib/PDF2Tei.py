@@ -1,55 +1,284 @@
 #!/usr/bin/env python
 
 '''
-This script takes a folder with PDF files and uses GROBID to transform them into TEI files. ::
+This script takes a folder with PDF files and uses GROBID to transform them into TEI files.
+GROBID handles several requests at once, so the PDFs are sent by a pool of worker threads that share one HTTP session.
+The PDFs are streamed to GROBID, they are never read into memory as a whole. When GROBID is busy it answers with
+503 Service Unavailable, these requests are retried with exponential backoff. Other errors, like the 500 that GROBID answers
+for a PDF it can not parse, are reported once and not retried.
+
+The SHA-256 hash of every converted PDF is kept in grobid_manifest.tsv in the output folder. PDFs with a TEI file, or with the
+same content as a PDF that was converted before, are not sent to GROBID again. ::
 
     Required:
-    
+
     --folder: Path to the folder with PDF files
     --output_folder: Path to the output folder for TEI files
 
     Optional:
     --port: Port number for GROBID (default 8081)
+    --workers: Number of PDFs that are sent to GROBID at once (default 4)
     -v : Be verbose
-    
+
     Usage (from top level folder):
-    
+
     python3 lib/PDF2Tei.py --folder example/fulltexts --output_folder example/fulltexts -v
 
 '''
 import requests
 import argparse
+import hashlib
 import os
+import random
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
-def PDF_to_TEI(pdf_files, verbose):
+# The name of the file with the hashes of the converted PDFs
+MANIFEST = "grobid_manifest.tsv"
+
+# Status codes GROBID uses when it can not take more requests
+BUSY_CODES = (429, 503)
+
+class MultipartUpload:
+    '''
+    File-like multipart/form-data body with a single file field, read from disk while it is sent.\n
+    requests sends objects with a read method in blocks and takes the Content-Length from their length.\n
+    \n
+    Parameters:\n
+    - path: The path to the file\n
+    - field: The name of the form field\n
+    '''
+
+    def __init__(self, path: str, field: str = "input") -> None:
+        self.boundary = uuid.uuid4().hex
+        self.parts = [
+            (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{os.path.basename(path)}"\r\n'
+             f'Content-Type: application/pdf\r\n\r\n').encode("utf-8"),
+            path,
+            f'\r\n--{self.boundary}--\r\n'.encode("utf-8")
+            ]
+        self.length = len(self.parts[0]) + os.path.getsize(path) + len(self.parts[2])
+        self.handle = None
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self.length
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while self.parts and (size < 0 or size > 0):
+            part = self.parts[0]
+            if isinstance(part, str):
+                # Open the file when its turn comes, close it when it is read
+                if self.handle is None:
+                    self.handle = open(part, 'rb')
+                data = self.handle.read(size)
+                if not data or size < 0:
+                    self.handle.close()
+                    self.handle = None
+                    self.parts.pop(0)
+            else:
+                data = part if size < 0 else part[:size]
+                if len(data) == len(part):
+                    self.parts.pop(0)
+                else:
+                    self.parts[0] = part[len(data):]
+            chunks.append(data)
+            if size > 0:
+                size -= len(data)
+        return b"".join(chunks)
+
+def file_hash(path: str) -> str:
+    # Make docstring with rst syntax
+    '''
+    Calculate the SHA-256 hash of a file without reading it into memory at once.\n
+    \n
+    Parameters:\n
+    - path: The path to the file\n
+    \n
+    Returns:\n
+    - hash: The hexadecimal hash
+    '''
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def load_manifest(output_folder: str) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Load the hashes of the PDFs that were converted before.\n
+    \n
+    Parameters:\n
+    - output_folder: The output folder with TEI files\n
+    \n
+    Returns:\n
+    - manifest: A dictionary with the hashes as keys and the names of the TEI files as values
+    '''
+
+    manifest = {}
+    path = os.path.join(output_folder, MANIFEST)
+    if os.path.exists(path):
+        with open(path, 'r') as handle:
+            for line in handle:
+                sha, tei_file = line.rstrip("\n").split("\t")
+                manifest[sha] = tei_file
+    return manifest
+
+def add_to_manifest(output_folder: str, manifest: dict, sha: str, tei_file: str) -> None:
+    # Make docstring with rst syntax
+    '''
+    Add a converted PDF to the manifest and to the manifest file.\n
+    \n
+    Parameters:\n
+    - output_folder: The output folder with TEI files\n
+    - manifest: The manifest as returned by load_manifest\n
+    - sha: The hash of the PDF\n
+    - tei_file: The name of the TEI file\n
+    '''
+
+    manifest[sha] = tei_file
+    with open(os.path.join(output_folder, MANIFEST), 'a') as handle:
+        handle.write(f"{sha}\t{tei_file}\n")
+
+def convert_pdf(session, base_url: str, pdf_path: str, retries: int = 5, backoff: float = 1.0,
+                timeout: float = 300) -> str:
+    # Make docstring with rst syntax
+    '''
+    Send a single PDF to GROBID and return the TEI XML, requests are retried when GROBID is busy (429 or 503) or can not be
+    reached. Other errors are raised at once, GROBID keeps failing on a PDF it can not parse.\n
+    \n
+    Parameters:\n
+    - session: The requests session\n
+    - base_url: The URL of the GROBID API\n
+    - pdf_path: The path to the PDF file\n
+    - retries: The amount of times a busy request is retried\n
+    - backoff: The maximum wait before the first retry in seconds, the maximum doubles after every retry\n
+    - timeout: The timeout of a single request in seconds\n
+    \n
+    Returns:\n
+    - xml_content: The TEI XML
+    '''
+
+    for attempt in range(retries + 1):
+        upload = MultipartUpload(pdf_path)
+        try:
+            response = session.post(base_url + 'processFulltextDocument', data=upload,
+                                    headers={"Content-Type": upload.content_type}, timeout=timeout)
+            if response.status_code == 200:
+                return response.text
+            error = f"Error: {response.status_code} {response.text}"
+            retry = response.status_code in BUSY_CODES
+        except requests.RequestException as e:
+            error = f"Error: {e}"
+            # GROBID is starting or restarting, a timeout is a PDF that takes too long and is not retried
+            retry = isinstance(e, requests.ConnectionError)
+        finally:
+            if upload.handle is not None:
+                upload.handle.close()
+
+        if not retry or attempt == retries:
+            raise RuntimeError(error)
+
+        # Wait a random time up to the backoff, which doubles after every attempt
+        time.sleep(random.uniform(0, backoff * 2 ** attempt))
+
+def PDF_to_TEI(pdf_files: list, folder: str, output_folder: str, base_url: str, workers: int = 4, verbose: bool = False,
+               retries: int = 5, backoff: float = 1.0) -> int:
     '''
     Convert a list of PDF files to TEI XML files using GROBID service.\n
+    The PDFs are sent by a pool of worker threads, PDFs that were converted before are skipped.\n
     \n
     Parameters:\n
     - pdf_files: List of PDF files to be converted to TEI XML\n
+    - folder: The folder with the PDF files\n
+    - output_folder: The output folder for the TEI files\n
+    - base_url: The URL of the GROBID API\n
+    - workers: The amount of PDFs that are sent to GROBID at once\n
     - verbose: If True, print verbose output\n
+    - retries: The amount of times a busy request is retried\n
+    - backoff: The maximum wait before the first retry in seconds\n
+    \n
+    Returns:\n
+    - count: The amount of PDFs that were sent to GROBID and converted
     '''
+
+    manifest = load_manifest(output_folder)
+
+    # One session for all workers, so the connections to GROBID are reused
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    # Select the PDFs that have to be sent to GROBID
+    todo = {}
     for file in pdf_files:
-        input_json = {"input" : open(os.path.join(args.folder, file), "rb").read()}
-        response = requests.post(base_url + 'processFulltextDocument', files=input_json)
+        file_name = file.split('.pdf')[0]
+        tei_file = f'{file_name}.grobid.tei.xml'
+        output_file_path = os.path.join(output_folder, tei_file)
+        sha = file_hash(os.path.join(folder, file))
+
+        if sha in manifest and os.path.exists(os.path.join(output_folder, manifest[sha])):
+            # The same PDF was converted before, possibly under another name
+            if not os.path.exists(output_file_path):
+                shutil.copyfile(os.path.join(output_folder, manifest[sha]), output_file_path)
+            if verbose:
+                print(f"Skipping {file_name}, it was converted before")
+        elif os.path.exists(output_file_path):
+            # Converted before the manifest was kept
+            add_to_manifest(output_folder, manifest, sha, tei_file)
+            if verbose:
+                print(f"Skipping {file_name}, {output_file_path} already exists")
+        else:
+            # PDFs with the same content are sent once, the TEI file is copied for the others
+            todo[file] = sha
 
-        if response.status_code == 200:
-            # We received a successful response, let's save the XML to a file
-            xml_content = response.text
+    count = 0
+    first = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for file, sha in todo.items():
+            if sha in first:
+                continue
+            first[sha] = file
+            futures[executor.submit(convert_pdf, session, base_url, os.path.join(folder, file), retries, backoff)] = file
 
-            # Specify the path where you want to save the file
+        for future in as_completed(futures):
+            file = futures[future]
             file_name = file.split('.pdf')[0]
-            output_file_path = os.path.join(args.output_folder, f'{file_name}.grobid.tei.xml')
+            try:
+                xml_content = future.result()
+            except Exception as e:
+                print(f"Could not process {file_name}: {e}")
+                continue
 
             # Writing the XML content to the file
-            with open(output_file_path, 'w', encoding='utf-8') as file:
-                file.write(xml_content)
+            tei_file = f'{file_name}.grobid.tei.xml'
+            output_file_path = os.path.join(output_folder, tei_file)
+            with open(output_file_path, 'w', encoding='utf-8') as handle:
+                handle.write(xml_content)
+            add_to_manifest(output_folder, manifest, todo[file], tei_file)
+            count += 1
+
             if verbose:
                 print(f"Finished processing {file_name}. TEI content has been written to {output_file_path}")
-        else:
-            print(f"Error: {response.status_code}")
-            print(response.text)
+
+    # Copy the TEI files of PDFs with the same content
+    for file, sha in todo.items():
+        if first[sha] != file and sha in manifest:
+            shutil.copyfile(os.path.join(output_folder, manifest[sha]), os.path.join(output_folder, f"{file.split('.pdf')[0]}.grobid.tei.xml"))
+
+    session.close()
+    return count
 
 
 if __name__ == "__main__":
@@ -57,6 +286,7 @@ if __name__ == "__main__":
     parser.add_argument("--folder", dest="folder", required=True, help="Provide the path to the folder with PDF files")
     parser.add_argument("--output_folder", dest="output_folder", required=True, help="Provide the path to the output folder with TEI files")
     parser.add_argument("--port", dest='port', required=False, default=8081, help="Provide the port number for GROBID")
+    parser.add_argument("--workers", dest="workers", required=False, type=int, default=4, help="Number of PDFs that are sent to GROBID at once (default 4)")
     parser.add_argument("-v", dest="verbose", required=False, default=False, action="store_true", help="Be verbose")
     args=parser.parse_args()
 
@@ -66,8 +296,8 @@ if __name__ == "__main__":
     pdf_files = [f for f in os.listdir(args.folder) if f.endswith('.pdf')]
     if args.verbose:
         print(f"{datetime.now().time().strftime('%H:%M:%S')} - Found {len(pdf_files)} PDF files in the folder. Processing...")
-    PDF_to_TEI(pdf_files, verbose=args.verbose)
+    PDF_to_TEI(pdf_files, folder=args.folder, output_folder=args.output_folder, base_url=base_url, workers=args.workers,
+               verbose=args.verbose)
     if args.verbose:
         print("All PDF files have been processed.")
-    
 
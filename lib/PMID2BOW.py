@@ -2,15 +2,18 @@
 
 '''
 This script is used to load the records from the JSON database and train a classifier to predict the categories using a set of keywords.
-The script has three required arguments. ::
+The script has four required arguments and one optional argument. ::
 
     Required:
     
-    -j : The path to the json database
+    -j : The path to the database, in any format read by DatabaseStore.read_records
     -k : The path to keyword file
     -o : The path to the output file
     -e: The type of embedding to use (abstract for only abstracts, title_abstract for abstracts and titles)
 
+    Optional:
+    --shard: Process only shard i of N of the database, for example 0/8 (see DatabaseShards)
+
     
     Usage:
     
@@ -19,11 +22,17 @@ The script has three required arguments. ::
 '''
 
 # Import the required libraries
-import ijson
 import argparse
 import re
 import pandas as pd
 import numpy as np
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.DatabaseStore import parse_shard, read_records
 
 def read_keyword_file(file_path: str) -> dict:
     # Make docstring with rst syntax
@@ -88,39 +97,37 @@ def print_results(myid, result_dict):
 if __name__ == "__main__":
     # Create a parser object and add arguments
     parser=argparse.ArgumentParser()
-    parser.add_argument("-j", dest = "json_file",    required = True,  help = "Provide the path to the datafolder")
+    parser.add_argument("-j", dest = "json_file",    required = True,  help = "Provide the path to the database, in any format read by DatabaseStore.read_records")
     parser.add_argument("-o", dest = "output_file",  required = True,  help = "Provide the name of the output file")
     parser.add_argument("-k", dest = "keyword_file", required = True,  help = "Provide the name of the keyword_file")
     parser.add_argument("-e", dest="embedding_type", required=True, default="abstract", help="Mode for embedding: abstract for only abstracts, title_abstract for abstracts and titles")
+    parser.add_argument("--shard", dest="shard", required=False, type=parse_shard, default=None, help="Process only shard i of N of the database, for example 0/8 (see DatabaseShards)")
 
     args=parser.parse_args()
 
     category_dict = read_keyword_file(args.keyword_file)
     
     counter=0
-    with open(args.json_file, 'rb') as file:
-        # Parse the JSON objects one by one
-        parser = ijson.items(file, 'item')
-        result = {}
-        # Iterate over the JSON objects
-        for item in parser:
-            counter = counter + 1
-            text = ''
-            
-            if args.embedding_type not in ["abstract", "title", "title_abstract"]:
-                raise ValueError("Invalid embedding type. Please use abstract, title or title_abstract")
-            
-            if args.embedding_type == "title_abstract" or args.embedding_type == "title":
-                if item['title'] is not None:
-                    text += item['title']
-                    store = True
-                    
-            if args.embedding_type == "title_abstract" or args.embedding_type == "abstract":
-                if item['abstract'] is not None:
-                    text += item['abstract']
-                    store = True
-            
-            result[item['pmid']] = process_text(text = text, bow = category_dict)
+    result = {}
+    # Stream over the database, only the fields that are needed are read
+    for item in read_records(args.json_file, columns=['pmid', 'title', 'abstract'], shard=args.shard):
+        counter = counter + 1
+        text = ''
+        
+        if args.embedding_type not in ["abstract", "title", "title_abstract"]:
+            raise ValueError("Invalid embedding type. Please use abstract, title or title_abstract")
+        
+        if args.embedding_type == "title_abstract" or args.embedding_type == "title":
+            if item['title'] is not None:
+                text += item['title']
+                store = True
+                
+        if args.embedding_type == "title_abstract" or args.embedding_type == "abstract":
+            if item['abstract'] is not None:
+                text += item['abstract']
+                store = True
+        
+        result[item['pmid']] = process_text(text = text, bow = category_dict)
   
     mypd = pd.DataFrame.from_dict(result).transpose() 
   
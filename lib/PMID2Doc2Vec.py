@@ -3,7 +3,7 @@
 '''
 This script takes a set of PMIDs and retrieves the abstracts from the NCBI database.
 These abstracts are then embedded using the Doc2Vec model and saved to a CSV file where the first column is the PMID and the rest of the columns are the embeddings.
-The script has four required and four optional arguments. ::
+The script has four required and five optional arguments. ::
 
     Required:
     
@@ -17,6 +17,7 @@ The script has four required and four optional arguments. ::
     --load-model: Name of the model to load
     --epochs: Number of epochs for training the model (default 40)
     --workers: Number of workers for training the model (default 4)
+    --shard: Process only shard i of N of the database with a trained model, for example 0/8 (see DatabaseShards)
     
     Usage:
     
@@ -32,11 +33,17 @@ The script has four required and four optional arguments. ::
 
 import argparse
 from datetime import datetime
-import ijson
 from gensim.parsing.preprocessing import remove_stopwords
 from gensim.models.doc2vec import Doc2Vec, TaggedDocument
 from gensim.utils import simple_preprocess
 import numpy as np
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.DatabaseStore import parse_shard, read_records
 
 def print_time(message: str) -> None:
     # Make docstring with rst syntax
@@ -114,15 +121,16 @@ def embed_texts(model, texts) -> list[str]:
 
 
 
-def get_texts(pmids: list, database_file: str, embedding_type: str) -> dict:
+def get_texts(pmids: list, database_file: str, embedding_type: str, shard: tuple | None = None) -> dict:
     # Make docstring with rst syntax
     '''
     Get the texts from the JSON database file for a list of PMIDs.\n
     \n
     Parameters:\n
     - pmids: A list of PMIDs\n
-    - database_file: The path to the JSON database file\n
+    - database_file: The path to the database, in any format read by DatabaseStore.read_records\n
     - embedding_type: The type of embedding to use (1 for only abstracts, 2 for abstracts and titles)\n
+    - shard: A tuple (i, N) to read only shard i of N of the database, by default the whole database\n
     \n
     Returns:\n
     - pmid_texts: A dictionary with PMIDs as keys and texts as values\n
@@ -134,35 +142,29 @@ def get_texts(pmids: list, database_file: str, embedding_type: str) -> dict:
     none_abstracts = 0
     none_titles = 0
     
-    # Stream over the JSON file
-    with open(database_file, 'rb') as file:
-        # Create a parser object over the JSON file
-        parser = ijson.items(file, 'item')
+    # Stream over the database, only the titles and abstracts of the selected PMIDs are read
+    for item in read_records(database_file, columns=['pmid', 'title', 'abstract'], pmids=pmids, shard=shard):
+        text = ''
+        store = False
+        if embedding_type not in ["abstract", "title", "title_abstract"]:
+            raise ValueError("Invalid embedding type. Please use abstract, title or title_abstract")
         
-        # Iterate over the JSON objects
-        for item in parser:
-            if item['pmid'] in pmids:
-                text = ''
-                store = False
-                if embedding_type not in ["abstract", "title", "title_abstract"]:
-                    raise ValueError("Invalid embedding type. Please use abstract, title or title_abstract")
+        if embedding_type == "title_abstract" or embedding_type == "title":
+            if item['title'] is not None:
+                text += item['title']
+                store = True
+            else:
+                none_titles += 1
                 
-                if embedding_type == "title_abstract" or embedding_type == "title":
-                    if item['title'] is not None:
-                        text += item['title']
-                        store = True
-                    else:
-                        none_titles += 1
-                        
-                if embedding_type == "title_abstract" or embedding_type == "abstract":
-                    if item['abstract'] is not None:
-                        text += item['abstract']
-                        store = True
-                    else:
-                        none_abstracts += 1
-                    
-                if store: 
-                    pmid_texts[item['pmid']] = text                       
+        if embedding_type == "title_abstract" or embedding_type == "abstract":
+            if item['abstract'] is not None:
+                text += item['abstract']
+                store = True
+            else:
+                none_abstracts += 1
+            
+        if store: 
+            pmid_texts[item['pmid']] = text                       
     
     return pmid_texts, none_abstracts, none_titles
 
@@ -173,7 +175,7 @@ if __name__ == "__main__":
     # Create a parser object and add arguments
     parser=argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("-p", dest="pmid_file", required=True, help="Provide the path to the positive pmid file")
-    parser.add_argument("-d", dest="pmid_database", required=True, help="Provide the path to the datafolder")
+    parser.add_argument("-d", dest="pmid_database", required=True, help="Provide the path to the database, in any format read by DatabaseStore.read_records")
     parser.add_argument("-o", dest="output_file", required=True, help="Provide the name of the output CSV file")
     parser.add_argument("-e", dest="embedding_type", required=True, default="abstract", help="Mode for embedding: abstract for only abstracts, title for only titles, or title_abstract for abstracts and titles")
     
@@ -181,10 +183,15 @@ if __name__ == "__main__":
     parser.add_argument("--load-model", dest="load_model", required=False, default=None, help="Provide the path to load the model from")
     parser.add_argument("--epochs", dest="epochs", required=False, type=int, default=40, help="Number of epochs for training the model")
     parser.add_argument("--workers", dest="workers", required=False, type=int, default=4, help="Number of workers for training the model")
+    parser.add_argument("--shard", dest="shard", required=False, type=parse_shard, default=None, help="Process only shard i of N of the database, for example 0/8 (see DatabaseShards)")
 
     # Read arguments from the command line
     args=parser.parse_args()
 
+    # A model trained on a shard would differ between the shards
+    if args.shard and not args.load_model:
+        parser.error("--shard needs a trained model (--load-model)")
+
     # Read the PMIDs from the txt file
     with open(args.pmid_file) as file:
         pmids = file.read().splitlines()
@@ -195,7 +202,8 @@ if __name__ == "__main__":
     pmid_texts, abs_none, title_none = get_texts(
         pmids=pmids, 
         database_file=args.pmid_database, 
-        embedding_type=args.embedding_type
+        embedding_type=args.embedding_type,
+        shard=args.shard
         )
     
     if args.embedding_type == "title_abstract":
@@ -3,7 +3,7 @@
 '''
 This script takes a set of PMIDs and retrieves the abstracts from the NCBI database.
 These abstracts are then embedded using the SentenceTransformer model and saved to a Numpy file where the first column is the PMID and the rest of the columns are the embeddings.
-The script has five required arguments. ::
+The script has five required arguments and one optional argument. ::
 
     Required:
     
@@ -12,6 +12,9 @@ The script has five required arguments. ::
     -o: The name of the output file
     -e: The type of embedding to use (abstract for only abstracts, title for only titles, title_abstract for abstracts and titles)
     -m: The key of the SentenceTransformer model to use. Options are minilml6, minilml12, mpnetv2, roberta, biobert, pubmedbert
+
+    Optional:
+    --shard: Process only shard i of N of the database, for example 0/8 (see DatabaseShards)
     
     Usage:
     
@@ -22,9 +25,15 @@ The script has five required arguments. ::
 # Import the required libraries
 import argparse
 from datetime import datetime
-import ijson
 import numpy as np
 from sentence_transformers import SentenceTransformer
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.DatabaseStore import parse_shard, read_records
 
 def print_time(message: str) -> None:
     # Make docstring with rst syntax
@@ -60,15 +69,16 @@ def load_model(model_name: str = 'all-MiniLM-L6-v2') -> SentenceTransformer:
     model = SentenceTransformer(model_name)
     return model
 
-def get_texts(pmids: list, database_file: str, embedding_type: str) -> dict:
+def get_texts(pmids: list, database_file: str, embedding_type: str, shard: tuple | None = None) -> dict:
     # Make docstring with rst syntax
     '''
     Get the texts from the JSON database file for a list of PMIDs.\n
     \n
     Parameters:\n
     - pmids: A list of PMIDs\n
-    - database_file: The path to the JSON database file\n
+    - database_file: The path to the database, in any format read by DatabaseStore.read_records\n
     - embedding_type: The type of embedding to use (abstract for only abstracts, title_abstract for abstracts and titles)\n
+    - shard: A tuple (i, N) to read only shard i of N of the database, by default the whole database\n
     \n
     Returns:\n
     - pmid_texts: A dictionary with PMIDs as keys and texts as values\n
@@ -80,35 +90,29 @@ def get_texts(pmids: list, database_file: str, embedding_type: str) -> dict:
     none_abstracts = 0
     none_titles = 0
     
-    # Stream over the JSON file
-    with open(database_file, 'rb') as file:
-        # Create a parser object over the JSON file
-        parser = ijson.items(file, 'item')
+    # Stream over the database, only the titles and abstracts of the selected PMIDs are read
+    for item in read_records(database_file, columns=['pmid', 'title', 'abstract'], pmids=pmids, shard=shard):
+        text = ''
+        store = False
+        if embedding_type not in ["abstract", "title", "title_abstract"]:
+            raise ValueError("Invalid embedding type. Please use abstract, title or title_abstract")
         
-        # Iterate over the JSON objects
-        for item in parser:
-            if item['pmid'] in pmids:
-                text = ''
-                store = False
-                if embedding_type not in ["abstract", "title", "title_abstract"]:
-                    raise ValueError("Invalid embedding type. Please use abstract, title or title_abstract")
+        if embedding_type == "title_abstract" or embedding_type == "title":
+            if item['title'] is not None:
+                text += item['title']
+                store = True
+            else:
+                none_titles += 1
                 
-                if embedding_type == "title_abstract" or embedding_type == "title":
-                    if item['title'] is not None:
-                        text += item['title']
-                        store = True
-                    else:
-                        none_titles += 1
-                        
-                if embedding_type == "title_abstract" or embedding_type == "abstract":
-                    if item['abstract'] is not None:
-                        text += item['abstract']
-                        store = True
-                    else:
-                        none_abstracts += 1
-                    
-                if store: 
-                    pmid_texts[item['pmid']] = text                       
+        if embedding_type == "title_abstract" or embedding_type == "abstract":
+            if item['abstract'] is not None:
+                text += item['abstract']
+                store = True
+            else:
+                none_abstracts += 1
+            
+        if store: 
+            pmid_texts[item['pmid']] = text                       
     
     return pmid_texts, none_abstracts, none_titles
 
@@ -142,10 +146,11 @@ if __name__ == "__main__":
     # Create a parser object and add arguments
     parser=argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("-p", dest="pmid_file", required=True, help="Provide the path to the positive pmid file")
-    parser.add_argument("-d", dest="pmid_database", required=True, help="Provide the path to the datafolder")
+    parser.add_argument("-d", dest="pmid_database", required=True, help="Provide the path to the database, in any format read by DatabaseStore.read_records")
     parser.add_argument("-o", dest="output_file", required=True, help="Provide the name of the output .npy file")
     parser.add_argument("-e", dest="embedding_type", required=True, default="abstract", help="Mode for embedding: abstract for only abstracts, title for only titles, or title_abstract for abstracts and titles")
     parser.add_argument("-m", dest="model_name", required=False, default="minilml6", help="The key of the SentenceTransformer model to use. Options are minilml6, minilml12, mpnetv2, roberta, biobert, pubmedbert")
+    parser.add_argument("--shard", dest="shard", required=False, type=parse_shard, default=None, help="Process only shard i of N of the database, for example 0/8 (see DatabaseShards)")
     
     # Read arguments from the command line
     args=parser.parse_args()
@@ -169,7 +174,8 @@ if __name__ == "__main__":
     pmid_texts, abs_none, title_none = get_texts(
         pmids=pmids, 
         database_file=args.pmid_database, 
-        embedding_type=args.embedding_type
+        embedding_type=args.embedding_type,
+        shard=args.shard
         )
     
     if args.embedding_type == "title_abstract":
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+
+'''
+This script retrieves the OpenAlex identifiers, the citation count and the open access information of a list of PMIDs.
+The result is a JSON file with the PMIDs as keys that can be merged into the database with DatabaseMerge. ::
+
+    {
+        "39463945": {
+            "pmid": "39463945",
+            "openalex_id": "W4403385606",
+            "pmcid": "",
+            "doi": "10.1101/2024.10.13.617729",
+            "cited_by_count": 2,
+            "pdf_url": "https://www.biorxiv.org/content/biorxiv/early/2024/10/14/2024.10.13.617729.full.pdf",
+            "is_oa": true,
+            "is_oa_anywhere": true
+        }
+    }
+
+The works are requested with the OR syntax of the OpenAlex filters (pmid:1|2|3), so a single request returns the works of up to
+100 PMIDs. The batches are sent by a pool of worker threads that share one token bucket, which keeps the requests below the limit
+of the OpenAlex polite pool. Only the fields that end up in the output are requested. With a cache folder the responses are stored
+in a ResponseCache, so a re-run does not send the same requests again.
+
+The script has three required arguments and three optional arguments. ::
+
+    Required:
+
+    -p : The path to the file with PMIDs on each line
+    -e : Your email address, it places the requests in the OpenAlex polite pool
+    -o : The path to the output JSON file, compressed when it ends in .gz or .zst
+
+    Optional:
+    --workers: Number of requests that are sent at once (default 4)
+    --cache: Path to a folder for cached OpenAlex responses
+    --cache-ttl: Time in hours that cached responses are used (default 24)
+
+    Usage:
+
+    python3 PMID2Openalex.py -p pmids.txt -e your_email@email.com -o openalex.json
+
+'''
+
+# Import the required libraries
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.Compression import open_file
+from lib.EntrezFetch import TokenBucket
+from lib.ResponseCache import ResponseCache
+
+OPENALEX_URL = "https://api.openalex.org/"
+
+# OpenAlex accepts up to 100 values in a single OR filter and returns up to 200 works per page
+MAX_FILTER_VALUES = 100
+PER_PAGE = 200
+
+# The fields that are needed for the output
+SELECT = "id,ids,doi,cited_by_count,primary_location,open_access"
+
+class OpenalexClient:
+    # Make docstring with rst syntax
+    '''
+    Client for the OpenAlex works API that sends every request through a shared token bucket.\n
+    \n
+    Parameters:\n
+    - email: The email address for the OpenAlex polite pool\n
+    - base_url: The base URL of the OpenAlex API, change it to use a local test server\n
+    - bucket: A TokenBucket to share between clients, by default a new bucket of 10 requests per second is created\n
+    - timeout: The timeout of a single request in seconds\n
+    - cache: A ResponseCache for the responses, by default nothing is cached\n
+    - retries: The amount of times a failed request is retried\n
+    - backoff: The maximum wait before the first retry in seconds, the maximum doubles after every retry\n
+    - per_page: The amount of works per page, at most 200\n
+    '''
+
+    def __init__(self, email: str | None = None, base_url: str = OPENALEX_URL, bucket: TokenBucket | None = None,
+                 timeout: float = 60, cache: ResponseCache | None = None, retries: int = 3, backoff: float = 1,
+                 per_page: int = PER_PAGE) -> None:
+        self.email = email
+        self.base_url = base_url
+        self.timeout = timeout
+        self.cache = cache
+        self.retries = retries
+        self.backoff = backoff
+        self.per_page = per_page
+
+        # The polite pool allows 10 requests per second
+        if bucket is None:
+            bucket = TokenBucket(rate=10)
+        self.bucket = bucket
+
+    def request(self, endpoint: str, params: dict) -> dict:
+        # Make docstring with rst syntax
+        '''
+        Send a request to the OpenAlex API and return the decoded response.\n
+        Rate limited and failed requests are retried with exponential backoff.\n
+        If the client has a cache, the response is taken from the cache when possible, without waiting for the rate limit.\n
+        \n
+        Parameters:\n
+        - endpoint: The name of the entity, for example works\n
+        - params: A dictionary with the parameters of the request\n
+        \n
+        Returns:\n
+        - data: The decoded JSON response
+        '''
+
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(self.base_url + endpoint, params)
+            data = self.cache.get(key)
+            if data is not None:
+                return json.loads(data)
+
+        params = dict(params)
+        if self.email:
+            params["mailto"] = self.email
+        url = self.base_url + endpoint + "?" + urllib.parse.urlencode(params, safe="|,:*")
+
+        for attempt in range(self.retries + 1):
+            # Wait for our turn before sending the request
+            self.bucket.acquire()
+            try:
+                with urllib.request.urlopen(url, timeout=self.timeout) as handle:
+                    data = handle.read()
+                break
+            except urllib.error.HTTPError as e:
+                if (e.code != 429 and e.code < 500) or attempt == self.retries:
+                    raise
+            except OSError:
+                if attempt == self.retries:
+                    raise
+
+            # Wait a random time up to the backoff, which doubles after every attempt
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+        if key is not None:
+            self.cache.put(key, data)
+        return json.loads(data)
+
+    def works(self, field: str, values: list) -> list:
+        # Make docstring with rst syntax
+        '''
+        Get all works that match one of the values of a filter, the pages are followed with the OpenAlex cursor.\n
+        OpenAlex gives a next cursor until it has returned an empty page, so the paging stops when all works of the count
+        are collected or a page is not full, which saves a request for every batch.\n
+        \n
+        Parameters:\n
+        - field: The name of the filter, for example pmid or doi\n
+        - values: A list of at most 100 values\n
+        \n
+        Returns:\n
+        - works: A list with the works as dictionaries
+        '''
+
+        params = {"filter": f"{field}:" + "|".join(values), "per-page": self.per_page, "select": SELECT, "cursor": "*"}
+        works = []
+        while True:
+            data = self.request("works", params)
+            works += data["results"]
+
+            meta = data.get("meta", {})
+            cursor = meta.get("next_cursor")
+            if not cursor or len(data["results"]) < self.per_page or len(works) >= meta.get("count", float("inf")):
+                return works
+            params["cursor"] = cursor
+
+    def works_batched(self, field: str, values: list, workers: int = 4) -> list:
+        # Make docstring with rst syntax
+        '''
+        Get the works of a long list of values, the values are split in batches that are requested concurrently.\n
+        \n
+        Parameters:\n
+        - field: The name of the filter, for example pmid or doi\n
+        - values: A list of values\n
+        - workers: The amount of requests that are sent at once\n
+        \n
+        Returns:\n
+        - works: A list with the works as dictionaries, in the order of the batches
+        '''
+
+        batches = [values[i:i + MAX_FILTER_VALUES] for i in range(0, len(values), MAX_FILTER_VALUES)]
+        works = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch_works in executor.map(lambda batch: self.works(field, batch), batches):
+                works += batch_works
+        return works
+
+def strip_prefix(value: str | None) -> str | None:
+    # OpenAlex gives identifiers as URLs, keep the last part
+    return value.rstrip("/").split("/")[-1] if value else value
+
+def work_to_record(work: dict) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Convert an OpenAlex work to the record that is merged into the database.\n
+    \n
+    Parameters:\n
+    - work: The work as returned by the OpenAlex API\n
+    \n
+    Returns:\n
+    - record: A dictionary with the pmid, openalex_id, pmcid, doi, cited_by_count, pdf_url, is_oa and is_oa_anywhere
+    '''
+
+    ids = work.get("ids") or {}
+    primary_location = work.get("primary_location") or {}
+    open_access = work.get("open_access") or {}
+    doi = ids.get("doi") or work.get("doi")
+
+    return {
+        "pmid": strip_prefix(ids.get("pmid")),
+        "openalex_id": strip_prefix(work.get("id")),
+        "pmcid": strip_prefix(ids.get("pmcid")) or "",
+        "doi": doi.replace("https://doi.org/", "") if doi else None,
+        "cited_by_count": work.get("cited_by_count"),
+        "pdf_url": primary_location.get("pdf_url"),
+        "is_oa": bool(primary_location.get("is_oa")),
+        "is_oa_anywhere": bool(open_access.get("is_oa"))
+        }
+
+def read_ids(id_file: str) -> list:
+    # Make docstring with rst syntax
+    '''
+    Read a file with an identifier on each line, duplicates and empty lines are removed.\n
+    \n
+    Parameters:\n
+    - id_file: The path to the file\n
+    \n
+    Returns:\n
+    - ids: A list of identifiers in the order of the file
+    '''
+
+    with open(id_file, 'r') as file:
+        return list(dict.fromkeys(line.strip() for line in file if line.strip()))
+
+def pmid_enrichment(pmids: list, client: OpenalexClient, workers: int = 4) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Retrieve the information of a list of PMIDs from OpenAlex.\n
+    \n
+    Parameters:\n
+    - pmids: A list of PMIDs\n
+    - client: The OpenalexClient\n
+    - workers: The amount of requests that are sent at once\n
+    \n
+    Returns:\n
+    - results: A dictionary with the PMIDs as keys and the records as values, PMIDs that are not in OpenAlex are left out
+    '''
+
+    results = {}
+    for work in client.works_batched("pmid", pmids, workers=workers):
+        record = work_to_record(work)
+        # Keep the first work when a PMID belongs to several works
+        if record["pmid"] and record["pmid"] not in results:
+            results[record["pmid"]] = record
+
+    # Same order as the PMID file
+    return {pmid: results[pmid] for pmid in pmids if pmid in results}
+
+def dois_to_pmids(dois: list, client: OpenalexClient, workers: int = 4) -> list:
+    # Make docstring with rst syntax
+    '''
+    Look up the PMIDs of a list of DOIs in OpenAlex.\n
+    \n
+    Parameters:\n
+    - dois: A list of DOIs, with or without the https://doi.org/ prefix\n
+    - client: The OpenalexClient\n
+    - workers: The amount of requests that are sent at once\n
+    \n
+    Returns:\n
+    - pmids: A list with the PMID of every DOI that was found, "Not found" for works without a PMID
+    '''
+
+    dois = [doi.replace("https://doi.org/", "") for doi in dois]
+    works = client.works_batched("doi", dois, workers=workers)
+    return [strip_prefix((work.get("ids") or {}).get("pmid")) or "Not found" for work in works]
+
+if __name__ == "__main__":
+
+    # Create a parser object and add arguments
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-p", dest="pmid_file", required=True, help="Provide the path to the file with PMIDs on each line")
+    parser.add_argument("-e", dest="email", required=True, help="Provide your email address for OpenAlex")
+    parser.add_argument("-o", dest="output_file", required=True, help="Provide the path to the output JSON file")
+    parser.add_argument("--workers", dest="workers", required=False, type=int, default=4, help="Number of requests that are sent at once (default 4)")
+    parser.add_argument("--cache", dest="cache", required=False, default=None, help="Provide the path to a folder for cached OpenAlex responses")
+    parser.add_argument("--cache-ttl", dest="cache_ttl", required=False, type=float, default=24, help="Time in hours that cached responses are used (default 24)")
+
+    # Read arguments from the command line
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.cache, ttl=args.cache_ttl * 3600) if args.cache else None
+    client = OpenalexClient(args.email, cache=cache)
+
+    pmids = read_ids(args.pmid_file)
+    results = pmid_enrichment(pmids, client, workers=args.workers)
+
+    with open_file(args.output_file, 'wt') as file:
+        json.dump(results, file, indent=4)
+    print(f"Found {len(results)} of {len(pmids)} PMIDs in OpenAlex")
@@ -3,7 +3,7 @@
 '''
 This script takes a set of PMIDs and retrieves the abstracts from the NCBI database.
 These abstracts are then embedded using the TF-IDF model and saved to a CSV file where the first column is the PMID and the rest of the columns are the embeddings.
-The script has four required and three optional arguments. ::
+The script has four required and five optional arguments. ::
 
     Required:
     
@@ -18,6 +18,7 @@ The script has four required and three optional arguments. ::
     --save-model: Name for the saved model
     --load-model: Name of the model to load
     --ngrams: How many ngrams to use (default 3)
+    --shard: Process only shard i of N of the database with a trained model, for example 0/8 (see DatabaseShards)
 
     Usage:
     
@@ -33,12 +34,18 @@ The script has four required and three optional arguments. ::
 
 import argparse
 from datetime import datetime
-import ijson
 from joblib import load, dump
 import numpy as np
 from scipy.sparse import sparray
 from tqdm import tqdm
 from sklearn.feature_extraction.text import TfidfVectorizer
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.DatabaseStore import parse_shard, read_records
 
 def print_time(message: str) -> None:
     # Make docstring with rst syntax
@@ -115,15 +122,16 @@ def embed_texts(model, texts) -> tuple[sparray, np.ndarray]:
     return np_matrix, np_pmids
 
 
-def get_texts(pmids: list, database_file: str, embedding_type: str) -> dict:
+def get_texts(pmids: list, database_file: str, embedding_type: str, shard: tuple | None = None) -> dict:
     # Make docstring with rst syntax
     '''
     Get the texts from the JSON database file for a list of PMIDs.\n
     \n
     Parameters:\n
     - pmids: A list of PMIDs\n
-    - database_file: The path to the JSON database file\n
+    - database_file: The path to the database, in any format read by DatabaseStore.read_records\n
     - embedding_type: The type of embedding to use (1 for only abstracts, 2 for abstracts and titles)\n
+    - shard: A tuple (i, N) to read only shard i of N of the database, by default the whole database\n
     \n
     Returns:\n
     - pmid_texts: A dictionary with PMIDs as keys and texts as values\n
@@ -135,35 +143,29 @@ def get_texts(pmids: list, database_file: str, embedding_type: str) -> dict:
     none_abstracts = 0
     none_titles = 0
     
-    # Stream over the JSON file
-    with open(database_file, 'rb') as file:
-        # Create a parser object over the JSON file
-        parser = ijson.items(file, 'item')
+    # Stream over the database, only the titles and abstracts of the selected PMIDs are read
+    for item in tqdm(read_records(database_file, columns=['pmid', 'title', 'abstract'], pmids=pmids, shard=shard)):
+        text = ''
+        store = False
+        if embedding_type not in ["abstract", "title", "title_abstract"]:
+            raise ValueError("Invalid embedding type. Please use abstract, title or title_abstract")
         
-        # Iterate over the JSON objects
-        for item in tqdm(parser):
-            if item['pmid'] in pmids:
-                text = ''
-                store = False
-                if embedding_type not in ["abstract", "title", "title_abstract"]:
-                    raise ValueError("Invalid embedding type. Please use abstract, title or title_abstract")
+        if embedding_type == "title_abstract" or embedding_type == "title":
+            if item['title'] is not None:
+                text += item['title']
+                store = True
+            else:
+                none_titles += 1
                 
-                if embedding_type == "title_abstract" or embedding_type == "title":
-                    if item['title'] is not None:
-                        text += item['title']
-                        store = True
-                    else:
-                        none_titles += 1
-                        
-                if embedding_type == "title_abstract" or embedding_type == "abstract":
-                    if item['abstract'] is not None:
-                        text += item['abstract']
-                        store = True
-                    else:
-                        none_abstracts += 1
-                    
-                if store: 
-                    pmid_texts[item['pmid']] = text                       
+        if embedding_type == "title_abstract" or embedding_type == "abstract":
+            if item['abstract'] is not None:
+                text += item['abstract']
+                store = True
+            else:
+                none_abstracts += 1
+            
+        if store: 
+            pmid_texts[item['pmid']] = text                       
     
     return pmid_texts, none_abstracts, none_titles
 
@@ -172,7 +174,7 @@ if __name__ == "__main__":
     # Create a parser object and add arguments
     parser=argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("-p", dest="pmid_file", required=True, help="Provide the path to the positive pmid file")
-    parser.add_argument("-d", dest="pmid_database", required=True, help="Provide the path to the datafolder")
+    parser.add_argument("-d", dest="pmid_database", required=True, help="Provide the path to the database, in any format read by DatabaseStore.read_records")
     parser.add_argument("-o", dest="output_file", required=True, help="Provide the name of the output NPZ file")
     parser.add_argument("-e", dest="embedding_type", required=True, default="abstract", help="Mode for embedding: abstract for only abstracts, title for only titles, or title_abstract for abstracts and titles")
     
@@ -180,10 +182,15 @@ if __name__ == "__main__":
     parser.add_argument("--save-model", dest="save_model", required=False, default=None, help="Provide the path to save the model")
     parser.add_argument("--load-model", dest="load_model", required=False, default=None, help="Provide the path to load the model from")
     parser.add_argument("--ngrams", dest="ngrams", required=False, type=int, default=3, help="Number of ngrams to use")
+    parser.add_argument("--shard", dest="shard", required=False, type=parse_shard, default=None, help="Process only shard i of N of the database, for example 0/8 (see DatabaseShards)")
 
     # Read arguments from the command line
     args=parser.parse_args()
 
+    # A model trained on a shard would differ between the shards
+    if args.shard and not args.load_model:
+        parser.error("--shard needs a trained model (--load-model)")
+
     print_time("Reading PMIDs...")
 
     # Read the positive and negative PMIDs from the txt files
@@ -196,7 +203,8 @@ if __name__ == "__main__":
     pmid_texts, abs_none, title_none = get_texts(
         pmids=pmids, 
         database_file=args.pmid_database, 
-        embedding_type=args.embedding_type
+        embedding_type=args.embedding_type,
+        shard=args.shard
         )
     
     if args.embedding_type == "title_abstract":
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+
+'''
+This module converts PubMed XML to the records of the main database.
+It is shared by the scripts that read PubMed XML: the offline ingest of the PubMed baseline and update files (PubmedXML2Database)
+and the XML fetch mode of the retrieval scripts.
+
+The XML is parsed incrementally with the C-backed ElementTree.iterparse. Every PubmedArticle is converted as soon as its end
+tag is read and is freed right after, so memory use does not depend on the size of the file.
+Every article is converted to the same fields, in the same format, as Medline2JSON.record_to_dict produces for the MEDLINE
+format, so records from both sources can be mixed in one database.
+The XML only holds the ISSN of the journal issue and the linking ISSN, so a second ISSN that NCBI lists in the MEDLINE format
+is not available.
+'''
+
+# Import the required libraries
+import gzip
+import xml.etree.ElementTree as ET
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+def element_text(element) -> str:
+    # Make docstring with rst syntax
+    '''
+    Get the text of an element including the text of inline markup (<i>, <sup>, ...), with the whitespace collapsed like
+    the MEDLINE format does.\n
+    \n
+    Parameters:\n
+    - element: An ElementTree element\n
+    \n
+    Returns:\n
+    - text: The text of the element
+    '''
+
+    return " ".join("".join(element.itertext()).split())
+
+def publication_date(pub_date) -> str:
+    # Make docstring with rst syntax
+    '''
+    Format a PubDate element like the DP field of the MEDLINE format, for example 2019 May or 2018 Dec 1.\n
+    \n
+    Parameters:\n
+    - pub_date: The PubDate element of the journal issue\n
+    \n
+    Returns:\n
+    - date: The publication date
+    '''
+
+    if pub_date.find("MedlineDate") is not None:
+        return pub_date.findtext("MedlineDate")
+
+    parts = [pub_date.findtext("Year")]
+
+    month = pub_date.findtext("Month")
+    if month:
+        # Most files use abbreviations, some use the month number
+        parts.append(MONTHS[int(month) - 1] if month.isdigit() else month)
+
+    day = pub_date.findtext("Day")
+    if day:
+        parts.append(str(int(day)) if day.isdigit() else day)
+
+    season = pub_date.findtext("Season")
+    if season:
+        parts.append(season)
+
+    return " ".join(part for part in parts if part)
+
+def mesh_heading(heading) -> str:
+    # Make docstring with rst syntax
+    '''
+    Format a MeshHeading element like the MH field of the MEDLINE format, major topics are marked with an asterisk,
+    for example Placenta/*immunology/metabolism.\n
+    \n
+    Parameters:\n
+    - heading: A MeshHeading element\n
+    \n
+    Returns:\n
+    - mesh: The MeSH heading
+    '''
+
+    terms = []
+    for element in [heading.find("DescriptorName")] + heading.findall("QualifierName"):
+        prefix = "*" if element.get("MajorTopicYN") == "Y" else ""
+        terms.append(prefix + element_text(element))
+    return "/".join(terms)
+
+def article_to_dict(article) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Convert a PubmedArticle element to the fields of the main database.\n
+    \n
+    Parameters:\n
+    - article: A PubmedArticle element\n
+    \n
+    Returns:\n
+    - item: A dictionary with the pmid as first key and the fields of the database, like Medline2JSON.record_to_dict
+    '''
+
+    citation = article.find("MedlineCitation")
+    art = citation.find("Article")
+    journal = art.find("Journal")
+
+    # Authors as in the FAU field, collective names and invalid authors are not part of it
+    authors = []
+    for author in art.findall("AuthorList/Author"):
+        if author.get("ValidYN") == "N" or author.find("LastName") is None:
+            continue
+        name = author.findtext("LastName")
+        forename = " ".join(text for text in [author.findtext("ForeName"), author.findtext("Suffix")] if text)
+        authors.append(f"{name}, {forename}" if forename else name)
+
+    mesh = [mesh_heading(heading) for heading in citation.findall("MeshHeadingList/MeshHeading")]
+    substances = [f"{chemical.findtext('RegistryNumber')} ({element_text(chemical.find('NameOfSubstance'))})"
+                  for chemical in citation.findall("ChemicalList/Chemical")]
+    article_types = [element_text(pt) for pt in art.findall("PublicationTypeList/PublicationType")]
+
+    # The first DOI of the article identifiers, with the tag of the AID field
+    doi = ""
+    for article_id in article.findall("PubmedData/ArticleIdList/ArticleId"):
+        if article_id.get("IdType") == "doi" and (article_id.text or "").startswith("10."):
+            doi = f"{article_id.text.strip()} [doi]"
+            break
+
+    # Structured abstracts get their labels in front of every section, like the AB field
+    sections = []
+    for section in art.findall("Abstract/AbstractText"):
+        text = element_text(section)
+        sections.append(f"{section.get('Label')}: {text}" if section.get("Label") else text)
+
+    issn = []
+    if journal.find("ISSN") is not None:
+        issn.append(f"{journal.findtext('ISSN')} ({journal.find('ISSN').get('IssnType')})")
+    if citation.find("MedlineJournalInfo/ISSNLinking") is not None:
+        issn.append(f"{citation.findtext('MedlineJournalInfo/ISSNLinking')} (Linking)")
+
+    title = art.find("ArticleTitle")
+
+    return {
+        "pmid"          : citation.findtext("PMID"),
+        "doi"           : doi,
+        "author"        : " and ".join(authors),
+        "first_author"  : authors[0] if authors else "",
+        "title"         : element_text(title) if title is not None and element_text(title) else None,
+        "year"          : publication_date(journal.find("JournalIssue/PubDate")),
+        "journal"       : journal.findtext("Title"),
+        "volume"        : journal.findtext("JournalIssue/Volume"),
+        "issue"         : journal.findtext("JournalIssue/Issue"),
+        "article_type"  : "; ".join(article_types),
+        "pages"         : art.findtext("Pagination/MedlinePgn") or None,
+        "abstract"      : " ".join(sections) if sections else None,
+        "issn"          : " ".join(issn) if issn else None,
+        "mesh"          : ";".join(mesh),
+        "substances"    : ";".join(substances)
+        }
+
+def iter_pubmed_xml(source):
+    # Make docstring with rst syntax
+    '''
+    Stream over a PubMed XML file and yield the changes it holds, one at a time.\n
+    The baseline files only hold articles, the update files also hold DeleteCitation elements with PMIDs that were removed
+    from PubMed.\n
+    \n
+    Parameters:\n
+    - source: The path to a .xml or .xml.gz file, or a binary file object\n
+    \n
+    Returns:\n
+    - changes: A generator of (action, value) tuples, ("upsert", item) for an article and ("delete", pmid) for a deletion
+    '''
+
+    if isinstance(source, str):
+        handle = gzip.open(source, 'rb') if source.endswith(".gz") else open(source, 'rb')
+    else:
+        handle = source
+
+    try:
+        root = None
+        for event, element in ET.iterparse(handle, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = element
+                continue
+
+            if element.tag == "PubmedArticle":
+                yield "upsert", article_to_dict(element)
+            elif element.tag == "DeleteCitation":
+                for pmid in element.iter("PMID"):
+                    yield "delete", pmid.text
+            elif element.tag != "PubmedBookArticle":
+                continue
+
+            # Free the handled element, the root keeps a reference to every child it has seen
+            root.clear()
+    finally:
+        if handle is not source:
+            handle.close()
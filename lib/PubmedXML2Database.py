@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+
+'''
+This script builds the JSON database from a local mirror of the PubMed baseline and update files
+(https://ftp.ncbi.nlm.nih.gov/pubmed/baseline/ and https://ftp.ncbi.nlm.nih.gov/pubmed/updatefiles/), without any requests
+to the NCBI servers. The records get the same fields as the records of PMID2Database.
+
+The files are parsed in parallel, one file per process, and are applied in the order of their names, so the update files
+have to come after the baseline files (the NCBI file names already sort that way). A record in a later file replaces the record
+with the same PMID from an earlier file, and the PMIDs in the DeleteCitation elements of the update files are removed.
+With -d an existing database is updated with the files instead.
+The script has two required and two optional arguments. ::
+
+    Required:
+
+    -i : The paths to one or more .xml.gz files, or folders with .xml.gz files
+    -j : The path to the output JSON file
+
+    Optional:
+    -d : The path to an existing JSON database that the files are applied to
+    --workers: Number of files that are parsed at once (default: the number of cores)
+
+    Usage:
+
+    python3 PubmedXML2Database.py -i /data/pubmed/baseline/ /data/pubmed/updatefiles/ -j ../YOUR_FOLDER/database.json
+
+    Apply new update files to an existing database:
+
+    python3 PubmedXML2Database.py -i /data/pubmed/updatefiles/pubmed24n1300.xml.gz -d ../YOUR_FOLDER/database.json -j ../YOUR_FOLDER/database_updated.json
+
+'''
+
+# Import the required libraries
+import argparse
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.DatabaseIndex import load_pmids
+from lib.DatabaseStore import read_records
+from lib.Medline2JSON import JSONStreamWriter
+from lib.PubmedXML import iter_pubmed_xml
+
+def list_files(paths: list) -> list:
+    # Make docstring with rst syntax
+    '''
+    Expand the input paths to a list of XML files, sorted by file name so the update files come after the baseline files.\n
+    \n
+    Parameters:\n
+    - paths: A list of paths to .xml(.gz) files or folders with .xml(.gz) files\n
+    \n
+    Returns:\n
+    - files: A list of paths to XML files
+    '''
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(path, name) for name in os.listdir(path) if name.endswith((".xml.gz", ".xml"))]
+        else:
+            files.append(path)
+    return sorted(files, key=os.path.basename)
+
+def parse_file(xml_file: str, output_file: str) -> tuple[list, list, list]:
+    # Make docstring with rst syntax
+    '''
+    Parse one PubMed XML file and write its records to a temporary file with one JSON record per line.\n
+    \n
+    Parameters:\n
+    - xml_file: The path to the .xml(.gz) file\n
+    - output_file: The path to the temporary file\n
+    \n
+    Returns:\n
+    - pmids: The PMIDs of the records in the file\n
+    - deleted: The PMIDs that are deleted by the file\n
+    - superseded: The line numbers of records with a later version of the same PMID in the file
+    '''
+
+    lines, deleted, superseded = {}, [], []
+    with open(output_file, 'w', encoding='utf-8') as file:
+        for action, value in iter_pubmed_xml(xml_file):
+            if action == "upsert":
+                if value['pmid'] in lines:
+                    superseded.append(lines[value['pmid']])
+                lines[value['pmid']] = len(lines) + len(superseded)
+                file.write(json.dumps(value) + "\n")
+            else:
+                deleted.append(value)
+    return list(lines), deleted, superseded
+
+def xml_to_database(xml_files: list, outfile: str, database_file: str | None = None, workers: int | None = None) -> int:
+    # Make docstring with rst syntax
+    '''
+    Convert PubMed XML files to a JSON database, later files are applied as upserts and deletions on earlier files.
+    When a file has several versions of a record, the last one is kept.\n
+    The files are parsed in parallel to temporary files, only the PMIDs are kept in memory.\n
+    \n
+    Parameters:\n
+    - xml_files: A list of paths to PubMed XML files, in the order they are applied\n
+    - outfile: The path to the output JSON file\n
+    - database_file: The path to an existing JSON database that the files are applied to\n
+    - workers: The amount of files that are parsed at once, by default the number of cores\n
+    \n
+    Returns:\n
+    - count: The amount of records in the output database
+    '''
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(outfile))) as temp_dir:
+        temp_files = [os.path.join(temp_dir, f"{i}.jsonl") for i in range(len(xml_files))]
+
+        # The index of the last file with a record of a PMID and of the last file that deletes it, the database is file -1
+        latest, deleted = {}, {}
+        if database_file:
+            latest = dict.fromkeys(load_pmids(database_file), -1)
+
+        # The lines of every file with a record that is replaced by a later record in the same file
+        skipped = []
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(parse_file, xml_files, temp_files)
+            for i, (xml_file, (pmids, deletes, superseded)) in enumerate(zip(xml_files, results)):
+                print(f"Parsed {xml_file}: {len(pmids)} records, {len(deletes)} deletions")
+                latest.update(dict.fromkeys(pmids, i))
+                deleted.update(dict.fromkeys(deletes, i))
+                skipped.append(set(superseded))
+
+        # Deletions are at the end of an update file, so they win from a record in the same file
+        def keep(pmid, i):
+            return latest.get(pmid) == i and deleted.get(pmid, -2) < i
+
+        with JSONStreamWriter(outfile, layout="list") as writer:
+            if database_file:
+                for item in read_records(database_file):
+                    if keep(item['pmid'], -1):
+                        writer.write(item)
+
+            for i, temp_file in enumerate(temp_files):
+                with open(temp_file, 'r', encoding='utf-8') as file:
+                    for n, line in enumerate(file):
+                        # Only the last version of a PMID in a file is kept
+                        if n in skipped[i]:
+                            continue
+                        item = json.loads(line)
+                        if keep(item['pmid'], i):
+                            writer.write(item)
+
+    return writer.count
+
+if __name__ == "__main__":
+
+    # Create a parser object and add arguments
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-i", dest="input_paths", required=True, nargs="+", help="Provide the paths to the PubMed XML files or folders")
+    parser.add_argument("-j", dest="json_file", required=True, help="Provide the path to the Output JSON file")
+    parser.add_argument("-d", dest="database_file", required=False, default=None, help="Provide the path to an existing JSON database to update")
+    parser.add_argument("--workers", dest="workers", required=False, type=int, default=None, help="Number of files that are parsed at once (default: the number of cores)")
+
+    # Read arguments from the command line
+    args = parser.parse_args()
+
+    xml_files = list_files(args.input_paths)
+    print(f"Found {len(xml_files)} XML files")
+
+    count = xml_to_database(xml_files, outfile=args.json_file, database_file=args.database_file, workers=args.workers)
+    print(f"Wrote {count} records to {args.json_file}")
@@ -4,52 +4,382 @@
 
 This script executes a set of queries that are supplied in an Excel file. For each query, a result file is created in the output directory specified by the -o option. The result file is named after the query_id that is specified in the first column of the Excel file.
 
-The script has three required arguments. ::
+PubMed returns at most 10000 PMIDs per search. If the query has more results and more records are requested, the publication date range
+of the query is split in half from the newest end until the date windows hold the requested amount of records and every window holds less
+than 10000 records, using searches that only return the amount of results. The date windows are then searched concurrently under the
+shared NCBI rate limit, so no PMIDs are lost.
+
+With the --state option the script keeps a state file with the date of the last run and the PMIDs that were retrieved for every query
+(keyed by a hash of the query text). Later runs only search the records that entered PubMed since the last run and append the new PMIDs
+to the result file, so a daily refresh only costs a few requests per query.
+
+With the --union option the script also writes union_predict_pmids.txt with the unique PMIDs of all queries and pmid_areas.json
+with the disease areas of every PMID. The union can then be downloaded, embedded and predicted once, and the results are split
+per disease area with Union2Areas.
+
+The script has four required and six optional arguments. ::
 
     Required:
-    
+
     -q : The path to the Excel file with the queries
-    -o : The path to the output directory    
+    -o : The path to the output directory
     -e : The email address for the NCBI API
-    
+    -r : The maximum number of records to retrieve per query
+
+    Optional:
+    --workers: Number of concurrent requests (default 3)
+    --state: Path to the state file for incremental runs
+    --union: Also write the union of all PMIDs and the PMID to disease area table
+    --api-key: NCBI API key, raises the rate limit from 3 to 10 requests per second
+    --cache: Directory for a cache of the NCBI responses, re-runs take repeated requests from the cache
+    --cache-ttl: The amount of hours a cached response is used (default 24)
+
     Usage:
-    
-    ./Query2PMID.py -q ../example/example_query.xlsx -o /tmp/  -e youremail@email.com
-    
+
+    ./Query2PMID.py -q ../example/example_query.xlsx -o /tmp/  -e youremail@email.com -r 50000
+
+    Daily incremental run:
+
+    ./Query2PMID.py -q ../example/example_query.xlsx -o /tmp/  -e youremail@email.com -r 50000 --state /tmp/query_state.json
+
 '''
 
 # Import the required libraries
-from Bio import Entrez
-from Bio import Medline
-
-import sys
 from openpyxl import load_workbook
 import argparse
-import time
-
-from tqdm import tqdm
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 from datetime import datetime
 from datetime import timedelta
 
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
 
-    
-if __name__ == "__main__":
-    
-    # Create a parser object and add arguments
-    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
-    parser.add_argument("-q", dest="query_file", required=True, help="An Excel file with queries")
-    parser.add_argument("-o", dest="output_directory", required=True, help="Provide the path to the Output JSON file")
-    parser.add_argument("-e", dest="entrez_email", required=True, help="Provide the email address for the NCBI API")
-    parser.add_argument("-r", dest="retmax", required=True, help="Provide the maximum number of records to retrieve")
+from lib.ResponseCache import ResponseCache
+from lib.EntrezFetch import EntrezClient
 
-    # Read arguments from the command line
-    args=parser.parse_args()
+# PubMed does not return more than 10000 PMIDs for a single search
+SEARCH_LIMIT = 9999
+
+# The first publication date that is searched
+FIRST_DATE = datetime(1800, 1, 1)
+
+def date_query(query: str, start: datetime, end: datetime, field: str = "PDAT") -> str:
+    # Make docstring with rst syntax
+    '''
+    Restrict a query to a date window, both dates are included.\n
+    \n
+    Parameters:\n
+    - query: The search query\n
+    - start: The first date\n
+    - end: The last date\n
+    - field: The date field, PDAT for the publication date or EDAT for the entry date\n
+    \n
+    Returns:\n
+    - query: The query restricted to the date window
+    '''
+
+    return f"({query}) AND ({start.strftime('%Y/%m/%d')}[{field}] : {end.strftime('%Y/%m/%d')}[{field}])"
+
+def split_date_range(client: EntrezClient, query: str, start: datetime, end: datetime, limit: int = SEARCH_LIMIT,
+                     field: str = "PDAT", retmax: int | None = None, count: int | None = None, workers: int = 3) -> list:
+    # Make docstring with rst syntax
+    '''
+    Split a date range in half until every date window holds at most limit records.\n
+    Only the amount of results is requested for every window, the two halves of a window are counted concurrently.
+    The newest half is split first and the older windows are not counted anymore once they hold retmax records,
+    the windows are returned newest first.\n
+    \n
+    Parameters:\n
+    - client: The EntrezClient to use for the searches\n
+    - query: The search query\n
+    - start: The first publication date\n
+    - end: The last publication date\n
+    - limit: The maximum amount of records in a window\n
+    - field: The date field, PDAT for the publication date or EDAT for the entry date\n
+    - retmax: The amount of newest records the windows have to hold, by default all records\n
+    - count: The amount of records in the date range, if it is already known\n
+    - workers: The amount of searches that are run at once\n
+    \n
+    Returns:\n
+    - windows: A list of (start, end, count) tuples
+    '''
+
+    def count_window(window):
+        return client.esearch(date_query(query, window[0], window[1], field))[0]
+
+    def split(start, end, count, needed):
+        if count == 0:
+            return []
+
+        if count <= limit:
+            return [(start, end, count)]
+
+        if start == end:
+            # A single day can not be split any further
+            print(f"Warning: {count} records on {start.strftime('%Y/%m/%d')}, only the first {limit} are retrieved")
+            return [(start, end, count)]
+
+        # Split the window in two halves that do not overlap
+        middle = start + (end - start) / 2
+        middle = datetime(middle.year, middle.month, middle.day)
+
+        # Both halves are counted, a record with an electronic and a print date can match both
+        halves = [(middle + timedelta(days=1), end), (start, middle)]
+        newer_count, older_count = executor.map(count_window, halves)
+
+        windows = split(*halves[0], newer_count, needed)
+        covered = sum(window[2] for window in windows)
+        if needed is not None and covered >= needed:
+            return windows
+        return windows + split(*halves[1], older_count, None if needed is None else needed - covered)
+
+    if count is None:
+        count = count_window((start, end))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, 2))) as executor:
+        return split(start, end, count, retmax)
+
+def run_query(client: EntrezClient, query: str, retmax: int, workers: int = 3, limit: int = SEARCH_LIMIT) -> list:
+    # Make docstring with rst syntax
+    '''
+    Retrieve the most recent PMIDs for a query, up to retmax PMIDs.\n
+    If the query has more results than a single search can return, the date range is split in windows from the newest end
+    until the windows hold retmax records, and the windows are searched concurrently.\n
+    \n
+    Parameters:\n
+    - client: The EntrezClient to use for the searches\n
+    - query: The search query\n
+    - retmax: The maximum amount of PMIDs to retrieve\n
+    - workers: The amount of searches that are run at once\n
+    - limit: The maximum amount of records in a single search\n
+    \n
+    Returns:\n
+    - pmids: A list of unique PMIDs
+    '''
+
+    count, pmids = client.esearch(query, retmax=min(retmax, limit))
+    if retmax <= limit or count <= limit:
+        return pmids
+
+    # Include publications with a date in the near future (ahead of print)
+    end = datetime(datetime.now().year + 1, 12, 31)
+    windows = split_date_range(client, query, FIRST_DATE, end, limit=limit, retmax=retmax, count=count, workers=workers)
+
+    # Only keep the newest windows that are needed to reach retmax
+    selected = []
+    total = 0
+    for window in windows:
+        if total >= retmax:
+            break
+        selected.append(window)
+        total += window[2]
+
+    all_pmids = search_windows(client, query, selected, workers=workers, limit=limit)
+    return all_pmids[:retmax]
+
+def search_windows(client: EntrezClient, query: str, windows: list, workers: int = 3, limit: int = SEARCH_LIMIT,
+                   field: str = "PDAT") -> list:
+    # Make docstring with rst syntax
+    '''
+    Search a list of date windows concurrently and return the unique PMIDs in the order of the windows.\n
+    \n
+    Parameters:\n
+    - client: The EntrezClient to use for the searches\n
+    - query: The search query\n
+    - windows: A list of (start, end, count) tuples as returned by split_date_range\n
+    - workers: The amount of searches that are run at once\n
+    - limit: The maximum amount of records in a single search\n
+    - field: The date field of the windows, PDAT or EDAT\n
+    \n
+    Returns:\n
+    - pmids: A list of unique PMIDs
+    '''
+
+    print(f"Searching {len(windows)} date windows with {sum(window[2] for window in windows)} records")
+
+    def search_window(window):
+        start, end, count = window
+        _, pmids = client.esearch(date_query(query, start, end, field), retmax=min(count, limit))
+        print(f"Retrieved {len(pmids)} records from {start.strftime('%Y/%m/%d')} to {end.strftime('%Y/%m/%d')}")
+        return pmids
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(search_window, windows))
+
+    # Remove duplicates, but keep the order of the windows
+    return list(dict.fromkeys(pmid for pmids in results for pmid in pmids))
+
+def query_key(query: str) -> str:
+    # Make docstring with rst syntax
+    '''
+    Make the key of a query in the state file, a hash of the query text.\n
+    \n
+    Parameters:\n
+    - query: The search query\n
+    \n
+    Returns:\n
+    - key: The SHA-1 hash of the query
+    '''
+
+    return hashlib.sha1(query.encode("utf-8")).hexdigest()
+
+def load_state(state_file: str) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Load the state file with the date and the PMIDs that were already retrieved for every query.\n
+    The state file is structured as:\n
+    \n
+    .. code-block:: json
+
+        {
+            "QUERYHASH1": {
+                "area": "AREA1",
+                "query": "QUERY1",
+                "last_date": "2025/03/01",
+                "pmids": ["PMID1", "PMID2"]
+            }
+        }
+    \n
+    Parameters:\n
+    - state_file: The path to the state file\n
+    \n
+    Returns:\n
+    - state: A dictionary with the query hashes as keys, empty if the state file does not exist
+    '''
+
+    if not os.path.exists(state_file):
+        return {}
+
+    with open(state_file, 'r') as file:
+        return json.load(file)
+
+def save_state(state: dict, state_file: str) -> None:
+    # Make docstring with rst syntax
+    '''
+    Save the state file, the old state file is only replaced after the new one is written completely.\n
+    \n
+    Parameters:\n
+    - state: A dictionary with the query hashes as keys\n
+    - state_file: The path to the state file\n
+    '''
+
+    with open(state_file + ".tmp", 'w') as file:
+        json.dump(state, file, indent=4)
+    os.replace(state_file + ".tmp", state_file)
+
+def update_query(client: EntrezClient, area: str, query: str, output_file: str, state: dict, retmax: int,
+                 workers: int = 3, limit: int = SEARCH_LIMIT, overlap: int = 2) -> list:
+    # Make docstring with rst syntax
+    '''
+    Run a query incrementally. The first run retrieves up to retmax PMIDs and writes the output file,
+    later runs only search the records that entered PubMed since the last run and append the new PMIDs.\n
+    \n
+    Parameters:\n
+    - client: The EntrezClient to use for the searches\n
+    - area: The disease area of the query\n
+    - query: The search query\n
+    - output_file: The path to the PMID file of the query\n
+    - state: The state dictionary as returned by load_state, it is updated in place\n
+    - retmax: The maximum amount of PMIDs to retrieve in the first run\n
+    - workers: The amount of searches that are run at once\n
+    - limit: The maximum amount of records in a single search\n
+    - overlap: The amount of days before the last run that are searched again, for records that were indexed late\n
+    \n
+    Returns:\n
+    - new_pmids: The PMIDs that were added to the output file
+    '''
+
+    key = query_key(query)
+    today = datetime(*datetime.now().timetuple()[:3])
+
+    if key in state and os.path.exists(output_file):
+        # Only search the records that entered PubMed since the last run
+        start = datetime.strptime(state[key]["last_date"], "%Y/%m/%d") - timedelta(days=overlap)
+        end = datetime(today.year + 1, 12, 31)
+        windows = split_date_range(client, query, start, end, limit=limit, field="EDAT", workers=workers)
+        pmids = search_windows(client, query, windows, workers=workers, limit=limit, field="EDAT")
+
+        seen = set(state[key]["pmids"])
+        new_pmids = [pmid for pmid in pmids if pmid not in seen]
+
+        # Append the new PMIDs to the output file
+        if new_pmids:
+            with open(output_file, "a") as OUT:
+                if os.path.getsize(output_file) > 0:
+                    OUT.write("\n")
+                OUT.write("\n".join(new_pmids))
+        pmids = state[key]["pmids"] + new_pmids
+    else:
+        pmids = run_query(client, query, retmax=retmax, workers=workers, limit=limit)
+        new_pmids = pmids
+
+        with open(output_file, "w") as OUT:
+            OUT.write("\n".join(str(x) for x in pmids))
+
+    state[key] = {"area": area, "query": query, "last_date": today.strftime("%Y/%m/%d"), "pmids": pmids}
+    return new_pmids
+
+def write_union(area_files: dict, union_file: str, membership_file: str) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Combine the PMID files of all disease areas into one PMID file without duplicates, and save for every PMID
+    the disease areas it was found for. The downstream scripts then only have to process the union once,
+    the results can be split per disease area again with Union2Areas.\n
+    The membership file is structured as:\n
+    \n
+    .. code-block:: json
+
+        {
+            "PMID1": ["AREA1", "AREA2"],
+            "PMID2": ["AREA1"]
+        }
+    \n
+    Parameters:\n
+    - area_files: A dictionary with the disease areas as keys and the paths to their PMID files as values\n
+    - union_file: The path to the output PMID file with the union of all PMIDs\n
+    - membership_file: The path to the output JSON file with the disease areas of every PMID\n
+    \n
+    Returns:\n
+    - membership: A dictionary with the PMIDs as keys and lists of disease areas as values
+    '''
+
+    membership = {}
+    for area, area_file in area_files.items():
+        with open(area_file) as file:
+            for pmid in file.read().splitlines():
+                if pmid:
+                    membership.setdefault(pmid, [])
+                    if area not in membership[pmid]:
+                        membership[pmid].append(area)
+
+    with open(union_file, "w") as OUT:
+        OUT.write("\n".join(membership.keys()))
+
+    with open(membership_file, "w") as file:
+        json.dump(membership, file, indent=4)
+
+    return membership
+
+def read_queries(query_file: str) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Read the queries from the Excel file, the first column holds the disease area and the second column the query.\n
+    \n
+    Parameters:\n
+    - query_file: The path to the Excel file\n
+    \n
+    Returns:\n
+    - queries: A dictionary with the disease areas as keys and the queries as values
+    '''
 
     # Load the Excel file
-    workbook = load_workbook(args.query_file)
+    workbook = load_workbook(query_file)
 
-   
     # Select the active sheet or specify a sheet by name
     sheet = workbook.active
 
@@ -60,67 +390,63 @@ if __name__ == "__main__":
         # Add the query to the dictionary with row[0] as the key (disease area)
         queries[row[0]] = full_query
 
+    return queries
+
+if __name__ == "__main__":
+
+    # Create a parser object and add arguments
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-q", dest="query_file", required=True, help="An Excel file with queries")
+    parser.add_argument("-o", dest="output_directory", required=True, help="Provide the path to the Output JSON file")
+    parser.add_argument("-e", dest="entrez_email", required=True, help="Provide the email address for the NCBI API")
+    parser.add_argument("-r", dest="retmax", required=True, help="Provide the maximum number of records to retrieve")
+    parser.add_argument("--workers", dest="workers", required=False, type=int, default=3, help="Number of concurrent requests (default 3)")
+    parser.add_argument("--state", dest="state_file", required=False, default=None, help="Provide the path to a state file to only retrieve new PMIDs in later runs")
+    parser.add_argument("--union", dest="union", required=False, default=False, action="store_true", help="Also write the union of all PMIDs and a PMID to disease area table")
+    parser.add_argument("--api-key", dest="api_key", required=False, default=None, help="Provide the NCBI API key to raise the rate limit to 10 requests per second")
+    parser.add_argument("--cache", dest="cache_dir", required=False, default=None, help="Provide a directory to cache the NCBI responses in")
+    parser.add_argument("--cache-ttl", dest="cache_ttl", required=False, type=float, default=24, help="The amount of hours a cached response is used (default 24)")
+
+    # Read arguments from the command line
+    args=parser.parse_args()
+
+    queries = read_queries(args.query_file)
+
+    # All queries share the same client, and with that the same rate limit
+    cache = ResponseCache(args.cache_dir, ttl=args.cache_ttl * 3600) if args.cache_dir else None
+    client = EntrezClient(entrez_email=args.entrez_email, api_key=args.api_key, cache=cache)
 
-       
-    Entrez.email = args.entrez_email
+    # Load the state of the previous runs, if requested
+    if args.state_file:
+        state = load_state(args.state_file)
 
+    area_files = {}
     for q in queries.keys():
         print("Running query " + queries[q])
-        OUT = open(args.output_directory+"/"+q+"_predict_pmids.txt","w")
         
-        retmax = int(args.retmax)
-        
-        # If retmax is larger than 10000, we need to split the query with retstart increments of 10000
-        if retmax > 10000:
-            print("Retmax is larger than 10000")
-            
-            # Get today as the end date
-            end_date = datetime.now().strftime("%Y/%m/%d")
-            
-            # By default, start date is 7 days before the end date
-            start_date = (datetime.strptime(end_date, "%Y/%m/%d") - timedelta(days=7)).strftime("%Y/%m/%d")
-            all_pmids = []
+        output_file = args.output_directory+"/"+q+"_predict_pmids.txt"
+
+        if args.state_file:
+            new_pmids = update_query(client, q, queries[q], output_file, state, retmax=int(args.retmax), workers=args.workers)
+            print("Number of new PMIDs found: " + str(len(new_pmids)))
             
-            while len(list(set(all_pmids))) < retmax:                
-                query = f"{queries[q]} AND ({start_date}[PDAT] : {end_date}[PDAT])"
-                handle = Entrez.esearch(
-                    db="pubmed",
-                    term=query,
-                    retmax=10000,
-                    usehistory="y"
-                )
-                record = Entrez.read(handle)
-                handle.close()
-                pmids = record["IdList"]
-                
-                
-                
-                if len(pmids) == 9999:
-                    print(f"Retrieved {len(pmids)} records from {start_date} to {end_date}")
-                    print("Splitting date range in half")
-                    start_date = (datetime.strptime(end_date, "%Y/%m/%d") - timedelta(days=2)).strftime("%Y/%m/%d")
-                else:
-                    print(f"Retrieved {len(pmids)} records from {start_date} to {end_date}")
-                    all_pmids.extend(pmids)
-                    # Create new start and end dates 1 week before the previous start date and end date
-                    end_date = start_date
-                    start_date = (datetime.strptime(end_date, "%Y/%m/%d") - timedelta(days=7)).strftime("%Y/%m/%d")
-                time.sleep(2)
-                
-            all_pmids = list(set(all_pmids)) 
-            OUT.write("\n".join(str(x) for x in all_pmids))         
-            time.sleep(2)
-        
+            # Save the state after every query, so an interrupted run keeps the finished queries
+            save_state(state, args.state_file)
         else:
-            handle = Entrez.esearch(db="pubmed", retmax=args.retmax, term=queries[q])
-            record = Entrez.read(handle)
-            handle.close()
-            OUT.write("\n".join(str(x) for x in (record['IdList'])))
-            OUT.close()
-            time.sleep(2)
-            
-        # Check how many results are in the output file
-        with open(args.output_directory+"/"+q+"_predict_pmids.txt") as f:
-            lines = f.readlines()
-            print("Number of PMIDs found: " + str(len(lines)))
-        
+            pmids = run_query(client, queries[q], retmax=int(args.retmax), workers=args.workers)
+
+            with open(output_file,"w") as OUT:
+                OUT.write("\n".join(str(x) for x in pmids))
+
+            print("Number of PMIDs found: " + str(len(pmids)))
+
+        area_files[q] = output_file
+
+    # Combine the PMIDs of all disease areas, so every PMID is only downloaded and processed once
+    if args.union:
+        membership = write_union(
+            area_files, 
+            union_file=args.output_directory+"/union_predict_pmids.txt", 
+            membership_file=args.output_directory+"/pmid_areas.json"
+            )
+        print("Number of unique PMIDs over all queries: " + str(len(membership)))
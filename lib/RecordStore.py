@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+
+'''
+This module contains a SQLite store for the database, an alternative to the JSON database for databases that are updated often.
+It is used through DatabaseStore.read_records and the Database2SQLite script, and is not meant to be run on its own.
+
+The store has one row per PMID, the PMID is the primary key so a record is found with an index lookup instead of a scan of the
+whole database. The fields of medline_to_json and of the OpenAlex enrichment (PMID2Openalex) have their own typed column. Other
+fields, like the tagging scores, and values that do not fit the type of their column, like the DOI lists of merged records, are
+kept in a JSON column named extra. The keys of every record are kept in the JSON column fields, in their order, so a record is
+read back with exactly the keys it was written with: a field that was null is null again, a field it never had is left out.
+
+Updates are written with INSERT ... ON CONFLICT (an upsert): new PMIDs are added, for existing PMIDs only the fields in the update
+are changed and the other fields keep their value. An update from NewPMID or PMID2Openalex only touches the rows of its PMIDs. ::
+
+    with RecordStore("database.sqlite") as store:
+        store.upsert(items)
+        record = store.get("30849355")
+'''
+
+# Import the required libraries
+import json
+import sqlite3
+
+# The typed columns, in the order of medline_to_json, followed by the OpenAlex fields
+COLUMNS = {
+    "pmid": "TEXT",
+    "doi": "TEXT",
+    "author": "TEXT",
+    "first_author": "TEXT",
+    "title": "TEXT",
+    "year": "TEXT",
+    "journal": "TEXT",
+    "volume": "TEXT",
+    "issue": "TEXT",
+    "article_type": "TEXT",
+    "pages": "TEXT",
+    "abstract": "TEXT",
+    "issn": "TEXT",
+    "mesh": "TEXT",
+    "substances": "TEXT",
+    "retrieved": "TEXT",
+    "openalex_id": "TEXT",
+    "pmcid": "TEXT",
+    "cited_by_count": "INTEGER",
+    "pdf_url": "TEXT",
+    "is_oa": "BOOLEAN",
+    "is_oa_anywhere": "BOOLEAN"
+    }
+
+# The Python types that are stored in a column of each type, other values go to the extra column
+COLUMN_TYPES = {"TEXT": (str,), "INTEGER": (int,), "BOOLEAN": (bool,)}
+
+def fits_column(name: str, value) -> bool:
+    # bool is a subclass of int, so the type is compared exactly
+    return value is None or type(value) in COLUMN_TYPES[COLUMNS[name]]
+
+def json_path(key: str) -> str:
+    return '$."' + key.replace('"', '\\"') + '"'
+
+class RecordStore:
+    # Make docstring with rst syntax
+    '''
+    SQLite store of database records with the PMID as primary key.\n
+    \n
+    Parameters:\n
+    - path: The path to the SQLite file, it is created when it does not exist\n
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+
+        columns = ", ".join(f"{name} {column_type}" for name, column_type in COLUMNS.items() if name != "pmid")
+        self.connection.execute(f"CREATE TABLE IF NOT EXISTS records (pmid TEXT PRIMARY KEY NOT NULL, {columns}, extra TEXT, fields TEXT)")
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def __contains__(self, pmid: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM records WHERE pmid = ?", (pmid,)).fetchone() is not None
+
+    def upsert(self, items) -> int:
+        # Make docstring with rst syntax
+        '''
+        Insert new records and update existing records in a single transaction.\n
+        Only the fields of an item are changed, the other fields of an existing record keep their value.\n
+        \n
+        Parameters:\n
+        - items: An iterable of dictionaries with a pmid key\n
+        \n
+        Returns:\n
+        - count: The number of items that were written
+        '''
+
+        count = 0
+        with self.connection:
+            for item in items:
+                columns, extra = {}, {}
+                for key, value in item.items():
+                    if key == "pmid":
+                        continue
+                    if key in COLUMNS and fits_column(key, value):
+                        columns[key] = value
+                    else:
+                        # The typed column of a value that does not fit is emptied, the value is kept in extra
+                        if key in COLUMNS:
+                            columns[key] = None
+                        extra[key] = value
+
+                # A field is either in its typed column or in extra, never in both
+                removed = [key for key, value in columns.items() if key not in extra]
+                update = [f"{name} = excluded.{name}" for name in columns]
+                paths = []
+                if removed or extra:
+                    # The paths are bound as parameters, so the field names never become part of the SQL text
+                    merged = "COALESCE(records.extra, '{}')"
+                    if removed:
+                        merged = f"json_remove({merged}, " + ", ".join("?" for key in removed) + ")"
+                        paths += [json_path(key) for key in removed]
+                    if extra:
+                        merged = f"json_set({merged}, " + ", ".join("?, excluded.extra -> ?" for key in extra) + ")"
+                        paths += [path for key in extra for path in (json_path(key), json_path(key))]
+                    update.append(f"extra = {merged}")
+
+                # New keys are added after the keys the record already has
+                update.append("fields = json_patch(records.fields, excluded.fields)")
+
+                names = ["pmid"] + list(columns) + ["extra", "fields"]
+                sql = (f"INSERT INTO records ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+                       f"ON CONFLICT(pmid) DO UPDATE SET {', '.join(update)}")
+                self.connection.execute(sql, [item["pmid"]] + list(columns.values()) + [json.dumps(extra) if extra else None,
+                                                                                        json.dumps(dict.fromkeys(item, True))] + paths)
+                count += 1
+        return count
+
+    def row_to_record(self, names: list, row: tuple) -> dict:
+        record = {}
+        extra, fields = None, None
+        for name, value in zip(names, row):
+            if name == "extra":
+                extra = value
+            elif name == "fields":
+                fields = value
+            elif COLUMNS[name] == "BOOLEAN" and value is not None:
+                record[name] = bool(value)
+            else:
+                record[name] = value
+        if extra:
+            record.update(json.loads(extra))
+        if fields:
+            # The keys the record was written with, in their order
+            record = {key: record.get(key) for key in json.loads(fields)}
+        return record
+
+    def get(self, pmid: str) -> dict | None:
+        # Make docstring with rst syntax
+        '''
+        Get a single record with an index lookup.\n
+        \n
+        Parameters:\n
+        - pmid: The PMID of the record\n
+        \n
+        Returns:\n
+        - record: The record as a dictionary with the keys it was written with, or None if the PMID is not in the store
+        '''
+
+        names = list(COLUMNS) + ["extra", "fields"]
+        row = self.connection.execute(f"SELECT {', '.join(names)} FROM records WHERE pmid = ?", (pmid,)).fetchone()
+        if row is None:
+            return None
+        return self.row_to_record(names, row)
+
+    def records(self, columns: list | None = None, pmids=None, batch_size: int = 10000):
+        # Make docstring with rst syntax
+        '''
+        Stream over the records in the order they were first inserted.\n
+        Requested fields that a record does not have are None, without columns a record has the keys it was written with.\n
+        \n
+        Parameters:\n
+        - columns: A list with the fields that are needed, by default all fields\n
+        - pmids: A collection of PMIDs, only these records are returned, by default all records\n
+        - batch_size: The number of rows that are fetched at once\n
+        \n
+        Returns:\n
+        - records: An iterator over the records as dictionaries
+        '''
+
+        if columns is None:
+            names = list(COLUMNS) + ["extra", "fields"]
+        else:
+            names = ["pmid"] + [column for column in columns if column in COLUMNS and column != "pmid"]
+            if any(column not in COLUMNS for column in columns):
+                names.append("extra")
+
+        # A separate connection, so the store can be updated while the records are read
+        connection = sqlite3.connect(self.path)
+        try:
+            query = f"SELECT {', '.join('records.' + name for name in names)} FROM records"
+            if pmids is not None:
+                # The PMIDs are joined through a temporary table, which uses the primary key of records
+                connection.execute("CREATE TEMP TABLE selected (pmid TEXT PRIMARY KEY)")
+                connection.executemany("INSERT OR IGNORE INTO selected VALUES (?)", ((pmid,) for pmid in pmids))
+                query += " JOIN selected ON selected.pmid = records.pmid"
+            cursor = connection.execute(query + " ORDER BY records.rowid")
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    record = self.row_to_record(names, row)
+                    if columns is not None:
+                        record = {column: record.get(column) for column in ["pmid"] + [column for column in columns if column != "pmid"]}
+                    yield record
+        finally:
+            connection.close()
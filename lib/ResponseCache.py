@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+'''
+This module contains an on-disk cache for the responses of web services (the NCBI E-utilities and OpenAlex).
+It is used by EntrezClient, so re-runs of the retrieval scripts after a crash or a config change do not send the same
+requests again. Cached responses are returned without waiting for the rate limiter.
+
+Every response is stored in its own file, named after the SHA-256 hash of the endpoint and the normalized parameters of the
+request. Parameters that do not change the response (the email address, the tool name and the API key) are not part of the key.
+Responses older than the time to live are ignored and removed. When the cache grows above its maximum size the least recently
+used responses are removed first. ::
+
+    cache_dir/
+        3f/3fa8...e1
+        a0/a04c...7b
+'''
+
+# Import the required libraries
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Parameters that identify the user, not the response
+IGNORED_PARAMS = ("email", "tool", "api_key", "mailto")
+
+class ResponseCache:
+    # Make docstring with rst syntax
+    '''
+    Content-addressed on-disk cache of HTTP responses with a time to live and least recently used eviction.\n
+    The cache can be shared by several threads.\n
+    \n
+    Parameters:\n
+    - directory: The directory that holds the cached responses, it is created when it does not exist\n
+    - ttl: The time to live of a response in seconds, None to keep responses until they are evicted\n
+    - max_size: The maximum size of the cache in bytes\n
+    '''
+
+    def __init__(self, directory: str, ttl: float | None = 86400, max_size: int = 1024**3) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(os.path.getsize(path) for path in self.files())
+
+    def files(self) -> list:
+        # Make docstring with rst syntax
+        '''
+        List the files of the cached responses.\n
+        \n
+        Returns:\n
+        - paths: A list of paths
+        '''
+
+        paths = []
+        for root, _, names in os.walk(self.directory):
+            paths += [os.path.join(root, name) for name in names if not name.startswith(".")]
+        return paths
+
+    def key(self, endpoint: str, params: dict) -> str:
+        # Make docstring with rst syntax
+        '''
+        Make the key of a request, the order of the parameters and the type of their values do not matter.\n
+        \n
+        Parameters:\n
+        - endpoint: The URL or name of the service, for example efetch.fcgi\n
+        - params: A dictionary with the parameters of the request\n
+        \n
+        Returns:\n
+        - key: The SHA-256 hash of the request
+        '''
+
+        normalized = {str(name): str(value) for name, value in params.items() if name not in IGNORED_PARAMS}
+        text = json.dumps([endpoint, normalized], sort_keys=True)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> bytes | None:
+        # Make docstring with rst syntax
+        '''
+        Get a cached response, expired responses are removed.\n
+        \n
+        Parameters:\n
+        - key: The key of the request\n
+        \n
+        Returns:\n
+        - data: The cached response, or None if the response is not in the cache
+        '''
+
+        path = self.path(key)
+        try:
+            stat = os.stat(path)
+            if self.ttl is not None and time.time() - stat.st_mtime > self.ttl:
+                self.remove(path)
+                return None
+
+            with open(path, 'rb') as handle:
+                data = handle.read()
+
+            # The access time marks the last use, the modification time keeps the time the response was stored
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            return None
+
+        return data
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            age = time.time() - os.path.getmtime(self.path(key))
+        except FileNotFoundError:
+            return False
+        return self.ttl is None or age <= self.ttl
+
+    def put(self, key: str, data: bytes) -> None:
+        # Make docstring with rst syntax
+        '''
+        Store a response, the least recently used responses are removed when the cache is full.\n
+        \n
+        Parameters:\n
+        - key: The key of the request\n
+        - data: The response\n
+        '''
+
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first, so other threads and processes never read a partial response
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".")
+        with os.fdopen(handle, 'wb') as file:
+            file.write(data)
+
+        with self.lock:
+            if os.path.exists(path):
+                self.size -= os.path.getsize(path)
+            os.replace(temp_path, path)
+            self.size += len(data)
+
+            if self.size > self.max_size:
+                self.evict()
+
+    def remove(self, path: str) -> None:
+        with self.lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                return
+            self.size -= size
+
+    def evict(self) -> None:
+        # Make docstring with rst syntax
+        '''
+        Remove the least recently used responses until the cache is below 90% of its maximum size.\n
+        Must be called with the lock held.\n
+        '''
+
+        entries = []
+        for path in self.files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self.size <= 0.9 * self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
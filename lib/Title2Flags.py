@@ -2,13 +2,16 @@
 
 '''
 This script is used to flag the title of the records with a set of negative keywords (if at least one keyword is found in the title, the pmid is flagged)
-The script has three required arguments. ::
+The script has three required arguments and one optional argument. ::
 
     Required:
     
-    -j : The path to the json database
+    -j : The path to the database, in any format read by DatabaseStore.read_records
     -k : The path to keyword file
-    -o : The path to the output file
+    -o : The path to the output file, compressed when it ends in .gz or .zst
+
+    Optional:
+    --shard: Process only shard i of N of the database, for example 0/8 (see DatabaseShards)
     
     
     Usage:
@@ -19,11 +22,18 @@ The script has three required arguments. ::
 '''
 
 # Import the required libraries
-import ijson
 import argparse
 import re
 import json
 from tqdm import tqdm
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.Compression import open_file
+from lib.DatabaseStore import parse_shard, read_records
 
 def read_keyword_file(file_path: str) -> list:
     # Make docstring with rst syntax
@@ -91,9 +101,10 @@ def process_text(text: str, keyword_list: list) -> dict:
 if __name__ == "__main__":
     # Create a parser object and add arguments
     parser=argparse.ArgumentParser()
-    parser.add_argument("-j", dest = "json_file",    required = True,  help = "Provide the path to the datafolder")
+    parser.add_argument("-j", dest = "json_file",    required = True,  help = "Provide the path to the database, in any format read by DatabaseStore.read_records")
     parser.add_argument("-o", dest = "output_file",  required = True,  help = "Provide the name of the output file")
     parser.add_argument("-k", dest = "keyword_file", required = True,  help = "Provide the name of the keyword_file")
+    parser.add_argument("--shard", dest = "shard", required = False, type = parse_shard, default = None, help = "Process only shard i of N of the database, for example 0/8 (see DatabaseShards)")
 
     args=parser.parse_args()
 
@@ -101,17 +112,14 @@ if __name__ == "__main__":
 
     print("Starting to process the data...")
 
-    with open(args.json_file, 'rb') as file:
-        # Parse the JSON objects one by one
-        parser = ijson.items(file, 'item')
-        result = {}
-        # Iterate over the JSON objects
-        for item in tqdm(parser):
-        # Process each JSON object as needed
-            result[item['pmid']] = {"title_flag":process_text(text = item['title'], keyword_list = keyword_list)}
+    result = {}
+    # Stream over the database, only the fields that are needed are read
+    for item in tqdm(read_records(args.json_file, columns=['pmid', 'title'], shard=args.shard)):
+        # Process each record as needed
+        result[item['pmid']] = {"title_flag":process_text(text = item['title'], keyword_list = keyword_list)}
            
     print("Data processing completed...")
            
     # Write the updated data back to a JSON file  
-    with open(args.output_file, 'w') as file:
+    with open_file(args.output_file, 'wt') as file:
         json.dump(result, file, indent=4)        
\ No newline at end of file
@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+
+'''
+This script downloads the open access PDFs of a database. It reads the tab-delimited PMID to PDF URL file of Database2PDF,
+or the database itself, and saves every PDF as <PMID>.pdf in the output folder.
+
+The PDFs are downloaded by a pool of worker threads, with a limit on the amount of connections to a single host so
+publishers are not overloaded. A PDF is first written to <PMID>.pdf.part and renamed when it is complete. An interrupted
+download continues where it stopped with an HTTP range request, if the server supports it. When the server can not continue
+it (the range is not satisfiable or starts somewhere else), the partial file is removed and the PDF is downloaded from the start.
+
+The result of every download is written to download_manifest.tsv in the output folder as soon as it is known, so the script
+can be stopped at any moment. PDFs that are already present with the checksum in the manifest are not downloaded again. ::
+
+    PMID	URL	status	size	sha256	error
+    30849355	https://...	ok	1045233	4f6a...
+    30815354	https://...	failed			HTTP 404
+
+The script has two required arguments (and one of -t and -j) and three optional arguments. ::
+
+    Required:
+
+    -t : The path to the tab-delimited file with PMIDs and PDF URLs (made by Database2PDF)
+    -j : The path to the JSON database file, instead of -t
+    -o : The path to the output folder for the PDF files
+
+    Optional:
+    --workers: Number of PDFs that are downloaded at once (default 8)
+    --per-host: Number of PDFs that are downloaded at once from the same host (default 2)
+    --retry-failed: Also try the PDFs that failed in an earlier run
+
+    Usage:
+
+    python3 URL2PDF.py -t pmid_pdfs.txt -o pdfs/
+
+'''
+
+# Import the required libraries
+import requests
+import argparse
+import hashlib
+import os
+import re
+import sys
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.Database2PDF import oa_pdf_urls
+
+# The name of the file with the results of the downloads
+MANIFEST = "download_manifest.tsv"
+
+# The columns of the manifest
+COLUMNS = ["pmid", "url", "status", "size", "sha256", "error"]
+
+# The start of the range of a partial response
+CONTENT_RANGE = re.compile(r"bytes (\d+)-")
+
+# Some publishers refuse requests without a browser user agent
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; jrcnam PDF downloader)"}
+
+def read_urls(url_file: str) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Read a tab-delimited file with PMIDs and PDF URLs.\n
+    \n
+    Parameters:\n
+    - url_file: The path to the tab-delimited file\n
+    \n
+    Returns:\n
+    - urls: A dictionary with the PMIDs as keys and the PDF URLs as values
+    '''
+
+    urls = {}
+    with open(url_file, 'r') as file:
+        for line in file:
+            if line.strip():
+                pmid, url = line.rstrip("\n").split("\t")[:2]
+                urls[pmid] = url
+    return urls
+
+def load_manifest(output_folder: str) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Load the results of earlier downloads, later lines replace earlier lines of the same PMID.\n
+    \n
+    Parameters:\n
+    - output_folder: The output folder with PDF files\n
+    \n
+    Returns:\n
+    - manifest: A dictionary with the PMIDs as keys and dictionaries with the columns of the manifest as values
+    '''
+
+    manifest = {}
+    path = os.path.join(output_folder, MANIFEST)
+    if os.path.exists(path):
+        with open(path, 'r') as handle:
+            for line in handle:
+                if line.startswith("PMID\t") or not line.strip():
+                    continue
+                entry = dict(zip(COLUMNS, line.rstrip("\n").split("\t")))
+                manifest[entry["pmid"]] = entry
+    return manifest
+
+def write_manifest(output_folder: str, manifest: dict) -> None:
+    # Make docstring with rst syntax
+    '''
+    Write the complete manifest, the lines that were appended during the run are merged.\n
+    \n
+    Parameters:\n
+    - output_folder: The output folder with PDF files\n
+    - manifest: The manifest as returned by load_manifest\n
+    '''
+
+    path = os.path.join(output_folder, MANIFEST)
+    with open(path + ".tmp", 'w') as handle:
+        handle.write("PMID\tURL\tstatus\tsize\tsha256\terror\n")
+        for entry in manifest.values():
+            handle.write("\t".join(str(entry.get(column, "")) for column in COLUMNS) + "\n")
+    os.replace(path + ".tmp", path)
+
+def file_hash(path: str) -> str:
+    # Make docstring with rst syntax
+    '''
+    Calculate the SHA-256 hash of a file without reading it into memory at once.\n
+    \n
+    Parameters:\n
+    - path: The path to the file\n
+    \n
+    Returns:\n
+    - hash: The hexadecimal hash
+    '''
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+class HostLimiter:
+    # Make docstring with rst syntax
+    '''
+    Limit the amount of downloads that run at once per host.\n
+    \n
+    Parameters:\n
+    - per_host: The maximum amount of downloads from a single host\n
+    '''
+
+    def __init__(self, per_host: int) -> None:
+        self.per_host = per_host
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, url: str) -> threading.BoundedSemaphore:
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self.semaphores[host]
+
+def range_start(response) -> int | None:
+    # The first byte of a partial response, from a Content-Range like bytes 20000-50008/50009
+    match = CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
+def download_pdf(session, pmid: str, url: str, output_folder: str, limiter: HostLimiter, timeout: float = 60) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Download a single PDF, a partial download of an earlier run is resumed with a range request.\n
+    \n
+    Parameters:\n
+    - session: The requests session\n
+    - pmid: The PMID of the PDF\n
+    - url: The URL of the PDF\n
+    - output_folder: The output folder for the PDF files\n
+    - limiter: The HostLimiter that limits the connections per host\n
+    - timeout: The timeout of the connection in seconds\n
+    \n
+    Returns:\n
+    - entry: A dictionary with the columns of the manifest
+    '''
+
+    pdf_file = os.path.join(output_folder, f"{pmid}.pdf")
+    part_file = pdf_file + ".part"
+    entry = {"pmid": pmid, "url": url, "status": "failed", "size": "", "sha256": "", "error": ""}
+
+    try:
+        with limiter(url):
+            # A partial file that the server can not continue is downloaded again from the start, once
+            for attempt in range(2):
+                offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+                headers = dict(HEADERS)
+                if offset:
+                    headers["Range"] = f"bytes={offset}-"
+
+                with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                    # A 416 or a range that does not start at the end of the partial file means the file on the server
+                    # changed or the partial file is corrupt
+                    if offset and (response.status_code == 416 or
+                                   (response.status_code == 206 and range_start(response) != offset)):
+                        os.remove(part_file)
+                        continue
+                    if response.status_code == 206 and range_start(response) != offset:
+                        entry["error"] = f"Invalid Content-Range {response.headers.get('Content-Range')}"
+                        return entry
+                    if response.status_code not in (200, 206):
+                        entry["error"] = f"HTTP {response.status_code}"
+                        return entry
+
+                    # Servers that ignore the range send the whole file again
+                    mode = 'ab' if response.status_code == 206 else 'wb'
+                    with open(part_file, mode) as handle:
+                        for block in response.iter_content(chunk_size=64 * 1024):
+                            handle.write(block)
+                    break
+    except (requests.RequestException, OSError) as e:
+        entry["error"] = str(e).replace("\t", " ").replace("\n", " ")
+        return entry
+
+    # Landing pages and paywalls are often served instead of the PDF
+    with open(part_file, 'rb') as handle:
+        if not handle.read(1024).lstrip().startswith(b"%PDF"):
+            os.remove(part_file)
+            entry["error"] = "Not a PDF"
+            return entry
+
+    os.replace(part_file, pdf_file)
+    entry.update({"status": "ok", "size": os.path.getsize(pdf_file), "sha256": file_hash(pdf_file)})
+    return entry
+
+def download_pdfs(urls: dict, output_folder: str, workers: int = 8, per_host: int = 2, retry_failed: bool = False) -> dict:
+    # Make docstring with rst syntax
+    '''
+    Download the PDFs of a dictionary of PMIDs and URLs concurrently and keep the results in the manifest.\n
+    PDFs that are present with the checksum in the manifest are skipped, just like PDFs that failed before (unless
+    retry_failed is set). PDFs that are present without an entry in the manifest are added to it.\n
+    \n
+    Parameters:\n
+    - urls: A dictionary with the PMIDs as keys and the PDF URLs as values\n
+    - output_folder: The output folder for the PDF files\n
+    - workers: The amount of PDFs that are downloaded at once\n
+    - per_host: The amount of PDFs that are downloaded at once from the same host\n
+    - retry_failed: If True, also try the PDFs that failed before\n
+    \n
+    Returns:\n
+    - manifest: A dictionary with the PMIDs as keys and dictionaries with the columns of the manifest as values
+    '''
+
+    os.makedirs(output_folder, exist_ok=True)
+    manifest = load_manifest(output_folder)
+
+    todo = {}
+    for pmid, url in urls.items():
+        pdf_file = os.path.join(output_folder, f"{pmid}.pdf")
+        entry = manifest.get(pmid)
+
+        if os.path.exists(pdf_file) and os.path.getsize(pdf_file) > 0:
+            sha = file_hash(pdf_file)
+            if entry is None or entry["status"] != "ok":
+                # Downloaded by another tool, keep it
+                manifest[pmid] = {"pmid": pmid, "url": url, "status": "ok", "size": os.path.getsize(pdf_file), "sha256": sha, "error": ""}
+                continue
+            if entry["sha256"] == sha:
+                continue
+            # The file changed since it was downloaded, download it again
+            os.remove(pdf_file)
+        elif entry is not None and entry["status"] == "failed" and entry["url"] == url and not retry_failed:
+            continue
+
+        todo[pmid] = url
+
+    print(f"Going to download {len(todo)} of {len(urls)} PDFs")
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=per_host)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    limiter = HostLimiter(per_host)
+
+    # Append every result right away, so an interrupted run keeps its results
+    with open(os.path.join(output_folder, MANIFEST), 'a') as handle:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(download_pdf, session, pmid, url, output_folder, limiter) for pmid, url in todo.items()]
+            for future in as_completed(futures):
+                entry = future.result()
+                manifest[entry["pmid"]] = entry
+                handle.write("\t".join(str(entry[column]) for column in COLUMNS) + "\n")
+                handle.flush()
+
+                if entry["status"] == "ok":
+                    print(f"Downloaded {entry['pmid']}.pdf")
+                else:
+                    print(f"Could not download {entry['pmid']}.pdf: {entry['error']}")
+
+    session.close()
+    write_manifest(output_folder, manifest)
+    return manifest
+
+if __name__ == "__main__":
+
+    # Create a parser object and add arguments
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-t", dest="url_file", required=False, default=None, help="Provide the path to the tab-delimited file with PMIDs and PDF URLs")
+    parser.add_argument("-j", dest="json_file", required=False, default=None, help="Provide the path to the JSON database file")
+    parser.add_argument("-o", dest="output_folder", required=True, help="Provide the path to the output folder for the PDF files")
+    parser.add_argument("--workers", dest="workers", required=False, type=int, default=8, help="Number of PDFs that are downloaded at once (default 8)")
+    parser.add_argument("--per-host", dest="per_host", required=False, type=int, default=2, help="Number of PDFs that are downloaded at once from the same host (default 2)")
+    parser.add_argument("--retry-failed", dest="retry_failed", required=False, default=False, action="store_true", help="Also try the PDFs that failed in an earlier run")
+
+    # Read arguments from the command line
+    args = parser.parse_args()
+    if (args.url_file is None) == (args.json_file is None):
+        parser.error("provide either -t or -j")
+
+    urls = read_urls(args.url_file) if args.url_file else oa_pdf_urls(args.json_file)
+
+    manifest = download_pdfs(urls, args.output_folder, workers=args.workers, per_host=args.per_host, retry_failed=args.retry_failed)
+    print(f"{sum(entry['status'] == 'ok' for entry in manifest.values())} PDFs are downloaded, see {os.path.join(args.output_folder, MANIFEST)}")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+'''
+This script splits the results of a union run back per disease area.
+Query2PMID --union writes one PMID file with the unique PMIDs of all queries and a table with the disease areas of every PMID.
+The union is downloaded, embedded and predicted once, and this script then writes a copy of every result file per disease area,
+named <area>_<name of the result file>, that only holds the PMIDs of that disease area.
+
+Supported result files are JSON databases (list layout), JSON files with PMIDs as keys (update files, tags, predictions),
+JSON Lines databases, NPZ embedding files and tab-delimited txt files with the PMID in the first column. JSON, JSON Lines and txt
+files ending in .gz or .zst are read compressed and their copies per disease area are written compressed (see Compression).
+The script has three required arguments and one optional argument. ::
+
+    Required:
+
+    -m : The path to the PMID to disease area JSON file (pmid_areas.json)
+    -i : The paths to one or more result files
+    -o : The path to the output directory
+
+    Optional:
+    --level: The compression level of compressed output files
+
+    Usage:
+
+    python3 Union2Areas.py -m /tmp/pmid_areas.json -i /tmp/database.json /tmp/scores_randomforest.json -o /tmp/areas/
+
+'''
+
+# Import the required libraries
+import argparse
+import json
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+from lib.Compression import open_file, strip_compression
+from lib.DatabaseStore import json_layout, read_items
+from lib.Medline2JSON import JSONL_EXTENSIONS, JSONStreamWriter
+
+def area_path(output_directory: str, area: str, input_file: str) -> str:
+    # Make docstring with rst syntax
+    '''
+    Get the path of the output file of a disease area.\n
+    \n
+    Parameters:\n
+    - output_directory: The path to the output directory\n
+    - area: The disease area\n
+    - input_file: The path to the result file\n
+    \n
+    Returns:\n
+    - path: The path to the output file of the disease area
+    '''
+
+    return os.path.join(output_directory, f"{area}_{os.path.basename(input_file)}")
+
+def split_json(input_file: str, membership: dict, output_directory: str, level: int | None = None) -> None:
+    # Make docstring with rst syntax
+    '''
+    Split a JSON result file per disease area. The file is streamed, so it does not have to fit in memory.\n
+    \n
+    Parameters:\n
+    - input_file: The path to a JSON database (list layout), a JSON file with PMIDs as keys (dict layout) or a JSON Lines database\n
+    - membership: A dictionary with the PMIDs as keys and lists of disease areas as values\n
+    - output_directory: The path to the output directory\n
+    - level: The compression level of compressed output files\n
+    '''
+
+    # The copies keep the layout and the compression of the result file
+    layout = json_layout(input_file)
+    areas = sorted(set(area for pmid_areas in membership.values() for area in pmid_areas))
+    writers = {area: JSONStreamWriter(area_path(output_directory, area, input_file), layout=layout, level=level) for area in areas}
+
+    for item in read_items(input_file):
+        for area in membership.get(item['pmid'], []):
+            writers[area].write(item)
+
+    for writer in writers.values():
+        writer.close()
+
+def split_npz(input_file: str, membership: dict, output_directory: str) -> None:
+    # Make docstring with rst syntax
+    '''
+    Split an NPZ embedding file per disease area.\n
+    \n
+    Parameters:\n
+    - input_file: The path to an NPZ file with embeddings and keys arrays\n
+    - membership: A dictionary with the PMIDs as keys and lists of disease areas as values\n
+    - output_directory: The path to the output directory\n
+    '''
+
+    import numpy as np
+
+    data = np.load(input_file, allow_pickle=True)
+    keys = data['keys']
+
+    areas = sorted(set(area for pmid_areas in membership.values() for area in pmid_areas))
+    for area in areas:
+        mask = np.array([area in membership.get(str(key), []) for key in keys], dtype=bool)
+        np.savez_compressed(area_path(output_directory, area, input_file), embeddings=data['embeddings'][mask], keys=keys[mask])
+
+def split_txt(input_file: str, membership: dict, output_directory: str, level: int | None = None) -> None:
+    # Make docstring with rst syntax
+    '''
+    Split a txt file with a PMID in the first (tab-delimited) column per disease area.\n
+    \n
+    Parameters:\n
+    - input_file: The path to the txt file\n
+    - membership: A dictionary with the PMIDs as keys and lists of disease areas as values\n
+    - output_directory: The path to the output directory\n
+    - level: The compression level of compressed output files\n
+    '''
+
+    areas = sorted(set(area for pmid_areas in membership.values() for area in pmid_areas))
+    handles = {area: open_file(area_path(output_directory, area, input_file), 'wt', level=level) for area in areas}
+
+    with open_file(input_file, 'rt') as file:
+        for line in file:
+            pmid = line.rstrip("\n").split("\t")[0]
+            for area in membership.get(pmid, []):
+                handles[area].write(line if line.endswith("\n") else line + "\n")
+
+    for handle in handles.values():
+        handle.close()
+
+if __name__ == "__main__":
+
+    # Create a parser object and add arguments
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-m", dest="membership_file", required=True, help="Provide the path to the PMID to disease area JSON file")
+    parser.add_argument("-i", dest="input_files", required=True, nargs="+", help="Provide the paths to the result files")
+    parser.add_argument("-o", dest="output_directory", required=True, help="Provide the path to the output directory")
+    parser.add_argument("--level", dest="level", required=False, type=int, default=None, help="The compression level of compressed output files")
+
+    # Read arguments from the command line
+    args = parser.parse_args()
+
+    with open_file(args.membership_file, 'rt') as file:
+        membership = json.load(file)
+
+    for input_file in args.input_files:
+        print(f"Splitting {input_file}")
+        if strip_compression(input_file).endswith((".json",) + JSONL_EXTENSIONS):
+            split_json(input_file, membership, args.output_directory, args.level)
+        elif input_file.endswith(".npz"):
+            split_npz(input_file, membership, args.output_directory)
+        else:
+            split_txt(input_file, membership, args.output_directory, args.level)
@@ -62,32 +62,10 @@ echo ""
 echo " PDF LOADING"
 echo "================================="
 
-# Use wget to download the pdfs from the urls in the tab-delimited file
-while read pmid url; do
-    pdf_file="$pdfdir$pmid.pdf"
-
-    echo "Processing $pmid"
-    echo "---------------------------------"
-    echo "URL: $url"
-
-    if [ -f $pdf_file ]; then
-        echo ""
-        echo "Skipping download of $pdf_file since it already exists"
-    else
-        echo ""
-        echo "Downloading $pmid.pdf"
-        wget -O $pdf_file $url
-        echo ""
-
-        # If resulting file has size 0KB, remove it
-        if [ ! -s $pdf_file ]; then
-            echo "Removing $pdf_file since its an empty file"
-            rm $pdf_file
-        fi
-
-    fi
-    echo ""
-done < $output_file
+# Download the pdfs from the urls in the tab-delimited file, pdfs that are already downloaded are skipped
+python3 "$scriptdir"URL2PDF.py \
+                -t $output_file \
+                -o $pdfdir
 echo "================================="
 echo ""
 
@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+example_file = os.path.join(BASE_DIR, 'tests/data/example_database_merge.json')
+output_folder = os.path.join(BASE_DIR, 'tests/data/test_compression')
+
+# Make test for the function
+def test_compression():
+    from lib.Compression import open_file, compression_of, strip_compression
+    from lib.DatabaseStore import read_records, read_jsonl, read_items, database_to_json, is_jsonl, json_layout
+    from lib.DatabaseIndex import load_pmids
+    from lib.DatabaseMerge import database_merge
+    from lib.DatabaseOffsets import get_records, offsets_valid
+    from lib.DatabaseBenchmark import benchmark_formats
+    from lib.Medline2JSON import JSONStreamWriter
+    from lib.Union2Areas import split_json, split_txt, area_path
+
+    assert compression_of("a.json.gz") == "gzip" and compression_of("a.jsonl.ZST") == "zstd" and compression_of("a.json") is None
+    assert strip_compression("a.jsonl.zst") == "a.jsonl" and is_jsonl("a.jsonl.gz") and not is_jsonl("a.json.gz")
+
+    with open(example_file, 'r') as file:
+        database = json.load(file)
+    pmids = {database[3]['pmid'], database[40]['pmid'], '0'}
+    os.makedirs(output_folder, exist_ok=True)
+
+    for extension in ("json.gz", "json.zst", "jsonl.gz", "jsonl.zst"):
+        path = os.path.join(output_folder, "database." + extension)
+
+        # The files are compressed while they are written, a higher level gives a smaller file
+        assert database_to_json(example_file, path, level=1) == len(database)
+        size = os.path.getsize(path)
+        database_to_json(example_file, path, level=9)
+        assert os.path.getsize(path) <= size < os.path.getsize(example_file) / 2
+        with open_file(path, 'rt') as file:
+            text = file.read()
+        assert text.startswith('{"pmid":' if 'jsonl' in extension else '[\n    {')
+
+        # All readers read the compressed files
+        assert list(read_records(path)) == database
+        assert list(read_records(path, columns=['title'], pmids=pmids)) == [{'pmid': item['pmid'], 'title': item['title']} for item in (database[3], database[40])]
+        assert list(read_items(path)) == database
+        assert list(load_pmids(path)) == [item['pmid'] for item in database]
+
+        # A compressed file is not indexed
+        assert not offsets_valid(path)
+        try:
+            get_records(path, pmids)
+            assert False
+        except ValueError:
+            pass
+
+    # The decompressed blocks of a JSON Lines file are parsed by a pool of processes
+    path = os.path.join(output_folder, "database.jsonl.zst")
+    assert list(read_jsonl(path, None, None, workers=2, chunk_size=5000)) == database
+
+    # A compressed update is merged into a compressed database, and items are appended to a compressed file
+    update_file = os.path.join(output_folder, "update.json.gz")
+    with open_file(update_file, 'wt') as file:
+        json.dump({database[2]['pmid']: {"is_oa": True}, "99999999": {"title": "New record"}}, file)
+    merged_file = os.path.join(output_folder, "merged.json.zst")
+    assert database_merge(path, [update_file], merged_file) == len(database) + 1
+    with JSONStreamWriter(merged_file, append=True) as writer:
+        writer.write({'pmid': '99999998'})
+    merged = list(read_records(merged_file))
+    assert merged[2]['is_oa'] is True and [item['pmid'] for item in merged[-2:]] == ["99999999", "99999998"]
+
+    # A compressed union is split per disease area into compressed copies
+    membership = {database[3]['pmid']: ['liver'], database[40]['pmid']: ['liver', 'skin']}
+    with open_file(os.path.join(output_folder, "pmids.txt.gz"), 'wt') as file:
+        file.write("".join(f"{item['pmid']}\t0.5\n" for item in database))
+    for name in ("database.json.gz", "database.jsonl.zst", "update.json.gz", "pmids.txt.gz"):
+        path = os.path.join(output_folder, name)
+        if name.endswith(".txt.gz"):
+            split_txt(path, membership, output_folder, level=1)
+        else:
+            split_json(path, membership, output_folder, level=1)
+        skin_file = area_path(output_folder, 'skin', path)
+        assert compression_of(skin_file) == compression_of(path)
+        if name.endswith(".txt.gz"):
+            with open_file(skin_file, 'rt') as file:
+                assert file.read() == f"{database[40]['pmid']}\t0.5\n"
+        else:
+            assert json_layout(skin_file) == json_layout(path) and is_jsonl(skin_file) == is_jsonl(path)
+            assert [item['pmid'] for item in read_items(area_path(output_folder, 'liver', path))] == \
+                [pmid for pmid in [item['pmid'] for item in read_items(path)] if pmid in membership]
+
+    # The benchmark writes and scans every format
+    results = benchmark_formats(example_file, output_folder, formats=["json", "json.gz", "jsonl.zst"])
+    assert [result['records'] for result in results] == [len(database)] * 3
+    assert results[0]['ratio'] == 1.0 and results[1]['ratio'] > 2 and results[2]['ratio'] > 2
+
+    # Clean up
+    shutil.rmtree(output_folder)
+
+test_compression()
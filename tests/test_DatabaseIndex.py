@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+example_file = os.path.join(BASE_DIR, 'tests/data/example_database.json')
+database_file = os.path.join(BASE_DIR, 'tests/data/test_index_database.json')
+
+# Make test for the function
+def test_database_pmids():
+    from lib.DatabaseIndex import load_pmids
+    from lib.NewPMID import select_missing
+    
+    with open(example_file, 'r') as file:
+        database = json.load(file)
+    
+    # Two records were retrieved recently and one a long time ago, the others have no retrieved field
+    recent = (datetime.now() - timedelta(days=5)).strftime("%Y/%m/%d")
+    database[0]['retrieved'] = recent
+    database[1]['retrieved'] = recent
+    database[2]['retrieved'] = '2000/01/01'
+    
+    with open(database_file, 'w') as file:
+        json.dump(database, file, indent=4)
+    
+    # The sidecar is built on the first call and reused on the second call
+    pmids = load_pmids(database_file)
+    assert list(pmids) == [item['pmid'] for item in database]
+    assert pmids[database[0]['pmid']] == recent
+    assert os.path.exists(database_file + '.pmids')
+    assert load_pmids(database_file) == pmids
+    
+    # Only PMIDs that are missing from the database are selected
+    new_pmids = ['1', '2']
+    assert select_missing([item['pmid'] for item in database] + new_pmids, database_file) == new_pmids
+    
+    # With a maximum age, old records and records without a retrieved field are selected too
+    assert pmids[database[3]['pmid']] == ""
+    selected = select_missing([item['pmid'] for item in database] + new_pmids, database_file, max_age=30)
+    assert selected == [item['pmid'] for item in database[2:]] + new_pmids
+    
+    # A rewrite of the database does not make the records without a retrieved field look new
+    rewritten_file = database_file.replace('.json', '_rewritten.json')
+    with open(rewritten_file, 'w') as file:
+        json.dump(database, file, indent=4)
+    assert load_pmids(rewritten_file)[database[3]['pmid']] == ""
+    assert select_missing([item['pmid'] for item in database], rewritten_file, max_age=30) == [item['pmid'] for item in database[2:]]
+    
+    # Clean up
+    for path in (database_file, rewritten_file):
+        os.remove(path)
+        os.remove(path + '.pmids')
+    
+test_database_pmids()
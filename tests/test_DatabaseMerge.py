@@ -26,5 +26,37 @@ def test_database_merge():
     
     # Clean up
     os.remove(output_file)
+
+def test_database_merge_multiple():
+    from lib.DatabaseMerge import database_merge
+
+    with open(json_file, 'r') as file:
+        database = json.load(file)
+    with open(update_file, 'r') as file:
+        tags = json.load(file)
+
+    # An OpenAlex update with a new PMID and a correction that is overwritten by the last file
+    pmids = [item['pmid'] for item in database]
+    openalex = {pmids[0]: {"openalex_id": "W1", "cited_by_count": 1}, "99999999": {"openalex_id": "W2"}}
+    corrections = {pmids[0]: {"cited_by_count": 5}, "99999999": {"title": "New record"}}
+    update_files = [update_file]
+    for index, update in enumerate([openalex, corrections]):
+        update_files.append(os.path.join(BASE_DIR, f'tests/data/test_update_{index}.json'))
+        with open(update_files[-1], 'w') as file:
+            json.dump(update, file, indent=4)
+
+    # All updates are merged in one pass
+    assert database_merge(json_file, update_files, output_file) == len(database) + 1
+
+    with open(output_file, 'r') as file:
+        output_data = json.load(file)
+    assert [item['pmid'] for item in output_data] == pmids + ["99999999"]
+    assert output_data[0] == {**database[0], **tags.get(pmids[0], {}), "openalex_id": "W1", "cited_by_count": 5}
+    assert output_data[-1] == {"openalex_id": "W2", "title": "New record", "pmid": "99999999"}
+
+    # Clean up
+    for path in [output_file] + update_files[1:]:
+        os.remove(path)
     
-test_database_merge()
\ No newline at end of file
+test_database_merge()
+test_database_merge_multiple()
\ No newline at end of file
@@ -0,0 +1,86 @@
+import json
+import os
+import sys
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+example_file = os.path.join(BASE_DIR, 'tests/data/example_database_merge.json')
+database_file = os.path.join(BASE_DIR, 'tests/data/test_offsets_database.json')
+
+# Make test for the function
+def test_database_offsets():
+    from lib.DatabaseOffsets import OffsetIndex, get_records, offsets_valid
+    from lib.DatabaseStore import read_records
+
+    with open(example_file, 'r') as file:
+        database = json.load(file)
+    # Brackets and quotes in the text do not confuse the scanner
+    database[1]['title'] = 'A "quoted" {title} with [brackets]\n    {'
+
+    # Both the indent=4 layout and a compact layout are indexed
+    for indent in (4, None):
+        with open(database_file, 'w') as file:
+            json.dump(database, file, indent=indent)
+        assert not offsets_valid(database_file)
+
+        pmids = [database[1]['pmid'], database[50]['pmid'], database[2]['pmid'], '0', 'abc']
+        assert get_records(database_file, pmids) == [database[1], database[2], database[50]]
+        assert offsets_valid(database_file)
+
+        with OffsetIndex(database_file) as index:
+            assert len(index) == len(set(item['pmid'] for item in database))
+            assert database[-1]['pmid'] in index and '0' not in index
+
+        # The shared reader seeks to the items when the index is up to date
+        records = list(read_records(database_file, columns=['title'], pmids=pmids))
+        assert records == [{'pmid': item['pmid'], 'title': item['title']} for item in (database[1], database[2], database[50])]
+        os.remove(database_file + '.offsets')
+
+    # A database with the PMIDs as keys is indexed, its records get the pmid back
+    from lib.Medline2JSON import JSONStreamWriter
+    pmids = [database[1]['pmid'], database[50]['pmid'], '0']
+    expected = [database[1], database[50]]
+    for indent in (4, None, "writer"):
+        if indent == "writer":
+            with JSONStreamWriter(database_file, layout="dict") as writer:
+                for item in database:
+                    writer.add(item)
+        else:
+            with open(database_file, 'w') as file:
+                json.dump({item['pmid']: {key: value for key, value in item.items() if key != 'pmid'} for item in database}, file, indent=indent)
+        assert [{'pmid': item['pmid'], 'title': item['title']} for item in read_records(database_file, columns=['title'], pmids=pmids)] == \
+            [{'pmid': item['pmid'], 'title': item['title']} for item in expected]
+        records = get_records(database_file, pmids)
+        assert [{'pmid': item['pmid'], **{key: value for key, value in item.items() if key != 'pmid'}} for item in expected] == records
+        assert list(read_records(database_file, pmids=pmids)) == records
+        os.remove(database_file + '.offsets')
+
+    # A JSON Lines database without the pmid as first key, and every item of a duplicated PMID is read with and without an index
+    duplicate = dict(database[1], title='Second item')
+    with open(database_file, 'w') as file:
+        for item in database[:10] + [duplicate]:
+            file.write(json.dumps({key: value for key, value in item.items() if key != 'pmid'} | {'pmid': item['pmid']}) + "\n")
+    pmids = [database[1]['pmid'], database[5]['pmid']]
+    streamed = [item for item in database[:10] + [duplicate] if item['pmid'] in pmids]
+    assert get_records(database_file, pmids) == [{key: value for key, value in item.items() if key != 'pmid'} | {'pmid': item['pmid']} for item in streamed]
+    with OffsetIndex(database_file) as index:
+        assert len(index) == 11 and len(index.find_all(database[1]['pmid'])) == 2
+    assert [item['title'] for item in read_records(database_file, columns=['title'], pmids=pmids)] == [item['title'] for item in streamed]
+    os.remove(database_file + '.offsets')
+
+    # The index is rebuilt when the database changes
+    get_records(database_file, [database[0]['pmid']])
+    time.sleep(0.01)
+    database[0]['title'] = 'Changed title'
+    with open(database_file, 'w') as file:
+        json.dump(database, file, indent=4)
+    assert not offsets_valid(database_file)
+    assert get_records(database_file, [database[0]['pmid']]) == [database[0]]
+
+    # Clean up
+    os.remove(database_file)
+    os.remove(database_file + '.offsets')
+
+test_database_offsets()
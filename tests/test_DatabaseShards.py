@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import sys
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+example_file = os.path.join(BASE_DIR, 'tests/data/example_database_merge.json')
+shards_folder = os.path.join(BASE_DIR, 'tests/data/test_shards')
+json_file = os.path.join(BASE_DIR, 'tests/data/test_database_shards.json')
+result_file = os.path.join(BASE_DIR, 'tests/data/test_shards_result')
+
+# Make test for the function
+def test_database_shards():
+    from lib.DatabaseShards import shard_database, unshard_database, verify_shards, concat_results
+    from lib.DatabaseStore import read_records, parse_shard, shard_of
+    from lib.DatabaseIndex import load_pmids
+
+    with open(example_file, 'r') as file:
+        database = json.load(file)
+    pmids = [item['pmid'] for item in database]
+
+    assert parse_shard("3/8") == (3, 8)
+    for value in ("8/8", "1/0", "a/2", "1"):
+        try:
+            parse_shard(value)
+            assert False
+        except ValueError:
+            pass
+
+    # Hash partitioning in 4 shards, the manifest holds the counts and checksums
+    manifest = shard_database(example_file, shards_folder, 4)
+    assert manifest['records'] == len(database) and len(manifest['shards']) == 4
+    assert sum(shard['records'] for shard in manifest['shards']) == len(database)
+    assert verify_shards(shards_folder) == []
+
+    # Every shard holds the records of its hash, in the order of the database
+    for number, shard in enumerate(manifest['shards']):
+        with open(os.path.join(shards_folder, shard['file']), 'r') as file:
+            assert json.load(file) == [item for item in database if shard_of(item['pmid'], 4) == number]
+
+    # The sharded database is read like a single database, shard i/N selects the same records from both layouts
+    assert sorted(item['pmid'] for item in read_records(shards_folder)) == sorted(pmids)
+    for shard in ((0, 2), (1, 2), (3, 4)):
+        from_shards = sorted(item['pmid'] for item in read_records(shards_folder, columns=['title'], shard=shard))
+        from_file = sorted(item['pmid'] for item in read_records(example_file, columns=['title'], shard=shard))
+        assert from_shards == from_file
+    selected = {pmids[3], pmids[40], '0'}
+    assert sorted(item['pmid'] for item in read_records(shards_folder, pmids=selected)) == sorted(selected - {'0'})
+    assert sorted(load_pmids(shards_folder)) == sorted(pmids)
+
+    # Joining the shards gives back all records
+    assert unshard_database(shards_folder, json_file) == len(database)
+    with open(json_file, 'r') as file:
+        assert sorted(json.load(file), key=lambda item: pmids.index(item['pmid'])) == database
+
+    # A changed shard does not match the manifest
+    with open(os.path.join(shards_folder, manifest['shards'][1]['file']), 'a') as file:
+        file.write(" ")
+    assert verify_shards(shards_folder) == [manifest['shards'][1]['file']]
+    shutil.rmtree(shards_folder)
+
+    # Range partitioning, every shard holds a range of PMIDs
+    manifest = shard_database(example_file, shards_folder, 3, partition="range")
+    assert len(manifest['boundaries']) == 2
+    ranges = [[int(item['pmid']) for item in read_records(shards_folder, shard=(number, 3))] for number in range(3)]
+    assert max(ranges[0]) < min(ranges[1]) and max(ranges[1]) < min(ranges[2])
+    assert sum(len(part) for part in ranges) == len(database)
+
+    # The results of the shards are joined in order
+    parts = []
+    for number in range(3):
+        part = f"{result_file}-{number}.json"
+        with open(part, 'w') as file:
+            json.dump({item['pmid']: {"title": item['title']} for item in read_records(shards_folder, shard=(number, 3))}, file)
+        np.savez_compressed(f"{result_file}-{number}.npz", embeddings=np.ones((len(ranges[number]), 2)), keys=np.array(ranges[number]))
+        parts.append(part)
+    assert concat_results(parts, result_file + ".json") == len(database)
+    with open(result_file + ".json", 'r') as file:
+        assert [int(pmid) for pmid in json.load(file)] == ranges[0] + ranges[1] + ranges[2]
+    assert concat_results([part.replace(".json", ".npz") for part in parts], result_file + ".npz") == len(database)
+    with np.load(result_file + ".npz") as data:
+        assert data['embeddings'].shape == (len(database), 2) and list(data['keys']) == ranges[0] + ranges[1] + ranges[2]
+
+    # Clean up
+    shutil.rmtree(shards_folder)
+    for path in parts + [part.replace(".json", ".npz") for part in parts] + [result_file + ".json", result_file + ".npz", json_file, shards_folder + ".pmids"]:
+        if os.path.exists(path):
+            os.remove(path)
+
+test_database_shards()
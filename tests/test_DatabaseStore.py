@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+example_file = os.path.join(BASE_DIR, 'tests/data/example_database_merge.json')
+parquet_file = os.path.join(BASE_DIR, 'tests/data/test_database.parquet')
+json_file = os.path.join(BASE_DIR, 'tests/data/test_database_parquet.json')
+jsonl_file = os.path.join(BASE_DIR, 'tests/data/test_database.jsonl')
+
+# Make test for the function
+def test_database_store():
+    from lib.DatabaseStore import read_records, json_to_parquet, database_to_json
+    from lib.Database2PDF import oa_pdf_urls
+
+    with open(example_file, 'r') as file:
+        database = json.load(file)
+    fields = list(dict.fromkeys(key for item in database for key in item))
+
+    # Small row groups, so the PMID filter has to skip some of them
+    assert json_to_parquet(example_file, parquet_file, row_group_size=10) == len(database)
+
+    # All fields are read back, lists and dictionaries included
+    records = list(read_records(parquet_file))
+    assert records == [{field: item.get(field) for field in fields} for item in database]
+
+    # Only the requested fields and PMIDs, in the order of the database
+    pmids = {database[3]['pmid'], database[40]['pmid'], database[-1]['pmid'], '0'}
+    for path in (example_file, parquet_file):
+        records = list(read_records(path, columns=['title', 'abstract', 'missing'], pmids=pmids))
+        assert [item['pmid'] for item in records] == [database[3]['pmid'], database[40]['pmid'], database[-1]['pmid']]
+        assert records[1] == {'pmid': database[40]['pmid'], 'title': database[40]['title'], 'abstract': database[40]['abstract'], 'missing': None}
+
+    # And back to JSON
+    assert database_to_json(parquet_file, json_file) == len(database)
+    with open(json_file, 'r') as file:
+        assert json.load(file) == [{field: item.get(field) for field in fields} for item in database]
+
+    # The scripts read both formats
+    database[0].update({'is_oa': True, 'pdf_url': 'https://example.org/1.pdf', 'cited_by_count': 3})
+    database[1].update({'is_oa': False, 'pdf_url': None, 'cited_by_count': 2.5})
+    with open(json_file, 'w') as file:
+        json.dump(database, file, indent=4)
+    json_to_parquet(json_file, parquet_file)
+    assert oa_pdf_urls(parquet_file) == oa_pdf_urls(json_file) == {database[0]['pmid']: 'https://example.org/1.pdf'}
+    assert [item['cited_by_count'] for item in read_records(parquet_file, columns=['cited_by_count'])][:3] == [3, 2.5, None]
+
+    # Clean up
+    os.remove(parquet_file)
+    os.remove(json_file)
+
+# Make test for the function
+def test_jsonl_database():
+    from lib.DatabaseStore import read_records, read_jsonl, line_chunks, database_to_json
+    from lib.DatabaseOffsets import get_records
+    from lib.DatabaseIndex import load_pmids
+    from lib.Medline2JSON import JSONStreamWriter
+
+    with open(example_file, 'r') as file:
+        database = json.load(file)
+
+    # One compact record per line, with the pmid first
+    assert database_to_json(example_file, jsonl_file) == len(database)
+    with open(jsonl_file, 'r') as file:
+        lines = file.read().splitlines()
+    assert [json.loads(line) for line in lines] == database and lines[0].startswith('{"pmid":')
+    assert os.path.getsize(jsonl_file) < os.path.getsize(example_file)
+
+    # The chunks end on a newline and cover the whole file
+    chunks = line_chunks(jsonl_file, chunk_size=2000)
+    assert len(chunks) > 5 and chunks[0][0] == 0 and chunks[-1][1] == os.path.getsize(jsonl_file)
+    with open(jsonl_file, 'rb') as file:
+        data = file.read()
+    assert all(data[end - 1:end] == b"\n" for start, end in chunks)
+
+    # The chunks are parsed by several processes, the records keep their order
+    assert list(read_records(jsonl_file)) == database
+    assert list(read_jsonl(jsonl_file, None, None, workers=3, chunk_size=2000)) == database
+    pmids = {database[3]['pmid'], database[40]['pmid'], '0'}
+    records = list(read_jsonl(jsonl_file, ['pmid', 'title'], pmids, workers=2, chunk_size=2000))
+    assert records == [{'pmid': item['pmid'], 'title': item['title']} for item in (database[3], database[40])]
+    assert list(read_records(jsonl_file, columns=['title'], pmids=pmids)) == records
+    assert list(load_pmids(jsonl_file)) == [item['pmid'] for item in database]
+
+    # The offset index reads single lines
+    assert get_records(jsonl_file, pmids) == [database[3], database[40]]
+
+    # Items are appended to an existing JSON Lines file
+    with JSONStreamWriter(jsonl_file, append=True) as writer:
+        writer.write(database[0])
+        writer.write({'title': 'New record', 'pmid': '99999999'})
+    assert list(read_records(jsonl_file))[-1] == {'pmid': '99999999', 'title': 'New record'}
+    assert len(list(read_records(jsonl_file))) == len(database) + 1
+
+    # Clean up
+    for path in (jsonl_file, jsonl_file + '.offsets', jsonl_file + '.pmids'):
+        if os.path.exists(path):
+            os.remove(path)
+
+test_database_store()
+test_jsonl_database()
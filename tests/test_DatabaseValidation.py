@@ -0,0 +1,66 @@
+import json
+import os
+import shutil
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+example_file = os.path.join(BASE_DIR, 'tests/data/example_database_merge.json')
+output_folder = os.path.join(BASE_DIR, 'tests/data/test_validation')
+
+# Make test for the function
+def test_database_validation():
+    from lib.DatabaseValidation import assess_database, HyperLogLog, value_hash
+
+    with open(example_file, 'r') as file:
+        database = json.load(file)
+
+    # Add missing values and duplicates to the example database
+    database[1]['title'] = None
+    database[2]['title'] = database[3]['title']
+    database[4]['doi'] = database[5]['doi']
+    database[6]['abstract'] = None
+    database[7]['is_oa'] = True
+    database[8]['is_oa'] = False
+    database[9]['mesh'] = ""
+    database.append(dict(database[0]))
+
+    os.makedirs(output_folder, exist_ok=True)
+    database_file = os.path.join(output_folder, 'database.json')
+    with open(database_file, 'w') as file:
+        json.dump(database, file, indent=4)
+    pmid_file = os.path.join(output_folder, 'pmids.txt')
+    with open(pmid_file, 'w') as file:
+        file.write('\n'.join([database[0]['pmid'], database[5]['pmid'], '123']) + '\n')
+
+    report = assess_database(database_file, pmid_file)
+    assert list(report) == ['pmid', 'doi', 'pmcid', 'title', 'author', 'abstract', 'year', 'first_author', 'mesh', 'is_oa']
+    assert report['pmid'] == {'missing_values': 0, 'unique_values': 98, 'duplicates': 1, 'duplicated_pmids': [database[0]['pmid']],
+                              'missing_pmids': [], 'pmids_missing_database': ['123'],
+                              'pmids_extra_database': [item['pmid'] for item in database[1:-1] if item['pmid'] != database[5]['pmid']]}
+    # DOIs are lists in a merged database, they are hashed by their JSON
+    assert report['doi']['duplicated_pmids'] == [database[5]['pmid'], database[0]['pmid']] and report['doi']['duplicates'] == 2
+    assert report['title']['missing_values'] == 1 and report['title']['duplicated_pmids'] == [database[3]['pmid'], database[0]['pmid']]
+    assert report['pmcid'] == {'missing_values': 99, 'unique_values': 0, 'duplicates': 0}
+
+    # Missing values count as empty strings in the averages, and as False in the open access counts
+    words = sum(len((item.get('abstract') or "").split()) for item in database)
+    assert report['abstract']['avg_abstract_length'] == round(words / len(database), 0)
+    assert report['mesh']['avg_mesh_terms'] == 1.0
+    assert report['is_oa']['is_oa'] == {False: 98, True: 1}
+
+    # The approximate report counts the other columns with a HyperLogLog
+    approximate = assess_database(database_file, approximate=True)
+    assert approximate['pmid'] == {key: value for key, value in report['pmid'].items() if not key.startswith('pmids_')}
+    assert abs(approximate['year']['unique_values'] - report['year']['unique_values']) <= 1
+
+    counter = HyperLogLog()
+    for number in range(100000):
+        counter.add(value_hash(str(number)))
+    assert abs(len(counter) - 100000) < 2000
+
+    # Clean up
+    shutil.rmtree(output_folder)
+
+test_database_validation()
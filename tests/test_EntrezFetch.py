@@ -0,0 +1,329 @@
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+pmid_file = os.path.join(BASE_DIR, 'tests/data/input_pmids.txt')
+records_file = os.path.join(BASE_DIR, 'tests/data/test_fetch_records.txt')
+example_records_file = os.path.join(BASE_DIR, 'tests/data/example_records.txt')
+example_xml_file = os.path.join(BASE_DIR, 'tests/data/example_pubmed.xml')
+json_file = os.path.join(BASE_DIR, 'tests/data/test_fetch_database.json')
+compare_file = os.path.join(BASE_DIR, 'tests/data/test_fetch_compare.json')
+cache_dir = os.path.join(BASE_DIR, 'tests/data/test_fetch_cache')
+entrez_email = 'some@hotmail.nl'
+
+# Split the example records file in records, every record starts with a newline and ends with a newline
+with open(example_records_file, 'r') as file:
+    example_records = ['PMID-' + rec for rec in file.read().split('\nPMID-')[1:]]
+
+# Split the example PubMed XML file in articles by PMID
+with open(example_xml_file, 'r') as file:
+    example_xml = file.read()
+example_articles = {article.split('<PMID Version="1">')[1].split('<')[0]: '<PubmedArticle>' + article.split('</PubmedArticle>')[0] + '</PubmedArticle>'
+                    for article in example_xml.split('<PubmedArticle>')[1:]}
+
+class EntrezHandler(BaseHTTPRequestHandler):
+    # A local stand-in for the esearch and efetch E-utilities, serving the example records
+    def do_GET(self):
+        self.handle_request(urllib.parse.urlsplit(self.path).query)
+
+    def do_POST(self):
+        self.handle_request(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+
+    def handle_request(self, query):
+        params = dict(urllib.parse.parse_qsl(query))
+        self.server.requests.append(time.monotonic())
+        self.server.methods.append((self.path.split('?')[0], self.command))
+
+        if self.path.startswith('/esearch.fcgi') and params.get('term', '').startswith('#'):
+            # A search on the history server gives the PMIDs of a range of earlier search results
+            if self.server.fail_lookups:
+                self.send_response(500)
+                self.end_headers()
+                return
+            start = int(params['retstart'])
+            records = self.server.history[(params['WebEnv'], params['term'][1:])][start:start + int(params['retmax'])]
+            ids = ''.join(f"<Id>{rec[6:].split(chr(10))[0]}</Id>" for rec in records)
+            body = f"<eSearchResult><Count>{len(records)}</Count><IdList>{ids}</IdList></eSearchResult>"
+        elif self.path.startswith('/esearch.fcgi') or self.path.startswith('/epost.fcgi'):
+            ids = set(params['term' if 'term' in params else 'id'].split(','))
+            webenv = params.get('WebEnv', f"WEBENV{len(self.server.history)}")
+            query_key = str(len([key for key in self.server.history if key[0] == webenv]) + 1)
+            self.server.history[(webenv, query_key)] = [rec for rec in example_records if rec[6:].split('\n')[0] in ids]
+            body = (f"<eSearchResult><Count>{len(self.server.history[(webenv, query_key)])}</Count>"
+                    f"<QueryKey>{query_key}</QueryKey><WebEnv>{webenv}</WebEnv></eSearchResult>")
+        else:
+            start, end = int(params['retstart']), int(params['retstart']) + int(params['retmax'])
+
+            # Let a batch fail a set amount of times
+            if self.server.failures.get(start, 0) > 0:
+                self.server.failures[start] -= 1
+                self.send_response(500)
+                self.end_headers()
+                return
+            records = self.server.history[(params['WebEnv'], params['query_key'])][start:end]
+            if params.get('retmode') == 'xml':
+                articles = [example_articles[rec[6:].split('\n')[0]] for rec in records]
+                body = '<?xml version="1.0" ?>\n<PubmedArticleSet>\n' + '\n'.join(articles) + '\n</PubmedArticleSet>\n'
+            else:
+                body = ''.join('\n' + rec for rec in records)
+
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EntrezHandler)
+    server.history = {}
+    server.requests = []
+    server.methods = []
+    server.failures = {}
+    server.fail_lookups = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/"
+
+# Make test for the function
+def test_concurrent_fetch():
+    from lib.PMID2Database import get_records
+
+    server, base_url = start_server()
+
+    # Get all the PMIDs from the txt pmid file
+    with open(pmid_file) as file:
+        pmids = file.read().splitlines()
+
+    # Get the records from the local server with small batches and several workers
+    get_records(pmids=pmids, outfile=records_file, entrez_email=entrez_email, retmax=7, workers=4, base_url=base_url)
+    server.shutdown()
+
+    with open(records_file, 'r') as file:
+        records = file.read()
+
+    with open(example_records_file, 'r') as file:
+        example_data = file.read()
+
+    # Check if the records are written in order
+    assert records == example_data
+
+    # Clean up
+    os.remove(records_file)
+    os.remove(records_file + '.idx')
+
+def test_token_bucket():
+    from lib.EntrezFetch import EntrezClient, TokenBucket
+
+    server, base_url = start_server()
+
+    client = EntrezClient(entrez_email=entrez_email, base_url=base_url, bucket=TokenBucket(rate=10))
+
+    with open(pmid_file) as file:
+        pmids = file.read().splitlines()
+
+    with open(records_file, 'w') as file:
+        client.fetch_records(pmids=pmids, out_handle=file, retmax=5, workers=8)
+    server.shutdown()
+
+    # Check that no second contains more requests than the rate allows
+    requests = server.requests
+    assert len(requests) == 21
+    for request in requests:
+        assert len([r for r in requests if request <= r < request + 1]) <= 11
+
+    # Clean up
+    os.remove(records_file)
+
+def test_epost_fetch():
+    from lib.EntrezFetch import EntrezClient, TokenBucket
+
+    server, base_url = start_server()
+
+    client = EntrezClient(entrez_email=entrez_email, base_url=base_url, bucket=TokenBucket(rate=100))
+
+    with open(pmid_file) as file:
+        pmids = file.read().splitlines()
+
+    # Post the PMIDs in two blocks to the same WebEnv and page efetch over the posted lists
+    with open(records_file, 'w') as file:
+        client.fetch_records(pmids=pmids, out_handle=file, retmax=40, workers=2, pmid_batch_size=60, mode='epost')
+    server.shutdown()
+
+    with open(records_file, 'r') as file:
+        records = ['PMID-' + rec for rec in file.read().split('\nPMID-')[1:]]
+
+    # Every record is downloaded once
+    assert sorted(records) == sorted(example_records)
+
+    # Check that no search was done and that the PMIDs were posted in the request body
+    assert ('/esearch.fcgi', 'GET') not in server.methods and ('/esearch.fcgi', 'POST') not in server.methods
+    assert server.methods.count(('/epost.fcgi', 'POST')) == 2
+    assert set(webenv for webenv, _ in server.history) == {'WEBENV0'}
+
+    # Clean up
+    os.remove(records_file)
+
+def test_pipeline_fetch():
+    from lib.PMID2Database import get_records
+    from lib.Medline2JSON import medline_file_to_json
+
+    server, base_url = start_server()
+
+    with open(pmid_file) as file:
+        pmids = file.read().splitlines()
+
+    # Start from a records file that already holds the first records, as if an earlier run was interrupted
+    with open(records_file, 'w') as file:
+        file.write(''.join('\n' + rec for rec in example_records[:30]))
+
+    # Download the remaining records and convert all records to JSON while downloading
+    get_records(pmids=pmids, outfile=records_file, entrez_email=entrez_email, retmax=10, workers=3,
+                base_url=base_url, json_file=json_file)
+    server.shutdown()
+
+    # The JSON file is the same as converting the complete records file afterwards
+    medline_file_to_json(records_file=example_records_file, outfile=compare_file, layout='list')
+
+    with open(json_file, 'r') as file:
+        output_data = file.read()
+
+    with open(compare_file, 'r') as file:
+        compare_data = file.read()
+
+    assert output_data == compare_data
+
+    # Clean up
+    os.remove(records_file)
+    os.remove(records_file + '.idx')
+    os.remove(json_file)
+    os.remove(compare_file)
+
+def test_xml_fetch():
+    from lib.PMID2Database import get_records
+    from lib.PubmedXML import iter_pubmed_xml
+
+    server, base_url = start_server()
+
+    # Fetch the articles of the example XML file one per request, no records file is written
+    pmids = list(example_articles)
+    get_records(pmids=pmids, outfile=None, entrez_email=entrez_email, retmax=1, workers=2,
+                base_url=base_url, json_file=json_file, retmode='xml')
+    server.shutdown()
+
+    with open(json_file, 'r') as file:
+        output_data = json.load(file)
+
+    # The records are the same as the records of the offline XML ingest, in the order of the search results
+    assert output_data == [value for action, value in iter_pubmed_xml(example_xml_file)]
+    assert server.methods.count(('/efetch.fcgi', 'GET')) == 2
+
+    # Clean up
+    os.remove(json_file)
+
+def test_cached_fetch():
+    from lib.EntrezFetch import EntrezClient, TokenBucket
+    from lib.ResponseCache import ResponseCache
+
+    with open(pmid_file) as file:
+        pmids = file.read().splitlines()
+
+    # Run the same download twice with a cache, the second run is answered from the cache
+    outputs = []
+    for run in range(2):
+        server, base_url = start_server()
+        client = EntrezClient(entrez_email=entrez_email, base_url=base_url, bucket=TokenBucket(rate=100), cache=ResponseCache(cache_dir))
+        with open(records_file, 'w') as file:
+            client.fetch_records(pmids=pmids, out_handle=file, retmax=30, workers=2, pmid_batch_size=60)
+        server.shutdown()
+
+        with open(records_file, 'r') as file:
+            outputs.append(file.read())
+        if run == 0:
+            assert len(server.requests) > 0
+        else:
+            assert len(server.requests) == 0
+
+    assert outputs[0] == outputs[1]
+    assert sorted(['PMID-' + rec for rec in outputs[1].split('\nPMID-')[1:]]) == sorted(example_records)
+
+    # Clean up
+    os.remove(records_file)
+    shutil.rmtree(cache_dir)
+
+def test_failed_batches():
+    from lib.EntrezFetch import EntrezClient, TokenBucket, read_journal
+    from lib.MedlineIndex import MedlineIndex
+    from lib.PMID2Database import get_records
+
+    server, base_url = start_server()
+    journal = records_file + '.failed'
+
+    with open(pmid_file) as file:
+        pmids = file.read().splitlines()
+
+    # The batch at 10 fails once and is retried, the batch at 40 keeps failing and is written to the journal
+    server.failures = {10: 1, 40: 10}
+    client = EntrezClient(entrez_email=entrez_email, base_url=base_url, bucket=TokenBucket(rate=100), retries=2, backoff=0.01)
+    with MedlineIndex(records_file) as index:
+        failed = client.fetch_records(pmids=pmids, out_handle=index, retmax=10, workers=3, journal=journal)
+
+    assert failed == 1
+    entries = read_journal(journal)
+    failed_pmids = [rec[6:].split('\n')[0] for rec in server.history[('WEBENV0', '1')][40:50]]
+    assert entries == [{'mode': 'esearch', 'pmids': failed_pmids, 'retmax': 10, 'retmode': 'text'}]
+    assert len(MedlineIndex(records_file)) == len(example_records) - 10
+
+    # Only the PMIDs of the failed batch are searched and downloaded again and added to the records file
+    server.failures = {}
+    server.requests.clear()
+    get_records(pmids=pmids, outfile=records_file, entrez_email=entrez_email, base_url=base_url, retry_failed=True)
+
+    assert len(server.requests) == 2
+    assert not os.path.exists(journal)
+    with open(records_file, 'r') as file:
+        records = ['PMID-' + rec for rec in file.read().split('\nPMID-')[1:]]
+    assert sorted(records) == sorted(example_records)
+    os.remove(records_file)
+    os.remove(records_file + '.idx')
+
+    # When the PMIDs of the failed batches can not be found, the block is journaled once with the failed batches
+    server.failures = {20: 10, 40: 10}
+    server.fail_lookups = True
+    with MedlineIndex(records_file) as index:
+        failed = client.fetch_records(pmids=pmids, out_handle=index, retmax=10, workers=3, journal=journal)
+
+    assert failed == 2
+    entries = read_journal(journal)
+    assert [(entry['pmids'], entry['retstarts']) for entry in entries] == [(pmids, [20, 40])]
+
+    # The block is searched again and only its failed batches are downloaded
+    server.failures = {}
+    server.requests.clear()
+    get_records(pmids=pmids, outfile=records_file, entrez_email=entrez_email, base_url=base_url, retry_failed=True)
+    server.shutdown()
+
+    assert len(server.requests) == 3
+    assert not os.path.exists(journal)
+    with open(records_file, 'r') as file:
+        records = ['PMID-' + rec for rec in file.read().split('\nPMID-')[1:]]
+    assert sorted(records) == sorted(example_records)
+
+    # Clean up
+    os.remove(records_file)
+    os.remove(records_file + '.idx')
+
+test_concurrent_fetch()
+test_token_bucket()
+test_epost_fetch()
+test_pipeline_fetch()
+test_xml_fetch()
+test_cached_fetch()
+test_failed_batches()
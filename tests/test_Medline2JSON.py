@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+example_records_file = os.path.join(BASE_DIR, 'tests/data/example_records.txt')
+example_new_records_file = os.path.join(BASE_DIR, 'tests/data/example_new_records.txt')
+output_file = os.path.join(BASE_DIR, 'tests/data/test_stream.json')
+compare_file = os.path.join(BASE_DIR, 'tests/data/test_compare.json')
+
+# Make test for the function
+def test_medline2json():
+    from lib.Medline2JSON import medline_file_to_json, JSONStreamWriter, PMIDSet
+    from lib import PMID2Database, NewPMID
+    
+    # The streaming converter writes the same file as the in-memory conversion, for both layouts
+    for records_file, module, layout in [(example_records_file, PMID2Database, 'list'), (example_new_records_file, NewPMID, 'dict')]:
+        count = medline_file_to_json(records_file=records_file, outfile=output_file, layout=layout)
+        
+        records = module.parse_records(file=records_file)
+        module.medline_to_json(records=records, outfile=compare_file)
+        
+        assert count == len(records)
+        
+        with open(output_file, 'r') as file:
+            output_data = file.read()
+            
+        with open(compare_file, 'r') as file:
+            compare_data = file.read()
+            
+        assert output_data == compare_data
+    
+    # A PMID that occurs twice in a records file keeps its first record, add writes every item
+    with open(example_records_file, 'r', encoding='utf-8') as file:
+        records = file.read().strip().split("\n\n")
+    first = records[0]
+    pmid = first.split("\n")[0].split("- ")[1].strip()
+    with open(compare_file, 'w', encoding='utf-8') as file:
+        file.write("\n\n".join(records + [first.replace("\nTI  - ", "\nTI  - Second copy of ")]) + "\n")
+    assert medline_file_to_json(records_file=compare_file, outfile=output_file, workers=1) == len(records)
+    with open(output_file, 'r') as file:
+        items = json.load(file)
+    assert [item['pmid'] for item in items].count(pmid) == 1 and not items[0]['title'].startswith("Second copy")
+
+    with JSONStreamWriter(output_file) as writer:
+        for item in items + items[:1]:
+            writer.add(item)
+    assert writer.seen is None and writer.count == len(items) + 1
+    with open(output_file, 'r') as file:
+        assert json.load(file) == items + items[:1]
+
+    # Numeric PMIDs are bits, other PMIDs are kept in a set
+    pmids = PMIDSet()
+    for value in ["30849355", "1", "0123", "abc", str(1 << 40)]:
+        pmids.add(value)
+    assert all(value in pmids for value in ["30849355", "1", "0123", "abc", str(1 << 40)])
+    assert not any(value in pmids for value in ["2", "123", "30849356", "99999999"])
+    assert len(pmids.bits) == 30849355 // 8 + 1
+
+    # Clean up
+    os.remove(output_file)
+    os.remove(compare_file)
+    
+test_medline2json()
@@ -0,0 +1,68 @@
+import os
+import sys
+import shutil
+from io import StringIO
+from Bio import Medline
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+example_records_file = os.path.join(BASE_DIR, 'tests/data/example_records.txt')
+example_new_records_file = os.path.join(BASE_DIR, 'tests/data/example_new_records.txt')
+records_file = os.path.join(BASE_DIR, 'tests/data/test_index_records.txt')
+
+# Make test for the function
+def test_medline_index():
+    from lib.MedlineIndex import MedlineIndex
+    
+    # Build the index from an existing records file
+    shutil.copy(example_records_file, records_file)
+    index = MedlineIndex(records_file)
+    
+    with open(example_records_file, 'r') as file:
+        example_records = {rec['PMID']: rec for rec in Medline.parse(file)}
+    
+    assert len(index) == len(example_records)
+    
+    # Check if single records can be read back
+    for pmid, record in example_records.items():
+        assert Medline.read(StringIO(index.get_record(pmid))) == record
+    
+    # Append a batch of records and check if the index on disk is updated
+    with open(example_new_records_file, 'r') as file:
+        new_data = file.read()
+
+    shutil.copy(records_file + '.idx', records_file + '.idx.old')
+    with index:
+        index.write(new_data)
+    
+    reloaded = MedlineIndex(records_file)
+    assert reloaded.offsets == index.offsets
+    
+    # Put back the index from before the batch and add a partly written line to simulate a crash,
+    # the tail of the records file is scanned again and the partly written line is removed
+    shutil.move(records_file + '.idx.old', records_file + '.idx')
+    with open(records_file + '.idx', 'a') as file:
+        file.write('3084')
+        
+    repaired = MedlineIndex(records_file)
+    assert repaired.offsets == index.offsets
+    assert MedlineIndex(records_file).offsets == index.offsets
+
+    # An index of a records file that was replaced by a smaller file is built again
+    shutil.copy(example_new_records_file, records_file)
+    with open(example_new_records_file, 'r') as file:
+        new_records = {rec['PMID']: rec for rec in Medline.parse(file)}
+    replaced = MedlineIndex(records_file)
+    assert set(replaced.offsets) == set(new_records)
+    for pmid, record in new_records.items():
+        assert Medline.read(StringIO(replaced.get_record(pmid))) == record
+
+    # An index without its records file is empty
+    os.remove(records_file)
+    assert len(MedlineIndex(records_file)) == 0
+    
+    # Clean up
+    os.remove(records_file + '.idx')
+    
+test_medline_index()
@@ -0,0 +1,63 @@
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+example_records_file = os.path.join(BASE_DIR, 'tests/data/example_records.txt')
+example_new_records_file = os.path.join(BASE_DIR, 'tests/data/example_new_records.txt')
+records_file = os.path.join(BASE_DIR, 'tests/data/test_parser_records.txt')
+
+# Make test for the function
+def test_medlineparser():
+    from Bio import Medline
+    from lib.MedlineParser import parse_medline, parse_medline_file, FIELDS
+
+    # Records with a MeSH term and a title that continue on the next line, and a blank continuation line
+    extra = ("PMID- 1\nTI  - A title\n      that continues.\nMH  - Receptors, Fc/*immunology/metabolism/\n      *pharmacology\n"
+             "AB  - First part.\n      \n      Second part.\nAD  - An address\n      that continues.\n\n\n"
+             "PMID- 2\nFAU - Roy, Sucharita\nDP  - 2019 May\n")
+
+    for path in [example_records_file, example_new_records_file]:
+        with open(path, 'r', encoding='utf-8') as file:
+            text = file.read()
+
+        expected = [{key: value for key, value in rec.items() if key in FIELDS} for rec in Medline.parse((text + "\n" + extra).splitlines(keepends=True))]
+        records = list(parse_medline(text + "\n" + extra))
+
+        assert len(records) > 2
+        assert records == expected
+
+    # A file is parsed in parts that end on a record boundary, with the same result
+    with open(records_file, 'w', encoding='utf-8') as file:
+        file.write(text + "\n" + extra)
+    assert list(parse_medline_file(records_file, chunk_size=5000)) == expected
+    os.remove(records_file)
+
+# Make test for the function
+def test_parallel_parsing():
+    from lib.Medline2JSON import medline_file_items
+    from lib.MedlineParser import record_chunks
+
+    with open(example_records_file, 'r', encoding='utf-8') as file:
+        text = file.read()
+    with open(records_file, 'w', encoding='utf-8') as file:
+        file.write(text * 3)
+
+    # Chunks cover the whole file and end on a blank line
+    chunks = record_chunks(records_file, chunk_size=20000)
+    assert len(chunks) > 10
+    assert chunks[0][0] == 0 and chunks[-1][1] == os.path.getsize(records_file)
+    assert all(end == start for (_, end), (start, _) in zip(chunks, chunks[1:]))
+
+    # The records of a parallel run come in the same order as the records of a single process
+    sequential = list(medline_file_items(records_file, workers=1))
+    parallel = list(medline_file_items(records_file, workers=2, chunk_size=20000))
+    assert len(sequential) == 3 * text.count("PMID- ")
+    assert parallel == sequential
+
+    # Clean up
+    os.remove(records_file)
+
+test_medlineparser()
+test_parallel_parsing()
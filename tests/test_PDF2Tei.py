@@ -0,0 +1,103 @@
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+pdf_folder = os.path.join(BASE_DIR, 'tests/data/test_pdfs')
+tei_folder = os.path.join(BASE_DIR, 'tests/data/test_teis')
+
+class GrobidHandler(BaseHTTPRequestHandler):
+    # A local stand-in for GROBID that is busy for the first requests and returns the hash of the uploaded PDF, or 500 for a PDF it can not parse
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+
+        with self.server.lock:
+            self.server.requests += 1
+            busy = self.server.busy > 0
+            self.server.busy -= 1
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+
+        time.sleep(0.05)
+        with self.server.lock:
+            self.server.active -= 1
+
+        if busy:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        # The PDF is the only part of the multipart body
+        boundary = self.headers['Content-Type'].split('boundary=')[1].encode()
+        pdf = body.split(b'\r\n\r\n', 1)[1].rsplit(b'\r\n--' + boundary + b'--', 1)[0]
+
+        if pdf.startswith(b'%PDF-broken'):
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(f'<TEI>{hashlib.sha256(pdf).hexdigest()}</TEI>'.encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+# Make test for the function
+def test_pdf2tei():
+    from lib.PDF2Tei import PDF_to_TEI, MANIFEST
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), GrobidHandler)
+    server.lock = threading.Lock()
+    server.requests, server.busy, server.active, server.max_active = 0, 2, 0, 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/api/"
+
+    os.makedirs(pdf_folder, exist_ok=True)
+    os.makedirs(tei_folder, exist_ok=True)
+    pdfs = {f'{i}.pdf': b'%PDF-1.4\n' + os.urandom(100000 + i) for i in range(6)}
+    pdfs['copy.pdf'] = pdfs['0.pdf']
+    for name, content in pdfs.items():
+        with open(os.path.join(pdf_folder, name), 'wb') as file:
+            file.write(content)
+
+    # The first two requests are answered with 503 and retried, the copy is not sent
+    count = PDF_to_TEI(list(pdfs), folder=pdf_folder, output_folder=tei_folder, base_url=base_url, workers=3, backoff=0.01)
+    assert count == 6
+    assert server.requests == 8
+    assert 1 < server.max_active <= 3
+
+    # Every PDF arrived completely and has a TEI file
+    for name, content in pdfs.items():
+        with open(os.path.join(tei_folder, name.replace('.pdf', '.grobid.tei.xml')), 'r') as file:
+            assert file.read() == f'<TEI>{hashlib.sha256(content).hexdigest()}</TEI>'
+
+    # A PDF that GROBID can not parse is sent once
+    with open(os.path.join(pdf_folder, 'broken.pdf'), 'wb') as file:
+        file.write(b'%PDF-broken')
+    assert PDF_to_TEI(list(pdfs) + ['broken.pdf'], folder=pdf_folder, output_folder=tei_folder, base_url=base_url, workers=3, backoff=0.01) == 0
+    assert server.requests == 9
+    assert not os.path.exists(os.path.join(tei_folder, 'broken.grobid.tei.xml'))
+
+    # A second run and a renamed PDF do not send anything
+    os.remove(os.path.join(tei_folder, '5.grobid.tei.xml'))
+    shutil.copyfile(os.path.join(pdf_folder, '1.pdf'), os.path.join(pdf_folder, 'renamed.pdf'))
+    count = PDF_to_TEI(list(pdfs) + ['renamed.pdf'], folder=pdf_folder, output_folder=tei_folder, base_url=base_url, workers=3)
+    server.shutdown()
+
+    assert count == 1
+    assert server.requests == 10
+    assert os.path.exists(os.path.join(tei_folder, 'renamed.grobid.tei.xml'))
+    assert os.path.exists(os.path.join(tei_folder, MANIFEST))
+
+    # Clean up
+    shutil.rmtree(pdf_folder)
+    shutil.rmtree(tei_folder)
+
+test_pdf2tei()
@@ -0,0 +1,98 @@
+import json
+import os
+import shutil
+import sys
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+cache_dir = os.path.join(BASE_DIR, 'tests/data/test_openalex_cache')
+
+def make_work(pmid: int) -> dict:
+    return {
+        "id": f"https://openalex.org/W{pmid}",
+        "doi": f"https://doi.org/10.1000/{pmid}",
+        "ids": {"openalex": f"https://openalex.org/W{pmid}", "doi": f"https://doi.org/10.1000/{pmid}",
+                "pmid": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}", **({"pmcid": f"https://www.ncbi.nlm.nih.gov/pmc/articles/PMC{pmid}"} if pmid % 2 else {})},
+        "cited_by_count": pmid % 7,
+        "primary_location": {"is_oa": pmid % 3 == 0, "pdf_url": f"https://example.org/{pmid}.pdf" if pmid % 3 == 0 else None},
+        "open_access": {"is_oa": pmid % 3 != 1}
+        }
+
+works = {str(pmid): make_work(pmid) for pmid in range(1, 251)}
+
+class OpenalexHandler(BaseHTTPRequestHandler):
+    # A local stand-in for the OpenAlex works API with cursor paging, like OpenAlex it gives a next cursor until a page is empty
+    def do_GET(self):
+        params = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+        with self.server.lock:
+            self.server.requests.append(params)
+
+        field, values = params["filter"].split(":", 1)
+        if field == "doi":
+            values = [value.split("/")[-1] for value in values.split("|")]
+        else:
+            values = values.split("|")
+        assert len(values) <= 100 and params["mailto"] == "test@example.org"
+        matches = [works[value] for value in values if value in works]
+
+        start = 0 if params["cursor"] == "*" else int(params["cursor"])
+        per_page = int(params["per-page"])
+        page = matches[start:start + per_page]
+        body = json.dumps({"meta": {"count": len(matches), "next_cursor": str(start + per_page) if page else None},
+                           "results": page}).encode("utf-8")
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Make test for the function
+def test_pmid2openalex():
+    from lib.EntrezFetch import TokenBucket
+    from lib.PMID2Openalex import OpenalexClient, pmid_enrichment, dois_to_pmids
+    from lib.ResponseCache import ResponseCache
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), OpenalexHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/"
+
+    cache = ResponseCache(cache_dir)
+    client = OpenalexClient("test@example.org", base_url=base_url, bucket=TokenBucket(rate=1000), cache=cache, per_page=2)
+
+    # PMIDs that are not in OpenAlex are left out, the others keep the order of the input
+    pmids = [str(pmid) for pmid in range(300, 0, -1)]
+    results = pmid_enrichment(pmids, client, workers=3)
+    assert list(results) == [str(pmid) for pmid in range(250, 0, -1)]
+    assert results["3"] == {"pmid": "3", "openalex_id": "W3", "pmcid": "PMC3", "doi": "10.1000/3", "cited_by_count": 3,
+                            "pdf_url": "https://example.org/3.pdf", "is_oa": True, "is_oa_anywhere": True}
+    assert results["4"]["pmcid"] == "" and results["4"]["pdf_url"] is None and not results["4"]["is_oa_anywhere"]
+
+    # 3 batches of at most 100 PMIDs, every page of 2 works is a request and the empty last page is not requested
+    assert len({request["filter"] for request in server.requests}) == 3
+    assert len(server.requests) == 125
+
+    # A second run is answered from the cache
+    count = len(server.requests)
+    assert pmid_enrichment(pmids, client, workers=3) == results
+    assert len(server.requests) == count
+
+    assert dois_to_pmids(["https://doi.org/10.1000/5", "10.1000/999"], client) == ["5"]
+
+    # A batch with an odd number of works ends on a page that is not full
+    count = len(server.requests)
+    assert len(client.works("pmid", ["1", "2", "3", "999"])) == 3
+    assert len(server.requests) == count + 2
+
+    # Clean up
+    server.shutdown()
+    shutil.rmtree(cache_dir)
+
+test_pmid2openalex()
@@ -0,0 +1,86 @@
+import gzip
+import json
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+xml_file = os.path.join(BASE_DIR, 'tests/data/example_pubmed.xml')
+records_file = os.path.join(BASE_DIR, 'tests/data/example_records.txt')
+baseline_file = os.path.join(BASE_DIR, 'tests/data/test_pubmed24n0001.xml.gz')
+update_file = os.path.join(BASE_DIR, 'tests/data/test_pubmed24n1300.xml.gz')
+output_file = os.path.join(BASE_DIR, 'tests/data/test_pubmed_database.json')
+updated_file = os.path.join(BASE_DIR, 'tests/data/test_pubmed_database_updated.json')
+
+# Make test for the function
+def test_pubmedxml():
+    from Bio import Medline
+    from lib.Medline2JSON import record_to_dict
+    from lib.PubmedXML import iter_pubmed_xml
+
+    with open(records_file, 'r') as file:
+        expected = {rec['PMID']: record_to_dict(rec) for rec in Medline.parse(file)}
+
+    items = [value for action, value in iter_pubmed_xml(xml_file)]
+    assert [item['pmid'] for item in items] == ['30849355', '30815354']
+
+    # The XML gives the same fields as the MEDLINE format, only the print ISSN is not in the XML
+    assert items[0] == expected['30849355']
+    assert items[1]['issn'] == "2212-5469 (Electronic) 1738-2696 (Linking)"
+    assert {**items[1], 'issn': None} == {**expected['30815354'], 'issn': None}
+
+# Make test for the function
+def test_pubmedxml2database():
+    from lib.PubmedXML2Database import list_files, xml_to_database
+
+    with open(xml_file, 'r') as file:
+        xml = file.read()
+
+    # The update file changes the title of one article and deletes the other
+    with gzip.open(baseline_file, 'wt') as file:
+        file.write(xml)
+    start, end = xml.rindex("    <PubmedArticle>", 0, xml.index("30815354")), xml.index("</PubmedArticleSet>")
+    update = xml[:xml.index("    <PubmedArticle>")] + xml[start:end].replace("Human Embryonic", "Updated Human Embryonic")
+    update += "    <DeleteCitation>\n        <PMID Version=\"1\">30849355</PMID>\n    </DeleteCitation>\n</PubmedArticleSet>\n"
+    with gzip.open(update_file, 'wt') as file:
+        file.write(update)
+
+    xml_files = list_files([update_file, baseline_file])
+    assert xml_files == [baseline_file, update_file]
+
+    count = xml_to_database(xml_files[:1], outfile=output_file, workers=2)
+    with open(output_file, 'r') as file:
+        database = json.load(file)
+    assert count == 2
+    assert [item['pmid'] for item in database] == ['30849355', '30815354']
+
+    # Apply the update file to the database
+    count = xml_to_database(xml_files[1:], outfile=updated_file, database_file=output_file, workers=2)
+    with open(updated_file, 'r') as file:
+        updated = json.load(file)
+    assert count == 1
+    assert updated[0]['pmid'] == '30815354'
+    assert updated[0]['title'].startswith("Updated Human Embryonic")
+
+    # Both files at once give the same database
+    count = xml_to_database(xml_files, outfile=output_file, workers=2)
+    with open(output_file, 'r') as file:
+        assert json.load(file) == updated
+
+    # An update file with two versions of the same record keeps the last version
+    article = xml[start:end].replace("Human Embryonic", "Updated Human Embryonic")
+    twice = xml[:xml.index("    <PubmedArticle>")] + article + article.replace("Updated Human", "Newest Human") + "</PubmedArticleSet>\n"
+    with gzip.open(update_file, 'wt') as file:
+        file.write(twice)
+    count = xml_to_database([update_file], outfile=output_file, database_file=updated_file, workers=2)
+    with open(output_file, 'r') as file:
+        newest = json.load(file)
+    assert count == 1
+    assert newest[0]['title'].startswith("Newest Human Embryonic")
+
+    for path in [baseline_file, update_file, output_file, output_file + ".pmids", updated_file]:
+        os.remove(path)
+
+test_pubmedxml()
+test_pubmedxml2database()
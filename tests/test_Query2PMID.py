@@ -0,0 +1,117 @@
+import os
+import re
+import sys
+import threading
+import urllib.parse
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+entrez_email = 'some@hotmail.nl'
+output_file = os.path.join(BASE_DIR, 'tests/data/test_predict_pmids.txt')
+
+# A synthetic corpus of 2000 PMIDs, with a burst of 120 records on a single day
+corpus = [(str(10000 + i), datetime(2024, 1, 1) - timedelta(days=i // 3)) for i in range(1880)]
+corpus += [(str(20000 + i), datetime(2023, 6, 1)) for i in range(120)]
+
+class SearchHandler(BaseHTTPRequestHandler):
+    # A local stand-in for esearch, the date window in the query is applied to the corpus
+    def do_GET(self):
+        params = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+        self.server.requests.append(params)
+
+        # The publication date and the entry date of the corpus are the same
+        dates = re.findall(r'(\d{4}/\d{2}/\d{2})\[(?:PDAT|EDAT)\]', params['term'])
+        if dates:
+            start, end = [datetime.strptime(date, '%Y/%m/%d') for date in dates]
+            matches = [pmid for pmid, date in corpus if start <= date <= end]
+        else:
+            matches = [pmid for pmid, _ in corpus]
+
+        # PubMed never returns more than the search limit of the test
+        ids = matches[int(params['retstart']):int(params['retstart']) + min(int(params['retmax']), 100)]
+        body = f"<eSearchResult><Count>{len(matches)}</Count><IdList>{''.join(f'<Id>{pmid}</Id>' for pmid in ids)}</IdList></eSearchResult>"
+
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+# Make test for the function
+def test_query2pmid():
+    from lib.EntrezFetch import EntrezClient, TokenBucket
+    from lib.Query2PMID import date_query, run_query
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SearchHandler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    client = EntrezClient(entrez_email=entrez_email, base_url=f"http://127.0.0.1:{server.server_port}/", bucket=TokenBucket(rate=1000))
+
+    # All PMIDs are retrieved, except for the records on the day with more records than a single search can return
+    pmids = run_query(client, 'fcrn', retmax=5000, workers=4, limit=100)
+    assert len(pmids) == len(set(pmids))
+    missing = set(pmid for pmid, _ in corpus) - set(pmids)
+    assert len(missing) == 23
+    assert all(pmid.startswith('2') for pmid in missing)
+
+    # Only the newest date windows are searched when fewer PMIDs are requested
+    server.requests.clear()
+    pmids = run_query(client, 'fcrn', retmax=250, workers=4, limit=100)
+    assert len(pmids) == 250
+    assert set(pmids) == set(pmid for pmid, _ in corpus[:250])
+
+    # The date range is split from the newest end, the older windows are not counted anymore
+    assert len(server.requests) <= 40
+
+    # A query that fits in a single search is not split, also when more PMIDs are requested
+    server.requests.clear()
+    pmids = run_query(client, date_query('fcrn', datetime(2024, 1, 1), datetime(2024, 1, 1)), retmax=150, workers=4, limit=100)
+    assert pmids == ['10000', '10001', '10002']
+    assert len(server.requests) == 1
+    server.shutdown()
+
+def test_incremental_query():
+    from lib.EntrezFetch import EntrezClient, TokenBucket
+    from lib.Query2PMID import update_query
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SearchHandler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    client = EntrezClient(entrez_email=entrez_email, base_url=f"http://127.0.0.1:{server.server_port}/", bucket=TokenBucket(rate=1000))
+
+    # The first run retrieves the newest PMIDs and writes the output file
+    state = {}
+    first = update_query(client, 'area', 'fcrn', output_file, state, retmax=300, workers=4, limit=100)
+    assert len(first) == 300
+
+    # Add records that entered PubMed today
+    today = datetime(*datetime.now().timetuple()[:3])
+    new_records = [(str(30000 + i), today) for i in range(5)]
+    corpus.extend(new_records)
+
+    # The second run only searches the entry dates since the last run and appends the new PMIDs
+    server.requests.clear()
+    second = update_query(client, 'area', 'fcrn', output_file, state, retmax=300, workers=4, limit=100)
+    server.shutdown()
+    del corpus[-5:]
+
+    assert second == [pmid for pmid, _ in new_records]
+    assert all('[EDAT]' in request['term'] for request in server.requests)
+    assert len(server.requests) == 2
+
+    with open(output_file, 'r') as file:
+        assert file.read().splitlines() == first + second
+
+    assert list(state.values())[0]['pmids'] == first + second
+
+    # Clean up
+    os.remove(output_file)
+
+test_query2pmid()
+test_incremental_query()
@@ -0,0 +1,85 @@
+import json
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+example_file = os.path.join(BASE_DIR, 'tests/data/example_database_merge.json')
+sqlite_file = os.path.join(BASE_DIR, 'tests/data/test_database.sqlite')
+update_file = os.path.join(BASE_DIR, 'tests/data/test_openalex_update.json')
+json_file = os.path.join(BASE_DIR, 'tests/data/test_database_sqlite.json')
+
+# Make test for the function
+def test_record_store():
+    from lib.RecordStore import RecordStore
+    from lib.DatabaseStore import read_items, read_records, database_to_json
+    from lib.DatabaseIndex import load_pmids
+
+    with open(example_file, 'r') as file:
+        database = json.load(file)
+
+    with RecordStore(sqlite_file) as store:
+        assert store.upsert(read_items(example_file)) == len(database)
+        assert len(store) == len(database)
+
+        # The DOI lists and tagging scores do not fit a typed column and are kept as they are
+        pmid = database[5]['pmid']
+        assert store.get(pmid) == database[5] and list(store.get(pmid)) == list(database[5])
+        assert store.get('0') is None
+
+    # An OpenAlex update of two records and one new PMID, in the dict layout
+    update = {
+        database[5]['pmid']: {"openalex_id": "W1", "doi": "10.1000/5", "cited_by_count": 7, "pdf_url": None, "is_oa": False},
+        database[9]['pmid']: {"openalex_id": "W2", "cited_by_count": 2, "pdf_url": "https://example.org/9.pdf", "is_oa": True},
+        "99999999": {"title": "New record", "tagging_scores": {"a": {"b": 1}}}
+        }
+    with open(update_file, 'w') as file:
+        json.dump(update, file, indent=4)
+
+    with RecordStore(sqlite_file) as store:
+        changes = store.connection.total_changes
+        store.upsert(read_items(update_file))
+        # Only the rows of the updated PMIDs were written
+        assert store.connection.total_changes - changes == 3
+        assert len(store) == len(database) + 1
+
+        record = store.get(database[5]['pmid'])
+        assert record['doi'] == "10.1000/5" and record['cited_by_count'] == 7 and record['is_oa'] is False
+        assert record['tagging_scores'] == database[5]['tagging_scores'] and record['title'] == database[5]['title']
+        assert store.get("99999999") == {"pmid": "99999999", "title": "New record", "tagging_scores": {"a": {"b": 1}}}
+
+    # The shared reader reads the store, only the selected PMIDs in the order they were inserted
+    records = list(read_records(sqlite_file, columns=['openalex_id', 'is_oa', 'tagging_scores'], pmids=["99999999", database[9]['pmid'], '0']))
+    assert records == [{'pmid': database[9]['pmid'], 'openalex_id': 'W2', 'is_oa': True, 'tagging_scores': database[9]['tagging_scores']},
+                       {'pmid': '99999999', 'openalex_id': None, 'is_oa': None, 'tagging_scores': {"a": {"b": 1}}}]
+    assert list(load_pmids(sqlite_file)) == [item['pmid'] for item in database] + ["99999999"]
+
+    # And back to JSON
+    assert database_to_json(sqlite_file, json_file) == len(database) + 1
+    with open(json_file, 'r') as file:
+        exported = json.load(file)
+    assert exported[9]['pdf_url'] == "https://example.org/9.pdf" and exported[-1]['pmid'] == "99999999"
+
+    # The records have the keys they were written with, in their order and with their null values, new keys are added at the end
+    updated = [{**item, **update.get(item['pmid'], {})} for item in database] + [{"pmid": "99999999", **update["99999999"]}]
+    assert exported == updated and [list(item) for item in exported] == [list(item) for item in updated]
+    assert exported[5]['pdf_url'] is None
+
+    # A record with null fields, like the records of medline_to_json, comes back with them
+    with RecordStore(sqlite_file) as store:
+        store.upsert([{"pmid": "99999998", "doi": None, "title": "Null fields", "pdf_url": None}])
+        assert store.get("99999998") == {"pmid": "99999998", "doi": None, "title": "Null fields", "pdf_url": None}
+
+        # Field names are never part of the SQL text, also when they hold quotes
+        store.upsert([{"pmid": "99999998", "it's": 1, "x') --": 2, "cited_by_count": "many"}])
+        store.upsert([{"pmid": "99999998", "it's": 3, "cited_by_count": 4}])
+        assert store.get("99999998") == {"pmid": "99999998", "doi": None, "title": "Null fields", "pdf_url": None,
+                                         "it's": 3, "x') --": 2, "cited_by_count": 4}
+
+    # Clean up
+    for path in (sqlite_file, sqlite_file + '-wal', sqlite_file + '-shm', update_file, json_file):
+        if os.path.exists(path):
+            os.remove(path)
+
+test_record_store()
@@ -0,0 +1,48 @@
+import os
+import shutil
+import sys
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+cache_dir = os.path.join(BASE_DIR, 'tests/data/test_cache')
+
+# Make test for the function
+def test_responsecache():
+    from lib.ResponseCache import ResponseCache
+
+    cache = ResponseCache(cache_dir, ttl=None, max_size=250)
+
+    # The key does not depend on the order and type of the parameters or on the identity of the user
+    key = cache.key("esearch.fcgi", {"term": "asthma", "retmax": 0, "email": "some@hotmail.nl"})
+    assert key == cache.key("esearch.fcgi", {"retmax": "0", "term": "asthma", "tool": "jrcnam"})
+    assert key != cache.key("efetch.fcgi", {"term": "asthma", "retmax": 0})
+
+    assert cache.get(key) is None
+    cache.put(key, b"x" * 100)
+    assert cache.get(key) == b"x" * 100 and key in cache
+
+    # Use the first response again, so the second response is the least recently used one
+    second, third = cache.key("a", {}), cache.key("b", {})
+    cache.put(second, b"y" * 100)
+    past = time.time() - 100
+    os.utime(cache.path(second), (past, past))
+    cache.put(third, b"z" * 100)
+    assert second not in cache
+    assert key in cache and third in cache
+
+    # A new cache object picks up the size of the existing responses
+    assert ResponseCache(cache_dir, ttl=None, max_size=250).size == 200
+
+    # Expired responses are removed
+    cache = ResponseCache(cache_dir, ttl=50)
+    os.utime(cache.path(key), (past, past))
+    assert cache.get(key) is None
+    assert not os.path.exists(cache.path(key))
+    assert cache.get(third) == b"z" * 100
+
+    # Clean up
+    shutil.rmtree(cache_dir)
+
+test_responsecache()
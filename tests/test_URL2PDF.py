@@ -0,0 +1,116 @@
+import os
+import shutil
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+pdf_folder = os.path.join(BASE_DIR, 'tests/data/test_downloads')
+
+pdfs = {str(pmid): b'%PDF-1.4\n' + os.urandom(50000) for pmid in range(1, 7)}
+
+class PDFHandler(BaseHTTPRequestHandler):
+    # A local stand-in for publisher websites that supports range requests
+    def do_GET(self):
+        pmid = self.path.strip('/').split('.')[0]
+        with self.server.lock:
+            self.server.requests.append((pmid, self.headers.get('Range')))
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+
+        time.sleep(0.05)
+        with self.server.lock:
+            self.server.active -= 1
+
+        if pmid == 'html':
+            body, status = b'<html>Please log in</html>', 200
+        elif pmid not in pdfs:
+            body, status = b'Not found', 404
+        elif self.headers.get('Range') and pmid == '6':
+            # A server that sends another range than the one that was asked
+            body, status = pdfs[pmid], 206
+            start = 0
+        elif self.headers.get('Range'):
+            start = int(self.headers['Range'][6:-1])
+            body, status = pdfs[pmid][start:], 206
+            if start >= len(pdfs[pmid]):
+                body, status = b'', 416
+        else:
+            body, status = pdfs[pmid], 200
+
+        self.send_response(status)
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{len(pdfs[pmid]) - 1}/{len(pdfs[pmid])}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Make test for the function
+def test_url2pdf():
+    from lib.URL2PDF import download_pdfs, load_manifest
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PDFHandler)
+    server.lock = threading.Lock()
+    server.requests, server.active, server.max_active = [], 0, 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/"
+
+    urls = {pmid: base_url + pmid + '.pdf' for pmid in pdfs}
+    urls.update({'7': base_url + 'missing.pdf', '8': base_url + 'html.pdf'})
+
+    # An interrupted download of the first PDF and a PDF that is already complete
+    os.makedirs(pdf_folder, exist_ok=True)
+    with open(os.path.join(pdf_folder, '1.pdf.part'), 'wb') as file:
+        file.write(pdfs['1'][:20000])
+    with open(os.path.join(pdf_folder, '2.pdf'), 'wb') as file:
+        file.write(pdfs['2'])
+
+    # A partial file that is longer than the PDF on the server (416) and one that the server does not continue
+    with open(os.path.join(pdf_folder, '5.pdf.part'), 'wb') as file:
+        file.write(b'%PDF-1.4\n' + os.urandom(60000))
+    with open(os.path.join(pdf_folder, '6.pdf.part'), 'wb') as file:
+        file.write(pdfs['6'][:20000])
+
+    manifest = download_pdfs(urls, pdf_folder, workers=6, per_host=2)
+
+    # Only two downloads ran at once against the single host
+    assert server.max_active <= 2
+    assert ('1', 'bytes=20000-') in server.requests
+    assert '2' not in [pmid for pmid, _ in server.requests]
+
+    # Both are downloaded again from the start
+    assert ('5', 'bytes=60009-') in server.requests and ('5', None) in server.requests
+    assert ('6', 'bytes=20000-') in server.requests and ('6', None) in server.requests
+
+    for pmid, content in pdfs.items():
+        with open(os.path.join(pdf_folder, pmid + '.pdf'), 'rb') as file:
+            assert file.read() == content
+        assert manifest[pmid]['status'] == 'ok'
+    assert manifest['7']['error'] == 'HTTP 404'
+    assert manifest['8']['error'] == 'Not a PDF'
+    assert not os.path.exists(os.path.join(pdf_folder, '8.pdf'))
+    assert load_manifest(pdf_folder) == {pmid: {key: str(value) for key, value in entry.items()} for pmid, entry in manifest.items()}
+
+    # A second run skips the downloaded PDFs and the failed PDFs, a changed PDF is downloaded again
+    with open(os.path.join(pdf_folder, '3.pdf'), 'wb') as file:
+        file.write(b'%PDF-1.4\ncorrupt')
+    server.requests.clear()
+    download_pdfs(urls, pdf_folder, workers=6, per_host=2)
+    assert server.requests == [('3', None)]
+
+    # Failed PDFs are only tried again when asked
+    server.requests.clear()
+    download_pdfs(urls, pdf_folder, workers=6, per_host=2, retry_failed=True)
+    server.shutdown()
+    assert sorted(pmid for pmid, _ in server.requests) == ['html', 'missing']
+
+    # Clean up
+    shutil.rmtree(pdf_folder)
+
+test_url2pdf()
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(__file__, '../../'))
+sys.path.append(str(BASE_DIR))
+
+database_file = os.path.join(BASE_DIR, 'tests/data/example_database.json')
+predictions_file = os.path.join(BASE_DIR, 'tests/data/example_predictions.json')
+output_directory = os.path.join(BASE_DIR, 'tests/data')
+area_files = {
+    'liver': os.path.join(BASE_DIR, 'tests/data/test_liver_predict_pmids.txt'),
+    'skin': os.path.join(BASE_DIR, 'tests/data/test_skin_predict_pmids.txt')
+    }
+union_file = os.path.join(BASE_DIR, 'tests/data/test_union_predict_pmids.txt')
+membership_file = os.path.join(BASE_DIR, 'tests/data/test_pmid_areas.json')
+
+# Make test for the function
+def test_union2areas():
+    from lib.Query2PMID import write_union
+    from lib.Union2Areas import split_json, area_path
+    
+    with open(database_file, 'r') as file:
+        database = json.load(file)
+    pmids = [item['pmid'] for item in database]
+    
+    # Two disease areas that share part of their PMIDs
+    with open(area_files['liver'], 'w') as file:
+        file.write("\n".join(pmids[:60]))
+    with open(area_files['skin'], 'w') as file:
+        file.write("\n".join(pmids[40:]))
+        
+    membership = write_union(area_files, union_file=union_file, membership_file=membership_file)
+    
+    with open(union_file, 'r') as file:
+        assert file.read().splitlines() == pmids
+    assert membership[pmids[50]] == ['liver', 'skin']
+    
+    # Split the database and the predictions back per disease area
+    split_json(database_file, membership, output_directory)
+    split_json(predictions_file, membership, output_directory)
+    
+    with open(predictions_file, 'r') as file:
+        predictions = json.load(file)
+    
+    for area, area_pmids in [('liver', pmids[:60]), ('skin', pmids[40:])]:
+        with open(area_path(output_directory, area, database_file), 'r') as file:
+            assert json.load(file) == [item for item in database if item['pmid'] in area_pmids]
+        with open(area_path(output_directory, area, predictions_file), 'r') as file:
+            assert json.load(file) == {pmid: value for pmid, value in predictions.items() if pmid in area_pmids}
+        
+        # Clean up
+        os.remove(area_path(output_directory, area, database_file))
+        os.remove(area_path(output_directory, area, predictions_file))
+        os.remove(area_files[area])
+    
+    os.remove(union_file)
+    os.remove(membership_file)
+    
+test_union2areas()